@@ -0,0 +1,186 @@
+"""Measure resident cache memory per guild with the default and low-memory cache policies
+
+Feeds synthetic GUILD_CREATE and MESSAGE_CREATE payloads straight into
+discord.py's connection state and reports tracemalloc bytes per guild.
+
+Usage: python benchmarks/memory_per_guild.py [--guilds 500] [--members 50] [--messages 20]
+"""
+import os
+import sys
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from discord.ext import commands
+
+from cache_policy import build_intents, client_options
+
+BOT_USER_ID = 1
+
+
+def _snowflake(counter):
+    return str(10**17 + counter)
+
+
+def guild_payload(guild_index, members, channels=20, roles=15, emojis=30, voice_members=3):
+    """A GUILD_CREATE payload shaped like a typical mid-sized server"""
+    base = guild_index * 100000
+    guild_id = _snowflake(base)
+    
+    member_payloads = [{
+        'user': {
+            'id': _snowflake(base + 1000 + i),
+            'username': f'user{i}',
+            'discriminator': '0',
+            'global_name': f'User {i}',
+            'avatar': None,
+        },
+        'nick': None,
+        'roles': [_snowflake(base + 100 + (i % roles))],
+        'joined_at': '2024-01-01T00:00:00+00:00',
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    } for i in range(members)]
+    
+    return {
+        'id': guild_id,
+        'name': f'Guild {guild_index}',
+        'icon': None,
+        'owner_id': member_payloads[0]['user']['id'] if member_payloads else _snowflake(base + 1),
+        'member_count': members,
+        'features': [],
+        'verification_level': 0,
+        'default_message_notifications': 0,
+        'explicit_content_filter': 0,
+        'mfa_level': 0,
+        'premium_tier': 0,
+        'preferred_locale': 'en-US',
+        'large': members > 250,
+        'roles': [{
+            'id': guild_id if i == 0 else _snowflake(base + 100 + i),
+            'name': '@everyone' if i == 0 else f'role{i}',
+            'color': 0,
+            'hoist': False,
+            'position': i,
+            'permissions': '0',
+            'managed': False,
+            'mentionable': False,
+        } for i in range(roles)],
+        'emojis': [{
+            'id': _snowflake(base + 500 + i),
+            'name': f'emoji{i}',
+            'roles': [],
+            'require_colons': True,
+            'managed': False,
+            'animated': False,
+            'available': True,
+        } for i in range(emojis)],
+        'stickers': [],
+        'channels': [{
+            'id': _snowflake(base + 10 + i),
+            'type': 2 if i == channels - 1 else 0,
+            'name': f'channel{i}',
+            'position': i,
+            'permission_overwrites': [],
+            'nsfw': False,
+            'parent_id': None,
+            'bitrate': 64000,
+            'user_limit': 0,
+        } for i in range(channels)],
+        'threads': [],
+        'members': member_payloads,
+        'voice_states': [{
+            'user_id': member['user']['id'],
+            'channel_id': _snowflake(base + 10 + channels - 1),
+            'session_id': 'session',
+            'deaf': False,
+            'mute': False,
+            'self_deaf': False,
+            'self_mute': False,
+            'self_video': False,
+            'suppress': False,
+        } for member in member_payloads[:voice_members]],
+        'presences': [],
+        'stage_instances': [],
+        'guild_scheduled_events': [],
+    }
+
+
+def message_payload(guild_payload, index):
+    member = guild_payload['members'][index % len(guild_payload['members'])]
+    return {
+        'id': _snowflake(int(guild_payload['id']) - 10**17 + 90000 + index),
+        'channel_id': guild_payload['channels'][0]['id'],
+        'guild_id': guild_payload['id'],
+        'author': member['user'],
+        'member': {key: value for key, value in member.items() if key != 'user'},
+        'content': f'!play some song number {index}',
+        'timestamp': '2024-01-01T00:00:00+00:00',
+        'edited_timestamp': None,
+        'tts': False,
+        'mention_everyone': False,
+        'mentions': [],
+        'mention_roles': [],
+        'attachments': [],
+        'embeds': [],
+        'pinned': False,
+        'type': 0,
+    }
+
+
+def measure(low_memory, guilds, members, messages):
+    """Bytes held per guild by the guild, member and message caches"""
+    intents = build_intents(low_memory)
+    options = client_options(intents, low_memory, 100 if low_memory else 1000)
+    bot = commands.Bot(command_prefix='!', intents=intents, **options)
+    state = bot._connection
+    
+    payloads = [guild_payload(i, members) for i in range(guilds)]
+    message_payloads = [message_payload(payload, i) for payload in payloads for i in range(messages)]
+    
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    
+    for payload in payloads:
+        if not intents.emojis_and_stickers:
+            payload = dict(payload, emojis=[], stickers=[])
+        state._add_guild_from_data(payload)
+    
+    for data in message_payloads:
+        channel, _ = state._get_guild_channel(data)
+        message = discord.Message(state=state, channel=channel, data=data)
+        if state._messages is not None:
+            state._messages.append(message)
+    
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    
+    used = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    cached_members = sum(len(guild._members) for guild in state.guilds)
+    cached_messages = len(state._messages) if state._messages is not None else 0
+    return used / guilds, cached_members, cached_messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache memory per guild: default vs low-memory mode')
+    parser.add_argument('--guilds', type=int, default=500)
+    parser.add_argument('--members', type=int, default=50, help='Members included in each GUILD_CREATE')
+    parser.add_argument('--messages', type=int, default=20, help='Messages received per guild')
+    args = parser.parse_args()
+    
+    default_bytes, default_members, default_messages = measure(False, args.guilds, args.members, args.messages)
+    low_bytes, low_members, low_messages = measure(True, args.guilds, args.members, args.messages)
+    
+    print(f"{args.guilds} guilds, {args.members} members and {args.messages} messages per guild")
+    print(f"{'mode':<12} {'bytes/guild':>12} {'members':>9} {'messages':>9}")
+    print(f"{'default':<12} {default_bytes:>12,.0f} {default_members:>9} {default_messages:>9}")
+    print(f"{'low-memory':<12} {low_bytes:>12,.0f} {low_members:>9} {low_messages:>9}")
+    if default_bytes:
+        print(f"Saved {(1 - low_bytes / default_bytes) * 100:.1f}% per guild")
+
+
+if __name__ == '__main__':
+    main()
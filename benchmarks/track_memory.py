@@ -0,0 +1,164 @@
+"""Measure memory per queued track and per active player: info dicts vs compact Track records
+
+Builds yt-dlp-shaped info dicts (or extracts a real one with --url) and
+reports tracemalloc bytes for what the music cog used to keep versus the
+slotted Track it keeps now. A queued Track is larger than the old queue
+dict because it also keeps the resolved stream URL, which lets playback
+skip a second extraction while the URL is valid.
+
+Usage: python benchmarks/track_memory.py [--tracks 1000] [--url <youtube url>]
+"""
+import os
+import sys
+import copy
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracks import Track
+
+
+def synthetic_info(index, formats=30, thumbnails=40, caption_languages=60):
+    """An info dict shaped like a resolved YouTube video"""
+    expire = int(time.time()) + 6 * 3600
+    video_id = f"vid{index:08d}"
+    
+    def stream_url(itag):
+        return (
+            f"https://rr{index % 9}---sn-abc{index % 7}.googlevideo.com/videoplayback?expire={expire}"
+            f"&ei=abcdefghijklmnop&ip=203.0.113.{index % 250}&id=o-{video_id}&itag={itag}"
+            f"&source=youtube&requiressl=yes&mime=audio%2Fwebm&gir=yes&clen={3_000_000 + index}"
+            f"&dur=213.041&lmt=1700000000000000&keepalive=yes&c=ANDROID&sig={'x' * 300}"
+        )
+    
+    http_headers = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-us,en;q=0.5',
+        'Sec-Fetch-Mode': 'navigate',
+    }
+    format_list = [{
+        'format_id': str(itag),
+        'url': stream_url(itag),
+        'ext': 'webm',
+        'acodec': 'opus',
+        'vcodec': 'none' if itag < 260 else 'vp9',
+        'abr': 128.0,
+        'asr': 48000,
+        'filesize': 3_000_000 + itag,
+        'tbr': 130.5,
+        'protocol': 'https',
+        'http_headers': dict(http_headers),
+        'format_note': 'medium',
+        'downloader_options': {'http_chunk_size': 10485760},
+    } for itag in range(249, 249 + formats)]
+    best = format_list[0]
+    
+    return {
+        'id': video_id,
+        'title': f"Some Artist - Some Song {index} (Official Video)",
+        'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        'url': best['url'],
+        'format_id': best['format_id'],
+        'formats': format_list,
+        'requested_formats': None,
+        'http_headers': dict(http_headers),
+        'thumbnails': [{
+            'url': f"https://i.ytimg.com/vi/{video_id}/{name}.jpg?sqp=-oaymwE{'y' * 40}",
+            'preference': -i,
+            'id': str(i),
+            'height': 90 + i,
+            'width': 120 + i,
+        } for i, name in enumerate(['default', 'mqdefault', 'hqdefault', 'sddefault'] * (thumbnails // 4))],
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg",
+        'description': 'Lyrics and credits. ' * 100,
+        'tags': [f"tag{i}" for i in range(30)],
+        'automatic_captions': {
+            f"lang{i}": [{'ext': ext, 'url': f"https://www.youtube.com/api/timedtext?v={video_id}&lang=l{i}&fmt={ext}&{'z' * 200}"}
+                         for ext in ('json3', 'srv1', 'srv2', 'srv3', 'ttml', 'vtt')]
+            for i in range(caption_languages)
+        },
+        'duration': 213,
+        'channel': 'Some Artist',
+        'uploader': 'Some Artist',
+        'view_count': 123456789,
+        'like_count': 1234567,
+    }
+
+
+def real_info(url):
+    import yt_dlp
+    
+    with yt_dlp.YoutubeDL({'format': 'bestaudio/best', 'quiet': True, 'noplaylist': True}) as ytdl:
+        info = ytdl.extract_info(url, download=False)
+    return info['entries'][0] if 'entries' in info else info
+
+
+def old_queue_entry(info):
+    """What search_youtube used to build per queued track"""
+    return {
+        'title': info.get('title', 'Unknown'),
+        'url': info.get('webpage_url', info.get('url')),
+        'duration': info.get('duration', 0),
+        'thumbnail': info.get('thumbnail'),
+        'channel': info.get('channel', 'Unknown'),
+        'requester_id': 123456789012345678,
+        'requester_name': 'Requester',
+    }
+
+
+def dict_entry(info):
+    """The same fields a Track keeps, held in a plain dict"""
+    track = Track.from_info(info, 123456789012345678, 'Requester')
+    return {name: getattr(track, name) for name in Track.__slots__}
+
+
+def measure(build, count):
+    """Bytes allocated per object for objects built by `build(i)` and kept alive"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [build(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del kept
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory per queued track and per active player')
+    parser.add_argument('--tracks', type=int, default=1000)
+    parser.add_argument('--players', type=int, default=50)
+    parser.add_argument('--url', help='Extract a real video with yt-dlp instead of using synthetic info dicts')
+    args = parser.parse_args()
+    
+    if args.url:
+        sample = real_info(args.url)
+        make_info = lambda i: copy.deepcopy(sample)
+    else:
+        make_info = synthetic_info
+    
+    # The info dict is built and dropped inside each measurement, so only what the record retains counts
+    # (a Track keeps the stream URL string, the old queue entry did not)
+    old_entry = measure(lambda i: old_queue_entry(make_info(i)), args.tracks)
+    new_entry = measure(lambda i: Track.from_info(make_info(i), 123456789012345678, 'Requester'), args.tracks)
+    same_fields_dict = measure(lambda i: dict_entry(make_info(i)), args.tracks)
+    
+    # Active players: YTDLSource used to keep the whole info dict for the length of the song
+    old_player = measure(make_info, args.players)
+    new_player = measure(lambda i: Track.from_info(make_info(i), 123456789012345678, 'Requester'), args.players)
+    
+    print(f"{'record':<16} {'before':>12} {'after':>12} {'saved':>8}")
+    rows = (
+        ('queued track', old_entry, new_entry),
+        ('  vs same dict', same_fields_dict, new_entry),
+        ('active player', old_player, new_player),
+    )
+    for name, before, after in rows:
+        print(f"{name:<16} {before:>10,.0f} B {after:>10,.0f} B {(1 - after / before) * 100:>7.1f}%")
+
+
+if __name__ == '__main__':
+    main()
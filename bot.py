@@ -1,88 +1,299 @@
+from startup import PROCESS_STARTED, StartupTimer, check_yt_dlp_version, maybe_install_import_profiler
+
+# Installed before anything heavy is imported so the profile covers discord.py too
+import_profiler = maybe_install_import_profiler()
+
 import discord
 import os
-import asyncio
-import subprocess
 import sys
+import signal
+import asyncio
+import time
+import typing
 
 from discord.ext import commands
 from dotenv import load_dotenv
 from config import Config
-from logger import get_logger, log_command, log_bot
+from logger import get_logger, log_command, log_bot, log_queue_stats
+from log_viewer import tail_records
+import metrics
+from loop_monitor import loop_monitor
+from command_sync import CommandSyncer
+from shards import ShardTracker
+from cluster import ClusterClient, ClusterError
+from cache_policy import build_intents, client_options
+from ratelimit import RateLimiter, extraction_gate
+from guild_settings import guild_settings
+from tracks import track_cache
+from loudness import loudness_cache
+from title_index import title_index
+from play_history import play_history
+from ffmpeg_supervisor import ffmpeg_supervisor
+from handoff import handoff
 
 load_dotenv()
 
 logger = get_logger("Main")
+startup_timer = StartupTimer(PROCESS_STARTED, import_profiler)
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.guilds = True
-intents.guild_messages = True
+intents = build_intents(Config.LOW_MEMORY_MODE)
 
-bot = commands.Bot(
-    command_prefix=Config.COMMAND_PREFIX,
+bot_options = dict(
+    # Per-guild prefixes, resolved from memory for every message
+    command_prefix=guild_settings.prefix,
     intents=intents,
-    help_command=commands.DefaultHelpCommand()
+    help_command=commands.DefaultHelpCommand(),
+    # Sent with every IDENTIFY, so a reconnecting shard gets its presence back on its own
+    activity=discord.Activity(
+        type=discord.ActivityType.listening,
+        name=Config.BOT_STATUS
+    ),
+    **client_options(intents, Config.LOW_MEMORY_MODE, Config.MAX_MESSAGES)
+)
+
+if Config.AUTO_SHARD or Config.SHARD_COUNT:
+    bot = commands.AutoShardedBot(
+        shard_count=Config.SHARD_COUNT,
+        shard_ids=Config.SHARD_IDS,
+        **bot_options
+    )
+else:
+    bot = commands.Bot(**bot_options)
+
+shard_tracker = ShardTracker(bot)
+
+rate_limiter = RateLimiter(Config.RATE_LIMITS, Config.DEFAULT_RATE_LIMIT)
+extraction_gate.max_running = Config.MAX_CONCURRENT_EXTRACTIONS
+extraction_gate.max_waiting = Config.MAX_PENDING_EXTRACTIONS
+
+title_index.max_entries = Config.TITLE_INDEX_SIZE
+track_cache.max_entries = Config.TRACK_CACHE_SIZE
+play_history.batch_size = Config.HISTORY_BATCH_SIZE
+
+loudness_cache.enabled = Config.LOUDNESS_NORMALIZATION
+loudness_cache.target = Config.LOUDNESS_TARGET_LUFS
+loudness_cache.max_gain = Config.LOUDNESS_MAX_GAIN
+loudness_cache.max_entries = Config.LOUDNESS_CACHE_SIZE
+loudness_cache.max_running = Config.LOUDNESS_MAX_ANALYSES
+loudness_cache.analysis_seconds = Config.LOUDNESS_ANALYSIS_SECONDS
+
+ffmpeg_supervisor.interval = Config.FFMPEG_SAMPLE_INTERVAL
+ffmpeg_supervisor.stall_timeout = Config.FFMPEG_STALL_TIMEOUT
+ffmpeg_supervisor.max_cpu = Config.FFMPEG_MAX_CPU_PERCENT
+ffmpeg_supervisor.max_rss = Config.FFMPEG_MAX_RSS_MB * 1024 * 1024
+ffmpeg_supervisor.max_restarts = Config.FFMPEG_MAX_RESTARTS
+
+command_syncer = CommandSyncer(
+    bot,
+    os.path.join(Config.DATA_DIR, 'command_sync.json'),
+    dev_guild_ids=Config.DEV_GUILD_IDS
 )
 
+def syncs_commands():
+    """The command tree is global, so in cluster mode only cluster 0 syncs it"""
+    return Config.COMMAND_SYNC != 'off' and not Config.CLUSTER_ID
+
 @bot.event
 async def on_ready():
     """Called when the bot is ready and connected to Discord"""
+    if not shard_tracker.sharded:
+        shard_tracker.ready(bot.shard_id)
+    
+    if shard_tracker.ready_once:
+        # Re-identify after a dropped session: one summary line instead of the full startup path
+        logger.info(f"Ready again: {shard_tracker.summary()}")
+        if syncs_commands():
+            try:
+                await command_syncer.sync(force=Config.COMMAND_SYNC == 'force')
+            except Exception as e:
+                logger.error(f"Failed to sync commands: {e}")
+        return
+    shard_tracker.ready_once = True
+    
+    summary = shard_tracker.summary()
     logger.info(f'{bot.user.name} has connected to Discord!')
     logger.info(f'Bot ID: {bot.user.id}')
-    logger.info(f'Guild Count: {len(bot.guilds)}')
-    
-    for guild in bot.guilds:
-        logger.info(f'Connected to guild: {guild.name} (ID: {guild.id}) with {guild.member_count} members')
+    logger.info(summary)
     
     print(f'{bot.user.name} has connected to Discord!')
     print(f'Bot ID: {bot.user.id}')
-    print(f'Guild Count: {len(bot.guilds)}')
+    print(summary)
     print('------')
     
-    await bot.change_presence(
-        activity=discord.Activity(
-            type=discord.ActivityType.listening,
-            name=Config.BOT_STATUS
-        )
-    )
-    
-    try:
-        synced = await bot.tree.sync()
-        logger.info(f"Synced {len(synced)} slash command(s)")
-        print(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        logger.error(f"Failed to sync commands: {e}")
-        print(f"Failed to sync commands: {e}")
+    synced_count = 0
+    if syncs_commands():
+        try:
+            synced_count, skipped = await command_syncer.sync(force=Config.COMMAND_SYNC == 'force')
+            if synced_count:
+                print(f"Synced {synced_count} command(s)")
+        except Exception as e:
+            logger.error(f"Failed to sync commands: {e}")
+            print(f"Failed to sync commands: {e}")
     
     log_bot("bot_ready", {
         "bot_name": bot.user.name,
         "bot_id": bot.user.id,
         "guild_count": len(bot.guilds),
-        "synced_commands": len(synced) if 'synced' in locals() else 0
+        "shard_count": shard_tracker.shard_count(),
+        "synced_commands": synced_count,
+        "skipped_syncs": command_syncer.skipped
     })
+    
+    startup_timer.end('gateway')
+    startup_timer.finish(Config.STARTUP_BUDGET_SECONDS)
+
+@bot.event
+async def on_connect():
+    if not shard_tracker.sharded:
+        shard_tracker.connected(bot.shard_id)
+
+@bot.event
+async def on_disconnect():
+    if not shard_tracker.sharded:
+        shard_tracker.disconnected(bot.shard_id)
+        logger.warning("Disconnected from the gateway")
+
+@bot.event
+async def on_resumed():
+    if not shard_tracker.sharded:
+        shard_tracker.resumed(bot.shard_id)
+        logger.info("Gateway session resumed")
+
+@bot.event
+async def on_shard_connect(shard_id):
+    shard_tracker.connected(shard_id)
+
+@bot.event
+async def on_shard_ready(shard_id):
+    """Only this shard's state is touched, other shards keep running untouched"""
+    state = shard_tracker.ready(shard_id)
+    took = f" in {state.ready_time:.1f}s" if state.ready_time is not None else ""
+    logger.info(f"Shard {shard_id} ready{took} ({shard_tracker.ready_count()}/{shard_tracker.shard_count()} ready)")
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    state = shard_tracker.disconnected(shard_id)
+    logger.warning(f"Shard {shard_id} disconnected ({state.disconnects} disconnect(s) so far)")
+
+@bot.event
+async def on_shard_resumed(shard_id):
+    shard_tracker.resumed(shard_id)
+    logger.info(f"Shard {shard_id} resumed its session")
+
+def record_command_metrics(ctx, status):
+    """Count a finished command and observe its latency if it got as far as invoking"""
+    command_name = ctx.command.qualified_name if ctx.command else "unknown"
+    metrics.COMMANDS_TOTAL.inc(command=command_name, status=status)
+    
+    started = getattr(ctx, 'invoke_started_at', None)
+    if started is not None:
+        metrics.COMMAND_LATENCY.observe(time.perf_counter() - started, command=command_name, status=status)
+
+def collect_bot_metrics():
+    """Refresh gauges that are read straight from the client at scrape time"""
+    metrics.VOICE_CLIENTS.set(len(bot.voice_clients))
+    
+    for shard_id, latency in shard_tracker.latencies():
+        metrics.GATEWAY_LATENCY.set(latency, shard=shard_id)
+    metrics.SHARDS_READY.set(shard_tracker.ready_count())
+    
+    depth, dropped = log_queue_stats()
+    metrics.LOG_QUEUE_DEPTH.set(depth)
+    metrics.LOG_RECORDS_DROPPED.set_total(dropped)
+
+metrics.REGISTRY.add_collector('bot', collect_bot_metrics)
+
+def collect_cluster_stats():
+    """Stats sent to the cluster orchestrator with every heartbeat"""
+    voice_clients = bot.voice_clients
+    latencies = [latency for _, latency in shard_tracker.latencies()]
+    return {
+        "ready": shard_tracker.ready_once,
+        "guilds": len(bot.guilds),
+        "voice_clients": len(voice_clients),
+        "players": sum(1 for voice_client in voice_clients if voice_client.is_playing()),
+        "shards_ready": shard_tracker.ready_count(),
+        "latency_ms": round(sum(latencies) / len(latencies) * 1000) if latencies else None,
+        "loop_lag_ms": round(loop_monitor.max_lag * 1000),
+    }
+
+cluster_client = None
+if Config.CLUSTER_ID is not None:
+    cluster_client = ClusterClient(
+        Config.CLUSTER_ID,
+        Config.CLUSTER_IPC_HOST,
+        Config.CLUSTER_IPC_PORT,
+        Config.CLUSTER_IPC_TOKEN,
+        collect_cluster_stats,
+        interval=Config.CLUSTER_HEARTBEAT_INTERVAL
+    )
+
+@bot.before_invoke
+async def mark_invoke_start(ctx):
+    """Apply rate limits, then remember when the command body started for latency metrics and lag reports"""
+    rate_limiter.enforce(ctx)
+    ctx.invoke_started_at = time.perf_counter()
+    loop_monitor.tag_current_task(ctx.command.qualified_name)
+
+@bot.after_invoke
+async def mark_invoke_end(ctx):
+    loop_monitor.untag_current_task()
 
 @bot.event
 async def on_command_error(ctx, error):
     """Global error handler for commands"""
+    if isinstance(error, commands.CommandOnCooldown):
+        # Throttling is expected under load, keep it out of the error log
+        logger.info(f"Throttled {ctx.command} for {ctx.author} ({error.type.name} bucket, retry in {error.retry_after:.1f}s)")
+        record_command_metrics(ctx, "throttled")
+        if error.type is commands.BucketType.guild:
+            await ctx.send(f"⏱️ This server is using `{ctx.command}` too often. Try again in {error.retry_after:.2f} seconds.")
+        elif error.type is commands.BucketType.default:
+            await ctx.send(f"⏱️ `{ctx.command}` is busy everywhere right now. Try again in {error.retry_after:.2f} seconds.")
+        else:
+            await ctx.send(f"⏱️ Command on cooldown. Try again in {error.retry_after:.2f} seconds.")
+        return
+    
     logger.error(f"Command error in {ctx.command}: {error}")
     log_command(ctx, ctx.command.name if ctx.command else "unknown", success=False, error=error)
+    record_command_metrics(ctx, "error")
     
     if isinstance(error, commands.CommandNotFound):
-        await ctx.send("❌ Command not found. Use `!help` to see available commands.")
+        await ctx.send(f"❌ Command not found. Use `{ctx.clean_prefix}help` to see available commands.")
     elif isinstance(error, commands.MissingPermissions):
         await ctx.send("❌ You don't have permission to use this command.")
     elif isinstance(error, commands.BotMissingPermissions):
         await ctx.send("❌ I don't have the required permissions to do that.")
-    elif isinstance(error, commands.CommandOnCooldown):
-        await ctx.send(f"⏱️ Command on cooldown. Try again in {error.retry_after:.2f} seconds.")
     else:
         await ctx.send(f"❌ An error occurred: {str(error)}")
         logger.error(f"Unhandled error: {error}", exc_info=True)
+        await report_error(ctx, error)
+
+async def report_error(ctx, error):
+    """Post an unexpected command error to the guild's log channel, if it has one"""
+    channel = configured_channel(ctx.guild, 'log_channel')
+    if channel is None:
+        return
+    
+    embed = discord.Embed(
+        title="⚠️ Command Error",
+        description=f"`{ctx.message.content[:200]}`",
+        color=discord.Color.red(),
+        timestamp=ctx.message.created_at
+    )
+    embed.add_field(name="Error", value=str(error)[:1024] or type(error).__name__, inline=False)
+    embed.add_field(name="User", value=ctx.author.mention, inline=True)
+    embed.add_field(name="Channel", value=ctx.channel.mention, inline=True)
+    try:
+        await channel.send(embed=embed)
+    except discord.HTTPException as e:
+        logger.warning(f"Failed to report an error to the log channel of {ctx.guild}: {e}")
 
 @bot.event
 async def on_command_completion(ctx):
     """Log successful command completion"""
     log_command(ctx, ctx.command.name, success=True)
+    record_command_metrics(ctx, "success")
 
 @bot.event
 async def on_guild_join(guild):
@@ -98,11 +309,23 @@ async def on_guild_join(guild):
 async def on_guild_remove(guild):
     """Log when bot leaves a guild"""
     logger.info(f"Left guild: {guild.name} (ID: {guild.id})")
+    guild_settings.forget(guild.id)
     log_bot("guild_leave", {
         "guild_name": guild.name,
         "guild_id": guild.id
     })
 
+def configured_channel(guild, name):
+    """A channel from the guild's settings, if it still exists"""
+    if guild is None:
+        return None
+    channel_id = guild_settings.get(guild.id, name)
+    return guild.get_channel(channel_id) if channel_id else None
+
+def announcement_channel(guild):
+    """The guild's configured announcement channel, if it still exists"""
+    return configured_channel(guild, 'announce_channel')
+
 @bot.command(name='announce', help='Make the bot announce a message')
 async def announce(ctx, *, message: str):
     """
@@ -121,14 +344,20 @@ async def announce(ctx, *, message: str):
     )
     embed.set_footer(text=f"Announced by {ctx.author.name}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
     
-    await ctx.send(embed=embed)
+    channel = announcement_channel(ctx.guild) or ctx.channel
+    await channel.send(embed=embed)
 
 @bot.command(name='ping', help='Check bot latency')
 async def ping(ctx):
     """Shows the bot's latency"""
-    latency = round(bot.latency * 1000)
+    shard_id = ctx.guild.shard_id if ctx.guild else 0
+    shard = bot.get_shard(shard_id) if shard_tracker.sharded else None
+    latency = round((shard.latency if shard else bot.latency) * 1000)
     logger.debug(f"Ping command: {latency}ms latency")
-    await ctx.send(f'🏓 Pong! Latency: {latency}ms')
+    if shard_tracker.sharded:
+        await ctx.send(f'🏓 Pong! Latency: {latency}ms (shard {shard_id})')
+    else:
+        await ctx.send(f'🏓 Pong! Latency: {latency}ms')
 
 @bot.command(name='echo', help='Repeat a message')
 async def echo(ctx, *, message: str):
@@ -148,7 +377,8 @@ async def serverinfo(ctx):
     )
     embed.set_thumbnail(url=guild.icon.url if guild.icon else None)
     embed.add_field(name="Server ID", value=guild.id, inline=True)
-    embed.add_field(name="Owner", value=guild.owner.mention, inline=True)
+    # Mention by ID, the owner is usually not in the member cache
+    embed.add_field(name="Owner", value=f"<@{guild.owner_id}>", inline=True)
     embed.add_field(name="Members", value=guild.member_count, inline=True)
     embed.add_field(name="Created At", value=guild.created_at.strftime("%Y-%m-%d"), inline=True)
     embed.add_field(name="Text Channels", value=len(guild.text_channels), inline=True)
@@ -173,7 +403,12 @@ async def announce_slash(interaction: discord.Interaction, message: str, channel
     """Advanced slash command for announcements"""
     logger.info(f"Slash announcement by {interaction.user} in {interaction.guild}")
     
-    target_channel = channel or interaction.channel
+    retry_after, scope = rate_limiter.check('announce_slash', interaction.user.id, interaction.guild_id)
+    if scope:
+        await interaction.response.send_message(f"⏱️ Announcements are on cooldown. Try again in {retry_after:.0f} seconds.", ephemeral=True)
+        return
+    
+    target_channel = channel or announcement_channel(interaction.guild) or interaction.channel
     
     if not target_channel.permissions_for(interaction.guild.me).send_messages:
         await interaction.response.send_message("❌ I don't have permission to send messages in that channel!", ephemeral=True)
@@ -198,78 +433,433 @@ async def load_extensions():
         logger.info('Created cogs directory')
         print('Created cogs directory')
     
-    for filename in os.listdir('./cogs'):
+    for filename in sorted(os.listdir('./cogs')):
         if filename.endswith('.py') and not filename.startswith('_'):
             try:
+                started = time.perf_counter()
                 await bot.load_extension(f'cogs.{filename[:-3]}')
+                startup_timer.cogs[filename[:-3]] = time.perf_counter() - started
                 logger.info(f'Loaded cog: {filename[:-3]}')
                 print(f'Loaded cog: {filename[:-3]}')
             except Exception as e:
                 logger.error(f'Failed to load cog {filename[:-3]}: {e}')
                 print(f'Failed to load cog {filename[:-3]}: {e}')
 
-@bot.command(name='logs', help='Get recent log information (Admin only)')
-@commands.has_permissions(administrator=True)
-async def logs(ctx, lines: int = 10):
-    """Show recent log entries"""
-    try:
-        with open('logs/bot.log', 'r') as f:
-            log_lines = f.readlines()
-            recent_logs = log_lines[-lines:] if len(log_lines) >= lines else log_lines
-            
+class LogFilters(commands.FlagConverter):
+    """Filters for the logs command, e.g. `level: ERROR module: Music guild: 1234 match: timeout`"""
+    level: str = None
+    module: str = None
+    guild: str = None
+    match: str = None
+
+
+class LogPages(discord.ui.View):
+    """Button pagination for log output, usable only by the invoking admin"""
+    
+    def __init__(self, author_id, title, pages):
+        super().__init__(timeout=120)
+        self.author_id = author_id
+        self.title = title
+        self.pages = pages
+        self.page = len(pages) - 1  # Start on the newest entries
+        self.message = None
+        self._update_buttons()
+    
+    def embed(self):
         embed = discord.Embed(
-            title=f"📋 Recent {len(recent_logs)} Log Entries",
-            description=f"```\n{''.join(recent_logs)[:1900]}\n```",
+            title=self.title,
+            description=f"```\n{self.pages[self.page]}\n```",
             color=discord.Color.blue()
         )
-        await ctx.send(embed=embed)
-        
+        embed.set_footer(text=f"Page {self.page + 1}/{len(self.pages)}")
+        return embed
+    
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= len(self.pages) - 1
+    
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.author_id
+    
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+    
+    @discord.ui.button(label='◀ Older', style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.page -= 1
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+    
+    @discord.ui.button(label='Newer ▶', style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        self.page += 1
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+def paginate_records(records, page_size=1900):
+    """Split log records into code-block sized pages"""
+    pages = []
+    current = ''
+    for record in records:
+        record = record.replace('```', '` ` `')[:page_size]
+        if current and len(current) + len(record) + 1 > page_size:
+            pages.append(current)
+            current = ''
+        current = f"{current}\n{record}" if current else record
+    if current:
+        pages.append(current)
+    return pages
+
+@bot.command(name='logs', help='Get recent log information (Admin only)')
+@commands.has_permissions(administrator=True)
+async def logs(ctx, lines: typing.Optional[int] = 10, *, filters: LogFilters):
+    """
+    Show recent log entries without blocking the event loop
+    Usage: !logs [lines] [level: ERROR] [module: Music] [guild: <id or name>] [match: <text>]
+    """
+    lines = max(1, min(lines, Config.LOGS_MAX_LINES))
+    loop = asyncio.get_event_loop()
+    
+    try:
+        records, truncated = await loop.run_in_executor(None, lambda: tail_records(
+            Config.LOG_FILE,
+            lines,
+            max_bytes=Config.LOGS_READ_MAX_BYTES,
+            time_budget=Config.LOGS_READ_TIME_BUDGET,
+            level=filters.level,
+            module=filters.module,
+            guild=filters.guild,
+            text=filters.match
+        ))
     except FileNotFoundError:
         await ctx.send("❌ Log file not found!")
+        return
     except Exception as e:
         await ctx.send(f"❌ Error reading logs: {e}")
+        return
+    
+    if not records:
+        note = " (scan limit reached)" if truncated else ""
+        await ctx.send(f"📋 No matching log entries{note}.")
+        return
+    
+    title = f"📋 Recent {len(records)} Log Entries"
+    if truncated:
+        title += " (scan limit reached)"
+    
+    pages = paginate_records(records)
+    if len(pages) == 1:
+        view = None
+        embed = discord.Embed(
+            title=title,
+            description=f"```\n{pages[0]}\n```",
+            color=discord.Color.blue()
+        )
+    else:
+        view = LogPages(ctx.author.id, title, pages)
+        embed = view.embed()
+    
+    message = await ctx.send(embed=embed, view=view)
+    if view:
+        view.message = message
 
-def upgrade_yt_dlp():
-    """Upgrade yt-dlp to the latest version"""
+@bot.command(name='synccommands', help='Sync slash commands if they changed (Owner only)')
+@commands.is_owner()
+async def synccommands(ctx, mode: str = None):
+    """
+    Sync application commands, skipping unchanged scopes unless forced
+    Usage: !synccommands [force]
+    """
+    async with ctx.typing():
+        synced_count, skipped = await command_syncer.sync(force=mode == 'force')
+    
+    if skipped and not synced_count:
+        await ctx.send(f"✅ Command tree unchanged, sync skipped ({command_syncer.skipped} skipped this run). Use `force` to sync anyway.")
+    else:
+        await ctx.send(f"✅ Synced {synced_count} command(s).")
+
+@bot.command(name='reload', help='Reload a cog without restarting the bot (Owner only)')
+@commands.is_owner()
+async def reload(ctx, name: str):
+    """
+    Reload one extension from disk; the music cog keeps its voice sessions and queues
+    Usage: !reload <cog>
+    """
+    extension = f'cogs.{name.lower()}'
+    started = time.perf_counter()
     try:
-        logger.info("Upgrading yt-dlp...")
-        print("🔄 Upgrading yt-dlp to latest version...")
-        
-        result = subprocess.run([
-            sys.executable, "-m", "pip", "install", "yt-dlp", "--upgrade"
-        ], capture_output=True, text=True, check=True)
-        
-        logger.info("yt-dlp upgrade completed successfully")
-        print("✅ yt-dlp upgraded successfully")
-        
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to upgrade yt-dlp: {e}")
-        logger.error(f"Error output: {e.stderr}")
-        print(f"❌ Failed to upgrade yt-dlp: {e}")
-        print("Bot will continue running with current yt-dlp version...")
-    except Exception as e:
-        logger.error(f"Unexpected error during yt-dlp upgrade: {e}")
-        print(f"❌ Unexpected error during yt-dlp upgrade: {e}")
-        print("Bot will continue running...")
+        # Only a reload parks state for the next instance, a plain unload tears down
+        with handoff.reloading(name.lower()):
+            await bot.reload_extension(extension)
+    except commands.ExtensionNotLoaded:
+        await ctx.send(f"❌ `{name}` is not loaded.")
+        return
+    except commands.ExtensionError as e:
+        # discord.py puts the previous version back when the new one fails to load
+        logger.error(f"Failed to reload {extension}: {e}")
+        await ctx.send(f"❌ Reload failed, the previous version is still running: {e}")
+        return
+    
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.warning(f"Reloaded {extension} in {elapsed:.0f}ms, requested by {ctx.author}")
+    await ctx.send(f"🔄 Reloaded `{name}` in {elapsed:.0f}ms.")
+
+@bot.command(name='lagreport', help='Show the worst event loop blockers (Admin only)')
+@commands.has_permissions(administrator=True)
+async def lagreport(ctx, limit: typing.Optional[int] = 5, action: str = None):
+    """
+    Ranked report of callbacks that held the event loop past the lag threshold
+    Usage: !lagreport [limit] [reset]
+    """
+    if action == 'reset':
+        loop_monitor.reset()
+        await ctx.send("✅ Lag report cleared.")
+        return
+    
+    blockers = loop_monitor.report(max(1, min(limit, 10)))
+    embed = discord.Embed(
+        title="🐢 Event Loop Blockers",
+        description=f"Worst lag seen: {loop_monitor.max_lag * 1000:.0f}ms | Threshold: {loop_monitor.threshold * 1000:.0f}ms",
+        color=discord.Color.orange()
+    )
+    
+    if not blockers:
+        embed.description += "\nNo blocking callbacks recorded. 🎉"
+    
+    for i, blocker in enumerate(blockers, 1):
+        stack = blocker.stack[-700:]
+        embed.add_field(
+            name=f"{i}. {blocker.location}"[:256],
+            value=(
+                f"Blocked {blocker.count}x | total {blocker.total * 1000:.0f}ms | worst {blocker.worst * 1000:.0f}ms\n"
+                f"Coroutine: `{blocker.coroutine or 'unknown'}` | Command: `{blocker.command or 'none'}`\n"
+                f"```\n{stack}\n```"
+            )[:1024],
+            inline=False
+        )
+    
+    await ctx.send(embed=embed)
+
+@bot.command(name='shards', help='Show per-shard status, latency and guild counts')
+async def shards(ctx):
+    """Per-shard readiness, latency and guild counts"""
+    rows = shard_tracker.table()
+    lines = [f"{'shard':>5} {'status':<12} {'latency':>8} {'guilds':>7} {'drops':>5} {'resumes':>7}"]
+    for shard_id, status, latency, guilds, disconnects, resumes in rows:
+        latency_text = f"{latency}ms" if latency is not None else "-"
+        lines.append(f"{shard_id:>5} {status:<12} {latency_text:>8} {guilds:>7} {disconnects:>5} {resumes:>7}")
+    
+    table = '\n'.join(lines)
+    if len(table) > 3900:
+        table = table[:3900] + '\n...'
+    
+    embed = discord.Embed(
+        title="🧩 Shards",
+        description=f"{shard_tracker.summary()}\n```\n{table}\n```",
+        color=discord.Color.blue()
+    )
+    if ctx.guild:
+        embed.set_footer(text=f"This server is on shard {ctx.guild.shard_id}")
+    await ctx.send(embed=embed)
+
+@bot.command(name='clusterstats', help='Show stats aggregated across every cluster')
+async def clusterstats(ctx):
+    """Guilds, players and shards summed across cluster processes"""
+    if cluster_client is None:
+        await ctx.send(f"ℹ️ Not running in cluster mode. {shard_tracker.summary()}")
+        return
+    
+    try:
+        stats = await cluster_client.request('stats')
+    except ClusterError as e:
+        await ctx.send(f"❌ {e}")
+        return
+    
+    totals = stats['totals']
+    embed = discord.Embed(
+        title="🗄️ Cluster Stats",
+        description=(
+            f"Clusters: {totals['clusters_up']}/{totals['clusters']} up | "
+            f"Shards: {totals['shards_ready']}/{totals['shards']} ready\n"
+            f"Guilds: {totals['guilds']} | Active players: {totals['players']} | "
+            f"Voice clients: {totals['voice_clients']}"
+        ),
+        color=discord.Color.blue()
+    )
+    
+    for cluster in stats['clusters'][:25]:
+        cluster_stats = cluster['stats']
+        shard_ids = cluster['shard_ids']
+        marker = " (this cluster)" if cluster['cluster_id'] == Config.CLUSTER_ID else ""
+        latency = cluster_stats.get('latency_ms')
+        embed.add_field(
+            name=f"Cluster {cluster['cluster_id']}{marker}",
+            value=(
+                f"Status: {cluster['status']} | Restarts: {cluster['restarts']}\n"
+                f"Shards {shard_ids[0]}-{shard_ids[-1]} | Guilds: {cluster_stats.get('guilds', 0)}\n"
+                f"Players: {cluster_stats.get('players', 0)} | "
+                f"Latency: {f'{latency}ms' if latency is not None else '-'}"
+            ),
+            inline=True
+        )
+    
+    await ctx.send(embed=embed)
+
+@bot.command(name='restartcluster', help='Restart one cluster process (Owner only)')
+@commands.is_owner()
+async def restartcluster(ctx, cluster_id: int):
+    """Restart a single cluster without touching the others"""
+    if cluster_client is None:
+        await ctx.send("❌ Not running in cluster mode.")
+        return
+    
+    try:
+        await cluster_client.request('restart', cluster_id=cluster_id)
+    except ClusterError as e:
+        await ctx.send(f"❌ {e}")
+        return
+    
+    logger.warning(f"Cluster {cluster_id} restart requested by {ctx.author}")
+    await ctx.send(f"🔄 Restarting cluster {cluster_id}...")
+
+@bot.command(name='ffmpeg', help='Show FFmpeg CPU and memory use per server (Admin only)')
+@commands.has_permissions(administrator=True)
+async def ffmpeg(ctx):
+    """Resource use of the supervised playback FFmpeg processes, busiest servers first"""
+    usage = ffmpeg_supervisor.usage()
+    total_cpu = sum(entry.cpu_percent for _, entries in usage for entry in entries)
+    total_rss = sum(entry.rss for _, entries in usage for entry in entries)
+    
+    embed = discord.Embed(
+        title="🎛️ FFmpeg Processes",
+        description=(
+            f"Processes: {len(ffmpeg_supervisor.processes)} | CPU: {total_cpu:.0f}% | "
+            f"Memory: {total_rss / (1024 * 1024):.0f}MB | Killed: {ffmpeg_supervisor.kills}"
+        ),
+        color=discord.Color.dark_teal()
+    )
+    
+    now = time.monotonic()
+    for guild_id, entries in usage[:10]:
+        guild = bot.get_guild(guild_id)
+        lines = [
+            f"PID {entry.pid} | {entry.cpu_percent:.0f}% CPU | {entry.rss / (1024 * 1024):.0f}MB | "
+            f"{entry.fds} fds | up {int(now - entry.started_at)}s | last audio {now - entry.source.last_frame_at:.0f}s ago"
+            for entry in entries
+        ]
+        embed.add_field(name=guild.name if guild else str(guild_id), value="\n".join(lines), inline=False)
+    
+    if not ffmpeg_supervisor.running:
+        embed.set_footer(text="Supervision is disabled (FFMPEG_SUPERVISOR_ENABLED=false)")
+    
+    await ctx.send(embed=embed)
+
+@bot.command(name='throttles', help='Show rate limit and extraction queue stats (Admin only)')
+@commands.has_permissions(administrator=True)
+async def throttles(ctx):
+    """How many requests were throttled, per command and scope"""
+    embed = discord.Embed(
+        title="🚦 Throttling",
+        description=(
+            f"Throttled requests: {rate_limiter.total_throttled() + extraction_gate.rejected}\n"
+            f"Extractions: {extraction_gate.running}/{extraction_gate.max_running} running, "
+            f"{extraction_gate.waiting}/{extraction_gate.max_waiting} waiting, "
+            f"{extraction_gate.rejected} rejected"
+        ),
+        color=discord.Color.orange()
+    )
+    
+    for (command_name, scope), count in rate_limiter.throttled.most_common(10):
+        uses, per = rate_limiter.limits_for(command_name)[scope]
+        embed.add_field(name=f"{command_name} ({scope})", value=f"{count} throttled | limit {uses} per {per}s", inline=True)
+    
+    await ctx.send(embed=embed)
 
 async def main():
     """Main function to run the bot"""
-    # Upgrade yt-dlp before starting the bot
-    upgrade_yt_dlp()
+    startup_timer.record('imports', time.perf_counter() - PROCESS_STARTED)
     
     logger.info("Starting Discord bot...")
     log_bot("bot_starting")
     
+    # The yt-dlp version check is opt-in and never delays login
+    version_check = None
+    if Config.YTDLP_VERSION_CHECK:
+        version_check = asyncio.create_task(check_yt_dlp_version(
+            os.path.join(Config.DATA_DIR, 'yt_dlp_version.json'),
+            max_age_hours=Config.YTDLP_CHECK_INTERVAL_HOURS,
+            auto_upgrade=Config.YTDLP_AUTO_UPGRADE
+        ))
+    
+    metrics_server = None
+    if Config.METRICS_ENABLED:
+        # Each cluster process gets its own port: METRICS_PORT + cluster id
+        metrics_server = metrics.MetricsServer(Config.METRICS_HOST, Config.METRICS_PORT + (Config.CLUSTER_ID or 0))
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.error(f"Failed to start metrics endpoint: {e}")
+            metrics_server = None
+    
+    if Config.LOOP_MONITOR_ENABLED:
+        loop_monitor.threshold = Config.LOOP_LAG_THRESHOLD_MS / 1000
+        loop_monitor.start()
+    
+    if Config.FFMPEG_SUPERVISOR_ENABLED:
+        ffmpeg_supervisor.start()
+    
+    if cluster_client:
+        cluster_client.start()
+        # The orchestrator stops workers with SIGTERM, close the gateway cleanly
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+        except NotImplementedError:
+            pass
+    
     async with bot:
-        await load_extensions()
         try:
-            await bot.start(Config.DISCORD_TOKEN)
+            # Cog loading and the login request are independent, run them together
+            await asyncio.gather(
+                startup_timer.measure('extensions', load_extensions()),
+                startup_timer.measure('login', bot.login(Config.DISCORD_TOKEN)),
+                startup_timer.measure('settings', asyncio.get_running_loop().run_in_executor(
+                    None, guild_settings.open, os.path.join(Config.DATA_DIR, 'guild_settings.db')
+                )),
+                startup_timer.measure('history', asyncio.get_running_loop().run_in_executor(
+                    None, play_history.open, os.path.join(Config.DATA_DIR, 'play_history.db')
+                ))
+            )
+            guild_settings.start(Config.SETTINGS_FLUSH_INTERVAL)
+            play_history.start(Config.HISTORY_FLUSH_INTERVAL)
+            startup_timer.begin('gateway')
+            await bot.connect()
         except Exception as e:
             logger.error(f"Failed to start bot: {e}")
             log_bot("bot_start_failed", {"error": str(e)})
             raise
+        finally:
+            if version_check and not version_check.done():
+                version_check.cancel()
+            if metrics_server:
+                await metrics_server.stop()
+            await loop_monitor.stop()
+            await ffmpeg_supervisor.stop()
+            await guild_settings.stop()
+            await play_history.stop()
+            loudness_cache.close()
+            if cluster_client:
+                await cluster_client.stop()
 
 if __name__ == '__main__':
+    if '--cluster' in sys.argv:
+        from cluster import main as cluster_main
+        asyncio.run(cluster_main())
+        sys.exit(0)
+    
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
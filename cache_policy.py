@@ -0,0 +1,37 @@
+import discord
+
+
+def build_intents(low_memory=False):
+    """Gateway intents for the bot, trimmed to what is actually used in low-memory mode"""
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.guilds = True
+    intents.guild_messages = True
+    
+    if low_memory:
+        # Each of these fills a per-guild cache or sends events no cog handles
+        intents.emojis_and_stickers = False
+        intents.integrations = False
+        intents.webhooks = False
+        intents.invites = False
+        intents.guild_scheduled_events = False
+        intents.auto_moderation = False
+        intents.typing = False
+    
+    return intents
+
+
+def client_options(intents, low_memory=False, max_messages=1000):
+    """Cache-related keyword arguments for the bot constructor"""
+    if not low_memory:
+        return {'max_messages': max_messages}
+    
+    # Only members in voice channels stay cached, the alone-in-channel check needs them
+    member_cache_flags = discord.MemberCacheFlags.none()
+    member_cache_flags.voice = intents.voice_states
+    
+    return {
+        'member_cache_flags': member_cache_flags,
+        'max_messages': max_messages or None,
+        'chunk_guilds_at_startup': False,
+    }
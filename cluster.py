@@ -0,0 +1,499 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import secrets
+import itertools
+
+from config import Config
+from logger import get_logger
+
+logger = get_logger("Cluster")
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+GATEWAY_BOT_URL = 'https://discord.com/api/v10/gateway/bot'
+
+# Restart backoff: doubles per consecutive failure, reset once a worker stays up long enough
+BASE_BACKOFF = 2
+MAX_BACKOFF = 300
+STABLE_UPTIME = 300
+SUMMARY_INTERVAL = 60
+
+
+class ClusterError(Exception):
+    """Raised when a cluster IPC request fails"""
+
+
+def plan_clusters(shard_count, cluster_count):
+    """Split shard ids into contiguous groups, one group per cluster"""
+    cluster_count = max(1, min(cluster_count, shard_count))
+    size, extra = divmod(shard_count, cluster_count)
+    
+    groups = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        end = start + size + (1 if cluster_id < extra else 0)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+
+async def fetch_recommended_shards(token, timeout=10):
+    """Ask Discord how many shards the bot should run"""
+    import aiohttp
+    
+    headers = {'Authorization': f'Bot {token}'}
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        async with session.get(GATEWAY_BOT_URL, headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data['shards']
+
+
+def _encode(message):
+    """IPC messages are newline-delimited JSON"""
+    return (json.dumps(message, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+
+
+class Worker:
+    """One cluster process and what the orchestrator knows about it"""
+    
+    def __init__(self, cluster_id, shard_ids):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.process = None
+        self.writer = None
+        self.status = 'stopped'
+        self.started_at = None
+        self.last_heartbeat = None
+        self.stats = {}
+        self.restarts = 0
+        self.failures = 0
+        self.manual_restart = False
+        self.ready = asyncio.Event()
+    
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+    
+    def as_dict(self):
+        now = time.monotonic()
+        return {
+            'cluster_id': self.cluster_id,
+            'shard_ids': self.shard_ids,
+            'status': self.status,
+            'pid': self.process.pid if self.alive else None,
+            'restarts': self.restarts,
+            'uptime': round(now - self.started_at) if self.alive and self.started_at else 0,
+            'heartbeat_age': round(now - self.last_heartbeat, 1) if self.last_heartbeat else None,
+            'stats': self.stats,
+        }
+
+
+class ClusterOrchestrator:
+    """Run groups of shards in separate bot processes and keep them alive
+    
+    Workers connect back over a local TCP socket, send heartbeats carrying
+    their stats, and can ask for cluster-wide stats or a cluster restart.
+    A worker that exits or stops heartbeating is restarted with backoff;
+    the other clusters keep running.
+    """
+    
+    def __init__(self, shard_count, cluster_count, host='127.0.0.1', port=9200,
+                 heartbeat_timeout=60, startup_timeout=300, worker_args=()):
+        self.shard_count = shard_count
+        self.host = host
+        self.port = port
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_timeout = startup_timeout
+        self.worker_args = list(worker_args)
+        self.token = secrets.token_hex(16)
+        self.workers = [Worker(cluster_id, shard_ids)
+                        for cluster_id, shard_ids in enumerate(plan_clusters(shard_count, cluster_count))]
+        
+        self._server = None
+        self._stopping = False
+        self._stop_event = None
+        self._tasks = []
+    
+    async def run(self):
+        self._stop_event = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(
+            f"Cluster orchestrator listening on {self.host}:{self.port}: "
+            f"{len(self.workers)} cluster(s), {self.shard_count} shard(s)"
+        )
+        
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except NotImplementedError:
+                pass
+        
+        self._tasks.append(asyncio.create_task(self._health_check()))
+        
+        # One cluster at a time, so IDENTIFYs from different processes don't collide
+        for worker in self.workers:
+            if self._stopping:
+                break
+            self._tasks.append(asyncio.create_task(self._supervise(worker)))
+            await self._wait_ready(worker)
+        
+        try:
+            await self._stop_event.wait()
+        finally:
+            await self.shutdown()
+    
+    def request_stop(self):
+        logger.info("Cluster shutdown requested")
+        self._stopping = True
+        self._stop_event.set()
+    
+    async def _wait_ready(self, worker):
+        deadline = time.monotonic() + self.startup_timeout
+        while not worker.ready.is_set() and not self._stopping:
+            if time.monotonic() > deadline:
+                logger.warning(
+                    f"Cluster {worker.cluster_id} not ready after {self.startup_timeout}s, "
+                    f"starting the next one anyway"
+                )
+                return
+            await asyncio.sleep(0.5)
+    
+    async def _spawn(self, worker):
+        env = dict(
+            os.environ,
+            CLUSTER_ID=str(worker.cluster_id),
+            CLUSTER_COUNT=str(len(self.workers)),
+            SHARD_COUNT=str(self.shard_count),
+            SHARD_IDS=','.join(str(shard_id) for shard_id in worker.shard_ids),
+            CLUSTER_IPC_HOST=self.host,
+            CLUSTER_IPC_PORT=str(self.port),
+            CLUSTER_IPC_TOKEN=self.token,
+        )
+        worker.process = await asyncio.create_subprocess_exec(
+            sys.executable, BOT_SCRIPT, *self.worker_args, env=env
+        )
+        worker.status = 'starting'
+        worker.started_at = time.monotonic()
+        worker.last_heartbeat = None
+        worker.stats = {}
+        worker.ready.clear()
+        logger.info(f"Started cluster {worker.cluster_id} (pid {worker.process.pid}, shards {worker.shard_ids})")
+    
+    async def _supervise(self, worker):
+        """Keep one worker running, restarting it with backoff when it dies"""
+        while not self._stopping:
+            try:
+                await self._spawn(worker)
+            except OSError as e:
+                logger.error(f"Failed to start cluster {worker.cluster_id}: {e}")
+            else:
+                await worker.process.wait()
+                if self._stopping:
+                    break
+            
+            uptime = time.monotonic() - (worker.started_at or time.monotonic())
+            worker.status = 'restarting'
+            worker.ready.clear()
+            worker.restarts += 1
+            
+            if worker.manual_restart:
+                worker.manual_restart = False
+                delay = 0
+                logger.info(f"Restarting cluster {worker.cluster_id} on request")
+            else:
+                if uptime >= STABLE_UPTIME:
+                    worker.failures = 0
+                worker.failures += 1
+                delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (worker.failures - 1))
+                logger.error(
+                    f"Cluster {worker.cluster_id} exited (code {worker.process.returncode if worker.process else None}) "
+                    f"after {uptime:.0f}s, restarting in {delay}s"
+                )
+            
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        
+        worker.status = 'stopped'
+    
+    async def _terminate(self, worker, timeout=10):
+        if not worker.alive:
+            return
+        worker.process.terminate()
+        try:
+            await asyncio.wait_for(worker.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Cluster {worker.cluster_id} ignored SIGTERM, killing it")
+            worker.process.kill()
+            await worker.process.wait()
+    
+    async def restart_worker(self, cluster_id):
+        """Restart one cluster, leaving the others connected"""
+        worker = self.workers[cluster_id]
+        # Give the requesting worker time to receive its response first
+        await asyncio.sleep(1)
+        worker.manual_restart = True
+        await self._terminate(worker)
+    
+    async def _health_check(self):
+        """Kill workers whose event loop stopped heartbeating; the supervisor restarts them"""
+        last_summary = time.monotonic()
+        while not self._stopping:
+            await asyncio.sleep(max(1, self.heartbeat_timeout / 4))
+            now = time.monotonic()
+            
+            for worker in self.workers:
+                if not worker.alive or worker.status == 'restarting':
+                    continue
+                since = worker.last_heartbeat or worker.started_at
+                if since and now - since > self.heartbeat_timeout:
+                    logger.error(f"Cluster {worker.cluster_id} missed heartbeats for {now - since:.0f}s, killing it")
+                    worker.process.kill()
+            
+            if now - last_summary >= SUMMARY_INTERVAL:
+                last_summary = now
+                logger.info(self.summary())
+    
+    async def _handle_connection(self, reader, writer):
+        worker = None
+        try:
+            line = await asyncio.wait_for(reader.readline(), 10)
+            hello = json.loads(line or b'{}')
+            cluster_id = hello.get('cluster_id')
+            if (hello.get('op') != 'hello'
+                    or not secrets.compare_digest(str(hello.get('token', '')), self.token)
+                    or not isinstance(cluster_id, int) or not 0 <= cluster_id < len(self.workers)):
+                logger.warning("Rejected an IPC connection with a bad hello")
+                return
+            
+            worker = self.workers[cluster_id]
+            worker.writer = writer
+            worker.last_heartbeat = time.monotonic()
+            worker.status = 'running'
+            
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                
+                op = message.get('op')
+                if op == 'heartbeat':
+                    worker.last_heartbeat = time.monotonic()
+                    worker.stats = message.get('stats') or {}
+                    if worker.stats.get('ready'):
+                        worker.ready.set()
+                elif op == 'request':
+                    writer.write(_encode(self._handle_request(message)))
+                    await writer.drain()
+        
+        except (asyncio.TimeoutError, ConnectionError, ValueError) as e:
+            logger.debug(f"IPC connection closed: {e}")
+        finally:
+            if worker is not None and worker.writer is writer:
+                worker.writer = None
+            writer.close()
+    
+    def _handle_request(self, message):
+        action = message.get('action')
+        args = message.get('args') or {}
+        response = {'op': 'response', 'id': message.get('id'), 'ok': True}
+        
+        if action == 'stats':
+            response['data'] = self.cluster_stats()
+        elif action == 'restart':
+            cluster_id = args.get('cluster_id')
+            if not isinstance(cluster_id, int) or not 0 <= cluster_id < len(self.workers):
+                return dict(response, ok=False, error=f"Unknown cluster {cluster_id}")
+            task = asyncio.create_task(self.restart_worker(cluster_id))
+            self._tasks.append(task)
+            task.add_done_callback(self._restart_done)
+            response['data'] = {'cluster_id': cluster_id}
+        else:
+            return dict(response, ok=False, error=f"Unknown action {action}")
+        return response
+    
+    def _restart_done(self, task):
+        """Forget a finished restart task and log why it failed, if it did"""
+        if task in self._tasks:
+            self._tasks.remove(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Cluster restart failed: {task.exception()!r}")
+    
+    def cluster_stats(self):
+        """Per-cluster status plus totals aggregated from the latest heartbeats"""
+        clusters = [worker.as_dict() for worker in self.workers]
+        totals = {'shards': self.shard_count, 'clusters': len(self.workers)}
+        totals['clusters_up'] = sum(1 for worker in self.workers if worker.status == 'running')
+        for key in ('guilds', 'players', 'voice_clients', 'shards_ready'):
+            totals[key] = sum(worker.stats.get(key, 0) for worker in self.workers)
+        return {'clusters': clusters, 'totals': totals}
+    
+    def summary(self):
+        totals = self.cluster_stats()['totals']
+        return (
+            f"Clusters {totals['clusters_up']}/{totals['clusters']} up | "
+            f"shards {totals['shards_ready']}/{totals['shards']} ready | "
+            f"{totals['guilds']} guild(s) | {totals['players']} player(s)"
+        )
+    
+    async def shutdown(self):
+        self._stopping = True
+        await asyncio.gather(*(self._terminate(worker) for worker in self.workers))
+        
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        
+        for worker in self.workers:
+            if worker.writer is not None:
+                worker.writer.close()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        logger.info("Cluster orchestrator stopped")
+
+
+class ClusterClient:
+    """Worker side of the IPC channel: heartbeats, stats and cluster-wide requests"""
+    
+    def __init__(self, cluster_id, host, port, token, stats_provider, interval=10):
+        self.cluster_id = cluster_id
+        self.host = host
+        self.port = port
+        self.token = token
+        self.stats_provider = stats_provider
+        self.interval = interval
+        
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._writer = None
+        self._task = None
+    
+    @property
+    def connected(self):
+        return self._writer is not None
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                logger.warning(f"Cannot reach the cluster orchestrator: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+            
+            delay = 1
+            self._writer = writer
+            reader_task = asyncio.create_task(self._read(reader))
+            try:
+                await self._send({'op': 'hello', 'cluster_id': self.cluster_id, 'token': self.token, 'pid': os.getpid()})
+                while not reader_task.done():
+                    await self._send({'op': 'heartbeat', 'stats': self._collect_stats()})
+                    await asyncio.wait([reader_task], timeout=self.interval)
+                logger.warning("Cluster orchestrator closed the IPC connection")
+            except ConnectionError as e:
+                logger.warning(f"Lost connection to the cluster orchestrator: {e}")
+            finally:
+                reader_task.cancel()
+                self._writer = None
+                writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ClusterError("Lost connection to the cluster orchestrator"))
+                self._pending.clear()
+            
+            await asyncio.sleep(delay)
+    
+    async def _read(self, reader):
+        async for line in reader:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get('op') == 'response':
+                future = self._pending.pop(message.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+    
+    async def _send(self, message):
+        self._writer.write(_encode(message))
+        await self._writer.drain()
+    
+    def _collect_stats(self):
+        try:
+            return self.stats_provider()
+        except Exception as e:
+            logger.error(f"Failed to collect cluster stats: {e}")
+            return {}
+    
+    async def request(self, action, timeout=5, **args):
+        """Send a request to the orchestrator and wait for its response data"""
+        if self._writer is None:
+            raise ClusterError("Not connected to the cluster orchestrator")
+        
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._send({'op': 'request', 'id': request_id, 'action': action, 'args': args})
+            message = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise ClusterError(f"Cluster request '{action}' timed out")
+        except ConnectionError as e:
+            raise ClusterError(f"Lost connection to the cluster orchestrator: {e}")
+        finally:
+            self._pending.pop(request_id, None)
+        
+        if not message.get('ok'):
+            raise ClusterError(message.get('error', 'Cluster request failed'))
+        return message.get('data')
+
+
+async def main(argv=None):
+    """Entry point for `python bot.py --cluster`"""
+    argv = sys.argv[1:] if argv is None else argv
+    worker_args = [arg for arg in argv if arg != '--cluster']
+    
+    Config.validate()
+    shard_count = Config.SHARD_COUNT
+    if not shard_count:
+        shard_count = await fetch_recommended_shards(Config.DISCORD_TOKEN)
+        logger.info(f"Discord recommends {shard_count} shard(s)")
+    cluster_count = Config.CLUSTER_COUNT or os.cpu_count() or 1
+    
+    orchestrator = ClusterOrchestrator(
+        shard_count,
+        cluster_count,
+        host=Config.CLUSTER_IPC_HOST,
+        port=Config.CLUSTER_IPC_PORT,
+        heartbeat_timeout=Config.CLUSTER_HEARTBEAT_TIMEOUT,
+        startup_timeout=Config.CLUSTER_STARTUP_TIMEOUT,
+        worker_args=worker_args
+    )
+    await orchestrator.run()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,8 +1,22 @@
 import discord
 from discord.ext import commands
 from datetime import datetime
+import time
 import random
 
+from purge import PurgeFilter, stream_purge
+from config import Config
+
+
+class PurgeFlags(commands.FlagConverter):
+    """Filters for the purge command, e.g. `user: @someone contains: free nitro bots: yes`"""
+    user: discord.User = None
+    contains: str = None
+    bots: bool = False
+    before: discord.Message = None
+    after: discord.Message = None
+
+
 class General(commands.Cog):
     """General commands for the bot"""
     
@@ -18,6 +32,9 @@ class General(commands.Cog):
     async def userinfo(self, ctx, member: discord.Member = None):
         """Shows information about a user"""
         member = member or ctx.author
+        if member.joined_at is None:
+            # Partial member (e.g. with the member cache trimmed), fetch the full one only now
+            member = await ctx.guild.fetch_member(member.id)
         
         embed = discord.Embed(
             title=f"User Info - {member.name}",
@@ -99,7 +116,7 @@ class General(commands.Cog):
         Requires: Manage Messages permission
         """
         if amount < 1 or amount > 100:
-            await ctx.send('❌ Please provide a number between 1 and 100')
+            await ctx.send('❌ Please provide a number between 1 and 100 (use `!purge` for more)')
             return
         
         deleted = await ctx.channel.purge(limit=amount + 1)
@@ -107,25 +124,58 @@ class General(commands.Cog):
         msg = await ctx.send(f'✅ Deleted {len(deleted) - 1} messages')
         await msg.delete(delay=5)
     
-    @commands.command(name='poll', help='Create a simple yes/no poll')
-    async def poll(self, ctx, *, question: str):
+    @commands.command(name='purge', help='Delete up to 10,000 matching messages from the channel')
+    @commands.has_permissions(manage_messages=True)
+    @commands.bot_has_permissions(manage_messages=True, read_message_history=True)
+    @commands.guild_only()
+    @commands.max_concurrency(1, commands.BucketType.channel)
+    async def purge(self, ctx, amount: int, *, filters: PurgeFlags):
         """
-        Create a simple yes/no poll
-        Example: !poll Should we have pizza for dinner?
+        Delete matching messages in bulk, pinned messages are kept
+        Usage: !purge <amount> [user: @someone] [contains: <text>] [bots: yes] [before: <message>] [after: <message>]
+        Requires: Manage Messages permission
         """
-        embed = discord.Embed(
-            title="📊 Poll",
-            description=question,
-            color=discord.Color.blue()
-        )
-        embed.set_footer(text=f"Poll by {ctx.author.name}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
+        if amount < 1 or amount > Config.PURGE_MAX_MESSAGES:
+            await ctx.send(f'❌ Please provide a number between 1 and {Config.PURGE_MAX_MESSAGES}')
+            return
         
-        poll_msg = await ctx.send(embed=embed)
+        message_filter = PurgeFilter(
+            author_id=filters.user.id if filters.user else None,
+            contains=filters.contains,
+            bots_only=filters.bots
+        )
         
-        await poll_msg.add_reaction('✅')
-        await poll_msg.add_reaction('❌')
+        bounds = [message for message in (filters.before, filters.after) if message is not None]
+        if any(message.channel.id != ctx.channel.id for message in bounds):
+            await ctx.send('❌ `before` and `after` must be messages in this channel')
+            return
         
         await ctx.message.delete()
+        status = await ctx.send(f'🧹 Purging up to {amount} messages...')
+        last_update = time.monotonic()
+        
+        async def show_progress(progress):
+            nonlocal last_update
+            # Edits share the channel's rate limit with the deletes, keep them rare
+            if time.monotonic() - last_update < Config.PURGE_PROGRESS_INTERVAL:
+                return
+            last_update = time.monotonic()
+            await status.edit(content=f'🧹 Purging... {progress.deleted}/{amount} deleted, {progress.scanned} scanned')
+        
+        progress = await stream_purge(
+            ctx.channel,
+            amount,
+            message_filter,
+            # Never newer than the command itself, so the status message is not caught
+            before=filters.before or ctx.message,
+            after=filters.after,
+            max_scan=Config.PURGE_MAX_SCAN,
+            single_delete_delay=Config.PURGE_SINGLE_DELETE_DELAY,
+            on_progress=show_progress
+        )
+        
+        await status.edit(content=f'✅ {progress.summary()}')
+        await status.delete(delay=10)
     
     @commands.command(name='avatar', help='Get user avatar')
     async def avatar(self, ctx, member: discord.Member = None):
@@ -1,10 +1,24 @@
 import discord
 import asyncio
-import yt_dlp as youtube_dl
 import re
+import time
+import random
+import threading
 
+from discord import app_commands
 from discord.ext import commands
 from logger import get_logger, log_music, log_voice
+from tracks import Track, track_cache, youtube_id
+from ratelimit import ExtractionQueueFull, extraction_gate
+from guild_settings import guild_settings
+from loudness import loudness_cache
+from now_playing import NowPlayingBoard, PlayerState, progress_bar
+from title_index import title_index
+from play_history import play_history
+from handoff import handoff
+from ffmpeg_supervisor import ffmpeg_supervisor
+from config import Config
+import metrics
 
 ytdl_format_options = {
     'format': 'bestaudio/best',
@@ -25,43 +39,123 @@ ffmpeg_options = {
     'options': '-vn',
 }
 
-ytdl = youtube_dl.YoutubeDL(ytdl_format_options)
-
 logger = get_logger("Music")
 
+# yt-dlp is expensive to import and set up, so it is built on first use
+# (normally from an executor thread) or warmed in the background after login
+_ytdl = None
+_ytdl_flat = None
+_ytdl_lock = threading.Lock()
+
+def get_ytdl():
+    """Get the shared YoutubeDL instance, importing yt-dlp on first use (thread-safe)"""
+    global _ytdl
+    if _ytdl is None:
+        with _ytdl_lock:
+            if _ytdl is None:
+                started = time.perf_counter()
+                import yt_dlp as youtube_dl
+                _ytdl = youtube_dl.YoutubeDL(ytdl_format_options)
+                logger.info(f"yt-dlp ready in {time.perf_counter() - started:.2f}s")
+    return _ytdl
+
+def get_flat_ytdl():
+    """Get the shared YoutubeDL for flat searches: one results page, no per-video format resolution"""
+    global _ytdl_flat
+    if _ytdl_flat is None:
+        with _ytdl_lock:
+            if _ytdl_flat is None:
+                import yt_dlp as youtube_dl
+                _ytdl_flat = youtube_dl.YoutubeDL({**ytdl_format_options, 'extract_flat': 'in_playlist'})
+    return _ytdl_flat
+
 class YTDLSource(discord.PCMVolumeTransformer):
-    def __init__(self, source, *, data, volume=0.5):
+    def __init__(self, source, *, track, volume=0.5):
         super().__init__(source, volume)
-        self.data = data
-        self.title = data.get('title')
-        self.url = data.get('url')
-        self.duration = data.get('duration')
-        self.thumbnail = data.get('thumbnail')
-        self.channel = data.get('channel')
-        self.view_count = data.get('view_count')
+        # Only the compact track is kept while playing, never the yt-dlp info dict
+        self.track = track
+        # Set from the voice thread, the FFmpeg supervisor reads it to spot stalled streams
+        self.last_frame_at = time.monotonic()
+    
+    def read(self):
+        data = super().read()
+        if data:
+            self.last_frame_at = time.monotonic()
+        return data
+    
+    @property
+    def title(self):
+        return self.track.title
+    
+    @property
+    def url(self):
+        return self.track.stream_url
+    
+    @property
+    def duration(self):
+        return self.track.duration
+    
+    @property
+    def thumbnail(self):
+        return self.track.thumbnail
+    
+    @property
+    def channel(self):
+        return self.track.channel
 
     @classmethod
-    async def from_url(cls, url, *, loop=None, stream=False):
+    async def from_url(cls, url, *, loop=None, stream=False, track=None, start_at=0):
         loop = loop or asyncio.get_event_loop()
         
+        # The search already resolved a stream URL, reuse it while it is still valid
+        if stream and track is not None and track.stream_usable():
+            logger.debug(f"Reusing resolved stream URL for: {track.title}")
+            return cls.from_stream(track.stream_url, track, start_at=start_at)
+        
         try:
-            data = await loop.run_in_executor(None, lambda: ytdl.extract_info(url, download=not stream))
+            # Playback never gets rejected by the extraction cap, it only waits at the front of the line
+            async with extraction_gate.slot(reject=False):
+                started = time.perf_counter()
+                data = await loop.run_in_executor(None, lambda: get_ytdl().extract_info(url, download=not stream))
+            metrics.EXTRACTION_LATENCY.observe(time.perf_counter() - started, kind='stream')
             
             if 'entries' in data:
                 data = data['entries'][0]
 
-            filename = data['url'] if stream else ytdl.prepare_filename(data)
+            filename = data['url'] if stream else get_ytdl().prepare_filename(data)
+            playing = Track.from_info(
+                data,
+                requester_id=track.requester_id if track else None,
+                requester_name=track.requester_name if track else None
+            )
+            del data
             
-            source = cls(discord.FFmpegPCMAudio(filename, **ffmpeg_options), data=data)
+            source = cls.from_stream(filename, playing, stream=stream, start_at=start_at)
             
-            asyncio.create_task(cls._log_extraction_success(data.get('title', 'Unknown')))
+            asyncio.create_task(cls._log_extraction_success(playing.title))
             
             return source
             
         except Exception as e:
+            metrics.EXTRACTION_FAILURES.inc(kind='stream')
             asyncio.create_task(cls._log_extraction_error(url, str(e)))
             raise
 
+    @classmethod
+    def from_stream(cls, filename, track, stream=True, start_at=0):
+        """FFmpeg source for a resolved URL or file, with the track's stored loudness gain applied"""
+        options = dict(ffmpeg_options)
+        if start_at:
+            # Input seeking, so a restarted track picks up where it stopped without decoding the start
+            options['before_options'] = f"-ss {start_at:.1f} {options['before_options']}"
+        audio_filter = loudness_cache.filter_for(track.video_id)
+        if audio_filter:
+            options['options'] = f"{options['options']} -af {audio_filter}"
+        elif stream and not start_at:
+            # First play of this track: measure it alongside playback, the next play is normalised
+            loudness_cache.request_analysis(track.video_id, filename)
+        return cls(discord.FFmpegPCMAudio(filename, **options), track=track)
+
     @staticmethod
     async def _log_extraction_success(title):
         """Async logging for successful extraction"""
@@ -72,6 +166,54 @@ class YTDLSource(discord.PCMVolumeTransformer):
         """Async logging for extraction errors"""
         logger.error(f"Failed to extract info for URL {url}: {error}")
 
+def _after_play(bot, ctx):
+    """Playback end callback that looks the cog up when the track ends
+    
+    A reload replaces the cog while tracks play, so the callback must not
+    hold on to the instance that started the track.
+    """
+    def after(error):
+        music = bot.get_cog('Music')
+        if music is not None:
+            asyncio.run_coroutine_threadsafe(music.play_next(ctx), bot.loop)
+    return after
+
+def _restart_killed(bot, guild_id):
+    """FFmpeg supervisor callback queueing a killed track again, also looked up at call time"""
+    def on_killed(track, restarts):
+        music = bot.get_cog('Music')
+        if music is not None:
+            music.queue_restart(guild_id, track, restarts)
+    return on_killed
+
+class SearchPicker(discord.ui.View):
+    """Select menu of search results, usable only by whoever searched"""
+    
+    def __init__(self, author_id, results, format_duration):
+        super().__init__(timeout=Config.SEARCH_PICK_TIMEOUT)
+        self.author_id = author_id
+        self.results = results
+        self.choice = None
+        self.pick.options = [
+            discord.SelectOption(
+                label=f"{i}. {track.title}"[:100],
+                description=f"{track.channel or 'Unknown'} | {format_duration(track.duration)}"[:100],
+                value=str(i - 1)
+            )
+            for i, track in enumerate(results, 1)
+        ]
+    
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.author_id
+    
+    @discord.ui.select(placeholder='Pick a song to play')
+    async def pick(self, interaction, select):
+        self.choice = self.results[int(select.values[0])]
+        await interaction.response.edit_message(
+            content=f"🎵 Picked **{discord.utils.escape_markdown(self.choice.title)}**", embed=None, view=None
+        )
+        self.stop()
+
 class Music(commands.Cog):
     """Music commands for the bot"""
     
@@ -79,7 +221,168 @@ class Music(commands.Cog):
         self.bot = bot
         self.voice_clients = {}
         self.music_queues = {}
+        self.players = {}
+        # Context that started the current track, per guild, for resuming after a reload
+        self.contexts = {}
+        # Guilds between tracks while the next one is being extracted
+        self.loading = set()
+        # Track the FFmpeg supervisor killed, per guild, with where to pick it up again
+        self.resume_at = {}
+        # Voice channel of each live session, and guilds reconnecting after a dropped connection
+        self.voice_channels = {}
+        self.recovering = set()
+        # Guilds whose voice channel went away without !leave, until it is clear who did it
+        self.disconnecting = set()
+        self.now_playing = NowPlayingBoard(self._now_playing_embed, window=Config.NOW_PLAYING_EDIT_WINDOW)
+        self._warm_task = None
+        self._voice_task = None
+        metrics.REGISTRY.add_collector('music', self._collect_metrics)
         logger.info("Music cog initialized")
+    
+    async def cog_load(self):
+        # The index outlives reloads of this cog, only the first load seeds it
+        if not title_index.seeded:
+            asyncio.create_task(self._seed_title_index())
+        self._warm_task = asyncio.create_task(self._warm_popular_tracks())
+        self._voice_task = asyncio.create_task(self._watch_voice())
+        
+        state = handoff.take('music')
+        if state is not None:
+            self._adopt(state)
+    
+    def _adopt(self, state):
+        """Take over the live sessions of the instance this one replaces
+        
+        Voice clients belong to the bot and keep playing through a reload;
+        queues, players and the player messages move over by reference.
+        """
+        started = time.perf_counter()
+        self.music_queues = state['queues']
+        self.players = state['players']
+        self.contexts = state['contexts']
+        self.loading = state['loading']
+        self.resume_at = state['resume_at']
+        self.voice_channels = state['voice_channels']
+        self.recovering = state['recovering']
+        # Missing when taking over from a version without it
+        self.disconnecting = state.get('disconnecting', set())
+        self.now_playing = state['now_playing']
+        self.now_playing.render = self._now_playing_embed
+        
+        # A track that ended mid-reload found no cog to call, start the next one here
+        resumed = 0
+        for guild_id, ctx in list(self.contexts.items()):
+            voice_client = ctx.guild.voice_client
+            if voice_client is None or voice_client.is_playing() or voice_client.is_paused():
+                continue
+            if guild_id in self.loading:
+                continue
+            asyncio.create_task(self.play_next(ctx))
+            resumed += 1
+        
+        logger.info(
+            f"Adopted {len(self.contexts)} live session(s), resumed {resumed}, "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+    
+    async def _seed_title_index(self):
+        """Fill the autocomplete index from the play history, read-only"""
+        # The history database is opened alongside login
+        await self.bot.wait_until_ready()
+        loop = asyncio.get_running_loop()
+        try:
+            rows = await loop.run_in_executor(None, play_history.track_plays)
+        except Exception as e:
+            logger.warning(f"Could not seed title autocomplete from the play history: {e}")
+            return
+        # Tracks from elsewhere have no video ID and are skipped
+        title_index.seed((title, youtube_id(url), guild_id, plays) for title, url, guild_id, plays in rows)
+        logger.info(f"Title autocomplete seeded with {len(title_index)} track(s)")
+    
+    async def _warm_popular_tracks(self):
+        """Resolve each guild's most played tracks ahead of time, so requesting them right after a deploy is instant
+        
+        Runs at startup and every HISTORY_WARM_INTERVAL_HOURS (stream URLs expire after a few hours).
+        One lookup at a time, and only while no user is waiting for an extraction slot.
+        """
+        await self.bot.wait_until_ready()
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            try:
+                top = await loop.run_in_executor(None, lambda: play_history.top_tracks_per_guild(
+                    [guild.id for guild in self.bot.guilds], Config.HISTORY_WARM_TOP_N
+                ))
+            except Exception as e:
+                logger.warning(f"Could not read popular tracks to warm: {e}")
+                top = {}
+            
+            # Most played first, each URL once, across this process's guilds
+            counts = {}
+            for rows in top.values():
+                for _, url, plays in rows:
+                    counts[url] = counts.get(url, 0) + plays
+            urls = sorted(counts, key=counts.get, reverse=True)[:Config.HISTORY_WARM_MAX_TRACKS]
+            
+            warmed = 0
+            started = time.perf_counter()
+            for url in urls:
+                # Only YouTube tracks can be served from the cache
+                video_id = youtube_id(url)
+                if video_id is None or track_cache.get(video_id) is not None:
+                    continue
+                while extraction_gate.waiting:
+                    await asyncio.sleep(1)
+                try:
+                    async with extraction_gate.slot(command_name='warm'):
+                        data = await loop.run_in_executor(None, lambda: get_ytdl().extract_info(url, download=False))
+                except ExtractionQueueFull:
+                    break
+                except Exception as e:
+                    logger.debug(f"Failed to warm {url}: {e}")
+                    continue
+                
+                track = Track.from_info(data)
+                del data
+                track_cache.put(track)
+                title_index.add(track.title, youtube_id(track.webpage_url), plays=0)
+                warmed += 1
+            
+            if urls:
+                logger.info(f"Warmed {warmed} of {len(urls)} popular track(s) in {time.perf_counter() - started:.1f}s")
+            
+            if not Config.HISTORY_WARM_INTERVAL_HOURS:
+                return
+            await asyncio.sleep(Config.HISTORY_WARM_INTERVAL_HOURS * 3600)
+    
+    def cog_unload(self):
+        metrics.REGISTRY.remove_collector('music')
+        if self._warm_task:
+            self._warm_task.cancel()
+        if self._voice_task:
+            self._voice_task.cancel()
+        if not handoff.is_reloading('music'):
+            self.now_playing.close()
+            return
+        # Pending player message edits render through whichever instance adopts the board
+        handoff.park('music', {
+            'queues': self.music_queues,
+            'players': self.players,
+            'contexts': self.contexts,
+            'loading': self.loading,
+            'resume_at': self.resume_at,
+            'voice_channels': self.voice_channels,
+            'recovering': self.recovering,
+            'disconnecting': self.disconnecting,
+            'now_playing': self.now_playing,
+        })
+    
+    def _collect_metrics(self):
+        """Publish per-guild queue lengths at scrape time"""
+        metrics.QUEUE_LENGTH.clear()
+        for guild_id, queue in self.music_queues.items():
+            if queue:
+                metrics.QUEUE_LENGTH.set(len(queue), guild_id=guild_id)
         
     def get_queue(self, ctx):
         """Get the music queue for a guild"""
@@ -87,48 +390,240 @@ class Music(commands.Cog):
             self.music_queues[ctx.guild.id] = []
         return self.music_queues[ctx.guild.id]
     
+    def _now_playing_embed(self, guild_id):
+        """Player message for a guild: track, progress and what is up next"""
+        state = self.players.get(guild_id)
+        if state is None:
+            return None
+        
+        track = state.track
+        position = state.position()
+        embed = discord.Embed(
+            title="⏸️ Paused" if state.paused else "🎵 Now Playing",
+            description=f"[{track.title}]({track.webpage_url})",
+            color=discord.Color.orange() if state.paused else discord.Color.green()
+        )
+        if track.thumbnail:
+            embed.set_thumbnail(url=track.thumbnail)
+        
+        progress = f"`{progress_bar(position, track.duration)}` {int(position) // 60:02d}:{int(position) % 60:02d} / {self.format_duration(track.duration)}"
+        if track.duration and not state.paused:
+            # Discord renders relative timestamps client-side, so this stays current without edits
+            ends_at = int(time.time() + max(0, track.duration - position))
+            progress += f"\nEnds <t:{ends_at}:R>"
+        embed.add_field(name="Progress", value=progress, inline=False)
+        embed.add_field(name="Requested by", value=f"<@{track.requester_id}>" if track.requester_id else "Unknown", inline=True)
+        
+        queue = self.music_queues.get(guild_id) or []
+        if queue:
+            up_next = "\n".join(f"{i}. {song.title[:60]}" for i, song in enumerate(queue[:3], 1))
+            if len(queue) > 3:
+                up_next += f"\n...and {len(queue) - 3} more"
+            embed.add_field(name=f"Up Next ({len(queue)})", value=up_next, inline=False)
+        
+        return embed
+    
+    def _start_player(self, ctx, player, position=0.0, restarts=0):
+        """Start playback of a source and update the guild's player message"""
+        player.volume = guild_settings.get(ctx.guild.id, 'volume') / 100
+        ctx.voice_client.play(player, after=_after_play(self.bot, ctx))
+        ffmpeg_supervisor.watch(
+            ctx.guild.id, ctx.voice_client, player, on_killed=_restart_killed(self.bot, ctx.guild.id), restarts=restarts
+        )
+        self.players[ctx.guild.id] = PlayerState(player.track, position)
+        self.contexts[ctx.guild.id] = ctx
+        self.voice_channels[ctx.guild.id] = ctx.voice_client.channel.id
+        self.now_playing.request_update(ctx.guild.id, ctx.channel)
+        # Restarts and resumes continue a play that is already recorded
+        if not restarts and not position:
+            play_history.record(player.track, ctx.guild.id, player.track.requester_id)
+    
+    def queue_restart(self, guild_id, track, restarts):
+        """Put a track whose FFmpeg process was killed back at the front, to resume where it stopped"""
+        state = self.players.get(guild_id)
+        position = state.position() if state is not None and state.track is track else 0.0
+        # The old stream URL may be what stalled, extract a fresh one
+        track.stream_url = None
+        track.stream_expires = None
+        self.music_queues.setdefault(guild_id, []).insert(0, track)
+        self.resume_at[guild_id] = (track, position, restarts)
+    
+    def _stop_player(self, guild_id):
+        """Forget the playing track and turn the player message idle"""
+        self.contexts.pop(guild_id, None)
+        self.voice_channels.pop(guild_id, None)
+        if self.players.pop(guild_id, None) is not None:
+            self.now_playing.request_update(guild_id)
+    
+    def _voice_dropped(self, ctx):
+        """Keep the interrupted track at the front with its position, and start reconnecting"""
+        guild_id = ctx.guild.id
+        if guild_id in self.recovering:
+            return
+        
+        state = self.players.get(guild_id)
+        if state is not None:
+            # Freezes the position while the connection is down
+            state.pause()
+            queue = self.music_queues.setdefault(guild_id, [])
+            if not queue or queue[0] is not state.track:
+                queue.insert(0, state.track)
+            self.resume_at[guild_id] = (state.track, state.position(), 0)
+        
+        self.recovering.add(guild_id)
+        asyncio.create_task(self._recover_voice(ctx, time.perf_counter()))
+    
+    async def _recover_voice(self, ctx, started):
+        """Reconnect a dropped session with bounded exponential backoff and resume playback"""
+        guild = ctx.guild
+        delay = Config.VOICE_RECONNECT_BASE_DELAY
+        try:
+            for attempt in range(1, Config.VOICE_RECONNECT_ATTEMPTS + 1):
+                channel = guild.get_channel(self.voice_channels.get(guild.id))
+                if channel is None or guild.id not in self.contexts:
+                    break
+                
+                try:
+                    if guild.voice_client is not None:
+                        await guild.voice_client.disconnect(force=True)
+                    await channel.connect(timeout=Config.VOICE_CONNECT_TIMEOUT, reconnect=True)
+                except (asyncio.TimeoutError, discord.DiscordException, OSError) as e:
+                    logger.warning(f"Voice reconnect {attempt}/{Config.VOICE_RECONNECT_ATTEMPTS} in {guild.name} failed: {e!r}")
+                    # Jitter keeps guilds that dropped together from retrying in lockstep
+                    await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+                    delay = min(delay * 2, Config.VOICE_RECONNECT_MAX_DELAY)
+                    continue
+                
+                if guild.id not in self.contexts:
+                    # Left on purpose while reconnecting
+                    await guild.voice_client.disconnect()
+                    return
+                
+                await self.play_next(ctx)
+                elapsed = time.perf_counter() - started
+                metrics.VOICE_RECOVERY_LATENCY.observe(elapsed)
+                metrics.VOICE_RECOVERIES.inc(result='ok')
+                logger.info(f"Voice session in {guild.name} recovered after {attempt} attempt(s) in {elapsed:.1f}s")
+                log_music(ctx, "voice_recovered", {"channel": channel.name, "seconds": round(elapsed, 2), "attempts": attempt})
+                await ctx.channel.send(f"🔌 Voice connection dropped, back in {elapsed:.1f}s.")
+                return
+            
+            if guild.id not in self.contexts:
+                return
+            metrics.VOICE_RECOVERIES.inc(result='failed')
+            logger.error(f"Giving up on the voice session in {guild.name}")
+            self.music_queues[guild.id] = []
+            self.resume_at.pop(guild.id, None)
+            self._stop_player(guild.id)
+            await ctx.channel.send("❌ Lost the voice connection and could not get it back. Use !play to start again.")
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to report voice recovery in {guild.name}: {e}")
+        finally:
+            self.recovering.discard(guild.id)
+    
+    async def _left_voice(self, guild):
+        """The bot lost its voice channel without !leave or auto-leave
+        
+        discord.py keeps the voice client while it reconnects in place and drops
+        it once the connection is over, e.g. after a moderator disconnected the
+        bot. Only the second ends the session; a reconnect that stays down is
+        left to _watch_voice.
+        """
+        try:
+            deadline = time.monotonic() + Config.VOICE_CONNECT_TIMEOUT
+            while guild.voice_client is not None:
+                if guild.voice_client.is_connected() or time.monotonic() >= deadline:
+                    return
+                await asyncio.sleep(0.5)
+            
+            ctx = self.contexts.get(guild.id)
+            if ctx is None or guild.id in self.recovering:
+                return
+            logger.info(f"Disconnected from voice in {guild.name} by someone else, stopping playback")
+            self.music_queues[guild.id] = []
+            self.resume_at.pop(guild.id, None)
+            self._stop_player(guild.id)
+            log_music(ctx, "voice_disconnect", {"reason": "external"})
+            await ctx.channel.send("👋 Disconnected from voice, the queue was cleared.")
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to report the voice disconnect in {guild.name}: {e}")
+        finally:
+            self.disconnecting.discard(guild.id)
+    
+    async def _watch_voice(self):
+        """Notice sessions whose voice connection stayed down, e.g. after a voice server move
+        
+        discord.py reconnects in place first, which keeps the source playing; only a
+        connection still down after VOICE_STALE_AFTER seconds is torn down and rebuilt.
+        """
+        down_since = {}
+        while True:
+            await asyncio.sleep(Config.VOICE_CHECK_INTERVAL)
+            now = time.monotonic()
+            for guild_id, ctx in list(self.contexts.items()):
+                voice_client = ctx.guild.voice_client
+                connected = voice_client is not None and voice_client.is_connected()
+                if connected or guild_id in self.recovering or guild_id in self.disconnecting:
+                    down_since.pop(guild_id, None)
+                    continue
+                if now - down_since.setdefault(guild_id, now) >= Config.VOICE_STALE_AFTER:
+                    del down_since[guild_id]
+                    logger.warning(f"Voice connection in {ctx.guild.name} is down, reconnecting")
+                    self._voice_dropped(ctx)
+            for guild_id in [guild_id for guild_id in down_since if guild_id not in self.contexts]:
+                del down_since[guild_id]
+    
     async def play_next(self, ctx):
         """Play the next song in the queue"""
+        voice_client = ctx.guild.voice_client
+        if voice_client is None or not voice_client.is_connected():
+            if ctx.guild.id in self.disconnecting:
+                # Left the channel, _left_voice decides whether the session ends
+                return
+            if ctx.guild.id in self.contexts:
+                # The connection dropped under the player, keep the queue for the reconnect
+                self._voice_dropped(ctx)
+            else:
+                self._stop_player(ctx.guild.id)
+            return
+        
         queue = self.get_queue(ctx)
         
         if len(queue) > 0:
             next_song = queue.pop(0)
+            self.loading.add(ctx.guild.id)
+            position, restarts = 0.0, 0
+            resume = self.resume_at.pop(ctx.guild.id, None)
+            if resume is not None and resume[0] is next_song:
+                _, position, restarts = resume
             
             try:
-                player = await YTDLSource.from_url(next_song['url'], loop=self.bot.loop, stream=True)
-                ctx.voice_client.play(player, after=lambda e: asyncio.run_coroutine_threadsafe(
-                    self.play_next(ctx), self.bot.loop
-                ))
+                player = await YTDLSource.from_url(
+                    next_song.webpage_url, loop=self.bot.loop, stream=True, track=next_song, start_at=position
+                )
+                self._start_player(ctx, player, position, restarts)
                 
-                asyncio.create_task(self._log_and_announce_next(ctx, next_song, player))
+                asyncio.create_task(self._log_play_next(ctx, next_song))
                 
             except Exception as e:
                 asyncio.create_task(self._log_play_error(ctx, next_song, str(e)))
-                await ctx.send(f"❌ Error playing song: {str(e)}")
+                # Not ctx.send: a slash command's interaction token expires long before the queue does
+                await ctx.channel.send(f"❌ Error playing song: {str(e)}")
                 await self.play_next(ctx)  # Try next song
+            finally:
+                self.loading.discard(ctx.guild.id)
+        else:
+            self._stop_player(ctx.guild.id)
 
-    async def _log_and_announce_next(self, ctx, song_info, player):
-        """Async logging and announcement for next song"""
-        logger.info(f"Playing next song: {song_info['title']} in {ctx.guild.name}")
-        log_music(ctx, "play_next", song_info)
-        
-        # Send now playing message
-        embed = discord.Embed(
-            title="🎵 Now Playing",
-            description=f"[{player.title}]({song_info['url']})",
-            color=discord.Color.green()
-        )
-        if player.thumbnail:
-            embed.set_thumbnail(url=player.thumbnail)
-        embed.add_field(name="Duration", value=self.format_duration(player.duration), inline=True)
-        embed.add_field(name="Requested by", value=song_info['requester'].mention, inline=True)
-        
-        await ctx.send(embed=embed)
+    async def _log_play_next(self, ctx, song_info):
+        """Async logging for next song"""
+        logger.info(f"Playing next song: {song_info.title} in {ctx.guild.name}")
+        log_music(ctx, "play_next", song_info.as_log_info())
 
     async def _log_play_error(self, ctx, song_info, error):
         """Async logging for play errors"""
         logger.error(f"Error playing next song: {error}")
-        log_music(ctx, "play_next_error", song_info, error=error)
+        log_music(ctx, "play_next_error", song_info.as_log_info(), error=error)
     
     def format_duration(self, duration):
         """Format duration from seconds to MM:SS"""
@@ -137,8 +632,12 @@ class Music(commands.Cog):
             return f"{int(minutes):02d}:{int(seconds):02d}"
         return "Unknown"
     
-    async def search_youtube(self, query):
-        """Search YouTube and return the first result"""
+    async def search_youtube(self, query, on_queued=None):
+        """Look up a URL, or search YouTube and return the first result, as a Track
+        
+        Text searches are flat, the stream URL is resolved when the track is about to play.
+        Raises ExtractionQueueFull when too many lookups are already pending.
+        """
         loop = asyncio.get_event_loop()
         
         # Check if it's a URL
@@ -146,111 +645,251 @@ class Music(commands.Cog):
             r'(https?://)?(www\.)?(youtube\.com/(watch\?v=|embed/|v/)|youtu\.be/|youtube\.com/playlist\?list=)'
         )
         
-        search_query = query if url_pattern.match(query) else f"ytsearch:{query}"
+        if not url_pattern.match(query):
+            results = await self.search_tracks(query, 1, on_queued)
+            return results[0] if results else None
+        
+        # Warmed from the play history, or requested a moment ago, in any form of link
+        video_id = youtube_id(query)
+        cached = track_cache.get(video_id) if video_id else None
+        if cached is not None:
+            logger.debug(f"Resolved {query} from the track cache")
+            return cached
         
         try:
-            data = await loop.run_in_executor(None, lambda: ytdl.extract_info(search_query, download=False))
+            async with extraction_gate.slot(on_queued, command_name='play'):
+                started = time.perf_counter()
+                data = await loop.run_in_executor(None, lambda: get_ytdl().extract_info(query, download=False))
+            metrics.EXTRACTION_LATENCY.observe(time.perf_counter() - started, kind='search')
             
             if 'entries' in data and data['entries']:
                 # Get first result
-                video = data['entries'][0]
-                result = {
-                    'title': video.get('title', 'Unknown'),
-                    'url': video.get('webpage_url', video.get('url')),
-                    'duration': video.get('duration', 0),
-                    'thumbnail': video.get('thumbnail'),
-                    'channel': video.get('channel', 'Unknown')
-                }
+                result = Track.from_info(data['entries'][0])
+                track_cache.put(result)
                 # Log success asynchronously
                 asyncio.create_task(self._log_search_success(result))
                 return result
             elif 'title' in data:
                 # Direct URL result
-                result = {
-                    'title': data.get('title', 'Unknown'),
-                    'url': data.get('webpage_url', data.get('url')),
-                    'duration': data.get('duration', 0),
-                    'thumbnail': data.get('thumbnail'),
-                    'channel': data.get('channel', 'Unknown')
-                }
+                result = Track.from_info(data)
+                track_cache.put(result)
                 asyncio.create_task(self._log_search_success(result))
                 return result
+        except ExtractionQueueFull:
+            raise
         except Exception as e:
+            metrics.EXTRACTION_FAILURES.inc(kind='search')
             asyncio.create_task(self._log_search_error(query, str(e)))
             return None
 
+    async def search_tracks(self, query, limit, on_queued=None, command_name='play'):
+        """Top `limit` YouTube results for a text query, from a single flat results-page request
+        
+        Only title, URL, duration, channel and thumbnail come back; nothing is resolved per video.
+        Raises ExtractionQueueFull when too many lookups are already pending.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            async with extraction_gate.slot(on_queued, command_name=command_name):
+                started = time.perf_counter()
+                data = await loop.run_in_executor(
+                    None, lambda: get_flat_ytdl().extract_info(f"ytsearch{limit}:{query}", download=False)
+                )
+            metrics.EXTRACTION_LATENCY.observe(time.perf_counter() - started, kind='flat_search')
+        except ExtractionQueueFull:
+            raise
+        except Exception as e:
+            metrics.EXTRACTION_FAILURES.inc(kind='search')
+            asyncio.create_task(self._log_search_error(query, str(e)))
+            return []
+        
+        results = [Track.from_info(entry) for entry in data.get('entries') or [] if entry]
+        del data
+        if results:
+            asyncio.create_task(self._log_search_success(results[0]))
+        return results
+
     async def _log_search_success(self, result):
         """Async logging for successful search"""
-        logger.info(f"Found video: {result['title']} by {result['channel']}")
+        logger.info(f"Found video: {result.title} by {result.channel}")
 
     async def _log_search_error(self, query, error):
         """Async logging for search errors"""
         logger.error(f"Search error for query '{query}': {error}")
     
-    @commands.command(name='play', aliases=['p'], help='Play music from YouTube')
+    async def _progress(self, ctx, content):
+        """Show interim status on a deferred slash command, prefix commands just keep typing"""
+        if ctx.interaction is None:
+            return
+        try:
+            await ctx.interaction.edit_original_response(content=content)
+        except discord.HTTPException as e:
+            logger.debug(f"Failed to update deferred response: {e}")
+    
+    async def _reply(self, ctx, content=None, embed=None):
+        """Final answer: replaces the progress text of a slash command, a new message otherwise"""
+        if ctx.interaction is not None:
+            await ctx.interaction.edit_original_response(content=content, embed=embed)
+        else:
+            await ctx.send(content=content, embed=embed)
+    
+    async def _ensure_voice(self, ctx):
+        """Join the author's voice channel if needed, False (after telling them) when they are not in one"""
+        # Check if user is in a voice channel
+        if not ctx.author.voice:
+            await ctx.send("❌ You need to be in a voice channel to use this command!")
+            return False
+        
+        # Connect to voice channel if not already connected
+        if not ctx.voice_client:
+            channel = ctx.author.voice.channel
+            await channel.connect(timeout=Config.VOICE_CONNECT_TIMEOUT, reconnect=True)
+            asyncio.create_task(self._log_voice_connect(ctx, channel.name))
+        return True
+    
+    async def _enqueue_or_play(self, ctx, result):
+        """Queue a looked-up track, or start it straight away when nothing is playing"""
+        # Keep only the requester's ID and name, holding the Member would pin it in memory
+        result.requester_id = ctx.author.id
+        result.requester_name = ctx.author.display_name
+        title_index.add(result.title, youtube_id(result.webpage_url), ctx.guild.id)
+        
+        # If something is playing, add to queue
+        if ctx.voice_client.is_playing():
+            queue = self.get_queue(ctx)
+            queue.append(result)
+            asyncio.create_task(self._log_add_to_queue(ctx, result, len(queue)))
+            self.now_playing.request_update(ctx.guild.id, ctx.channel)
+            
+            embed = discord.Embed(
+                title="📋 Added to Queue",
+                description=f"[{result.title}]({result.webpage_url})",
+                color=discord.Color.blue()
+            )
+            if result.thumbnail:
+                embed.set_thumbnail(url=result.thumbnail)
+            embed.add_field(name="Duration", value=self.format_duration(result.duration), inline=True)
+            embed.add_field(name="Position", value=len(queue), inline=True)
+            embed.set_footer(text=f"Requested by {ctx.author.name}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
+            
+            await self._reply(ctx, embed=embed)
+        else:
+            await self._progress(ctx, f"🎶 Loading **{discord.utils.escape_markdown(result.title)}**...")
+            
+            # Play immediately to minimize URL expiration
+            try:
+                player = await YTDLSource.from_url(result.webpage_url, loop=self.bot.loop, stream=True, track=result)
+                self._start_player(ctx, player)
+                
+                asyncio.create_task(self._log_play_now(ctx, result))
+                
+            except Exception as e:
+                asyncio.create_task(self._log_play_immediate_error(ctx, result, str(e)))
+                await self._reply(ctx, f"❌ Error playing song: {str(e)}")
+                return
+            
+            # The player message carries the details, prefix commands need no extra reply
+            if ctx.interaction is not None:
+                await self._reply(ctx, f"▶️ Playing **{discord.utils.escape_markdown(result.title)}**")
+    
+    @commands.hybrid_command(name='play', aliases=['p'], help='Play music from YouTube')
+    @app_commands.describe(query='Song name or YouTube URL')
+    @commands.guild_only()
     async def play(self, ctx, *, query: str):
         """
         Play music from YouTube
-        Usage: !play <song name or YouTube URL>
+        Usage: !play <song name or YouTube URL> or /play
         """
+        # Slash commands must be acknowledged within 3 seconds, extraction often takes longer
+        await ctx.defer()
+        
+        # An autocomplete choice carries the video ID of a track played before
+        entry = title_index.entries.get(query) if ctx.interaction is not None else None
+        if entry is not None:
+            query = entry.url
+        
         # Log command usage asynchronously
         asyncio.create_task(self._log_play_command(ctx, query))
         
-        # Check if user is in a voice channel
-        if not ctx.author.voice:
-            await ctx.send("❌ You need to be in a voice channel to use this command!")
+        if not await self._ensure_voice(ctx):
             return
         
-        # Connect to voice channel if not already connected
-        if not ctx.voice_client:
-            channel = ctx.author.voice.channel
-            await channel.connect()
-            asyncio.create_task(self._log_voice_connect(ctx, channel.name))
+        async def announce_position(position):
+            message = f"⏳ Lots of songs are being looked up right now, yours is #{position} in line..."
+            if ctx.interaction is not None:
+                await self._progress(ctx, message)
+            else:
+                await ctx.send(message)
+        
+        await self._progress(ctx, f"🔎 Searching for **{discord.utils.escape_markdown(query[:100])}**...")
         
         # Search for the song
         async with ctx.typing():
-            result = await self.search_youtube(query)
+            try:
+                result = await self.search_youtube(query, on_queued=announce_position)
+            except ExtractionQueueFull as e:
+                logger.warning(f"Rejected play request from {ctx.author}: {e}")
+                await self._reply(ctx, "❌ Too many songs are being looked up right now. Please try again in a moment.")
+                return
             
             if not result:
                 asyncio.create_task(self._log_no_results(ctx, query))
-                await ctx.send("❌ No results found!")
+                await self._reply(ctx, "❌ No results found!")
                 return
             
-            # Add requester info
-            result['requester'] = ctx.author
-            
-            # If something is playing, add to queue
-            if ctx.voice_client.is_playing():
-                queue = self.get_queue(ctx)
-                queue.append(result)
-                asyncio.create_task(self._log_add_to_queue(ctx, result, len(queue)))
-                
-                embed = discord.Embed(
-                    title="📋 Added to Queue",
-                    description=f"[{result['title']}]({result['url']})",
-                    color=discord.Color.blue()
-                )
-                if result['thumbnail']:
-                    embed.set_thumbnail(url=result['thumbnail'])
-                embed.add_field(name="Duration", value=self.format_duration(result['duration']), inline=True)
-                embed.add_field(name="Position", value=len(queue), inline=True)
-                embed.set_footer(text=f"Requested by {ctx.author.name}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
-                
-                await ctx.send(embed=embed)
-            else:
-                # Play immediately to minimize URL expiration
-                try:
-                    player = await YTDLSource.from_url(result['url'], loop=self.bot.loop, stream=True)
-                    ctx.voice_client.play(player, after=lambda e: asyncio.run_coroutine_threadsafe(
-                        self.play_next(ctx), self.bot.loop
-                    ))
-                    
-                    # Log and send embed after playback starts
-                    asyncio.create_task(self._log_and_announce_play(ctx, result, player))
-                    
-                except Exception as e:
-                    asyncio.create_task(self._log_play_immediate_error(ctx, result, str(e)))
-                    await ctx.send(f"❌ Error playing song: {str(e)}")
+            await self._enqueue_or_play(ctx, result)
+
+    @play.autocomplete('query')
+    async def play_autocomplete(self, interaction, current):
+        """Suggest tracks already played, from memory only, well inside the autocomplete deadline"""
+        return [
+            app_commands.Choice(name=entry.title[:100], value=entry.video_id)
+            for entry in title_index.search(current, interaction.guild_id)
+        ]
+
+    @commands.command(name='search', help='Search YouTube and pick which result to play')
+    @commands.guild_only()
+    async def search(self, ctx, *, query: str):
+        """
+        Show the top results for a search and play the one you pick
+        Usage: !search <song name>
+        """
+        async with ctx.typing():
+            try:
+                results = await self.search_tracks(query, Config.SEARCH_RESULTS, command_name='search')
+            except ExtractionQueueFull as e:
+                logger.warning(f"Rejected search from {ctx.author}: {e}")
+                await ctx.send("❌ Too many songs are being looked up right now. Please try again in a moment.")
+                return
+        
+        if not results:
+            asyncio.create_task(self._log_no_results(ctx, query))
+            await ctx.send("❌ No results found!")
+            return
+        
+        embed = discord.Embed(
+            title=f"🔎 Results for {query[:200]}",
+            description="\n".join(
+                f"{i}. [{track.title[:80]}]({track.webpage_url}) ({self.format_duration(track.duration)})"
+                for i, track in enumerate(results, 1)
+            ),
+            color=discord.Color.blue()
+        )
+        view = SearchPicker(ctx.author.id, results, self.format_duration)
+        message = await ctx.send(embed=embed, view=view)
+        
+        if await view.wait() or view.choice is None:
+            try:
+                await message.edit(content="⌛ Search timed out.", embed=None, view=None)
+            except discord.HTTPException:
+                pass
+            return
+        
+        # Joining voice waits for the pick, the author may have moved channels meanwhile
+        if not await self._ensure_voice(ctx):
+            return
+        async with ctx.typing():
+            await self._enqueue_or_play(ctx, view.choice)
 
     async def _log_play_command(self, ctx, query):
         """Async logging for play command"""
@@ -268,36 +907,27 @@ class Music(commands.Cog):
 
     async def _log_add_to_queue(self, ctx, result, queue_position):
         """Async logging for adding to queue"""
-        logger.info(f"Added to queue: {result['title']} (position {queue_position})")
-        log_music(ctx, "add_to_queue", result)
+        logger.info(f"Added to queue: {result.title} (position {queue_position})")
+        log_music(ctx, "add_to_queue", result.as_log_info())
 
-    async def _log_and_announce_play(self, ctx, result, player):
-        """Async logging and announcement for immediate play"""
-        logger.info(f"Playing immediately: {result['title']}")
-        log_music(ctx, "play_now", result)
-        
-        embed = discord.Embed(
-            title="🎵 Now Playing",
-            description=f"[{player.title}]({result['url']})",
-            color=discord.Color.green()
-        )
-        if player.thumbnail:
-            embed.set_thumbnail(url=player.thumbnail)
-        embed.add_field(name="Duration", value=self.format_duration(player.duration), inline=True)
-        embed.add_field(name="Requested by", value=ctx.author.mention, inline=True)
-        
-        await ctx.send(embed=embed)
+    async def _log_play_now(self, ctx, result):
+        """Async logging for immediate play"""
+        logger.info(f"Playing immediately: {result.title}")
+        log_music(ctx, "play_now", result.as_log_info())
 
     async def _log_play_immediate_error(self, ctx, result, error):
         """Async logging for immediate play errors"""
         logger.error(f"Error playing song immediately: {error}")
-        log_music(ctx, "play_error", result, error=error)
+        log_music(ctx, "play_error", result.as_log_info(), error=error)
 
     @commands.command(name='pause', help='Pause the current song')
     async def pause(self, ctx):
         """Pause the current song"""
         if ctx.voice_client and ctx.voice_client.is_playing():
             ctx.voice_client.pause()
+            if ctx.guild.id in self.players:
+                self.players[ctx.guild.id].pause()
+                self.now_playing.request_update(ctx.guild.id, ctx.channel)
             asyncio.create_task(self._log_simple_command(ctx, "pause"))
             await ctx.send("⏸️ Music paused!")
         else:
@@ -308,14 +938,19 @@ class Music(commands.Cog):
         """Resume the paused song"""
         if ctx.voice_client and ctx.voice_client.is_paused():
             ctx.voice_client.resume()
+            if ctx.guild.id in self.players:
+                self.players[ctx.guild.id].resume()
+                self.now_playing.request_update(ctx.guild.id, ctx.channel)
             asyncio.create_task(self._log_simple_command(ctx, "resume"))
             await ctx.send("▶️ Music resumed!")
         else:
             await ctx.send("❌ Music is not paused!")
 
-    @commands.command(name='skip', aliases=['s'], help='Skip the current song')
+    @commands.hybrid_command(name='skip', aliases=['s'], help='Skip the current song')
+    @commands.guild_only()
     async def skip(self, ctx):
         """Skip the current song"""
+        await ctx.defer()
         if ctx.voice_client and ctx.voice_client.is_playing():
             ctx.voice_client.stop()
             asyncio.create_task(self._log_simple_command(ctx, "skip"))
@@ -334,6 +969,7 @@ class Music(commands.Cog):
                 self.music_queues[ctx.guild.id] = []
             
             ctx.voice_client.stop()
+            self._stop_player(ctx.guild.id)
             asyncio.create_task(self._log_stop_command(ctx, queue_length))
             await ctx.send("⏹️ Music stopped and queue cleared!")
         else:
@@ -350,9 +986,11 @@ class Music(commands.Cog):
         logger.info(f"Cleared queue of {queue_length} songs")
         log_music(ctx, "stop", {"queue_cleared": queue_length})
 
-    @commands.command(name='queue', aliases=['q'], help='Show the music queue')
+    @commands.hybrid_command(name='queue', aliases=['q'], help='Show the music queue')
+    @commands.guild_only()
     async def queue(self, ctx):
         """Show the music queue"""
+        await ctx.defer()
         queue = self.get_queue(ctx)
         
         if len(queue) == 0:
@@ -367,8 +1005,8 @@ class Music(commands.Cog):
         # Show up to 10 songs
         for i, song in enumerate(queue[:10], 1):
             embed.add_field(
-                name=f"{i}. {song['title'][:50]}",
-                value=f"Duration: {self.format_duration(song['duration'])} | Requested by: {song['requester'].mention}",
+                name=f"{i}. {song.title[:50]}",
+                value=f"Duration: {self.format_duration(song.duration)} | Requested by: <@{song.requester_id}>",
                 inline=False
             )
         
@@ -379,27 +1017,40 @@ class Music(commands.Cog):
 
     @commands.command(name='nowplaying', aliases=['np'], help='Show the current song')
     async def nowplaying(self, ctx):
-        """Show information about the current song"""
-        if ctx.voice_client and ctx.voice_client.source:
-            source = ctx.voice_client.source
-            
-            embed = discord.Embed(
-                title="🎵 Now Playing",
-                description=f"{source.title}",
-                color=discord.Color.green()
-            )
-            if hasattr(source, 'thumbnail') and source.thumbnail:
-                embed.set_thumbnail(url=source.thumbnail)
-            if hasattr(source, 'duration'):
-                embed.add_field(name="Duration", value=self.format_duration(source.duration), inline=True)
-            
-            await ctx.send(embed=embed)
+        """Move the live player message to the bottom of this channel"""
+        if ctx.voice_client and ctx.guild.id in self.players:
+            await self.now_playing.repost(ctx.guild.id, ctx.channel)
         else:
             await ctx.send("❌ No music is playing!")
 
-    @commands.command(name='volume', help='Change the volume (0-100)')
+    @commands.command(name='toptracks', help='Show the most played tracks in this server')
+    @commands.guild_only()
+    async def toptracks(self, ctx, days: int = None):
+        """
+        Most played tracks in this server
+        Usage: !toptracks [days]
+        """
+        since = time.time() - days * 86400 if days else None
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, lambda: play_history.top_tracks(ctx.guild.id, 10, since))
+        
+        if not rows:
+            await ctx.send("📋 Nothing has been played here yet!")
+            return
+        
+        embed = discord.Embed(
+            title=f"🏆 Top Tracks{f' (last {days} days)' if days else ''}",
+            description="\n".join(f"{i}. [{title[:60]}]({url}) - {plays} play(s)" for i, (title, url, plays) in enumerate(rows, 1)),
+            color=discord.Color.gold()
+        )
+        await ctx.send(embed=embed)
+    
+    @commands.hybrid_command(name='volume', help='Change the volume (0-100)')
+    @app_commands.describe(volume='Volume from 0 to 100')
+    @commands.guild_only()
     async def volume(self, ctx, volume: int):
         """Change the player volume"""
+        await ctx.defer()
         if not ctx.voice_client:
             await ctx.send("❌ Not connected to a voice channel!")
             return
@@ -427,6 +1078,8 @@ class Music(commands.Cog):
                 queue_length = len(self.music_queues[ctx.guild.id])
                 self.music_queues[ctx.guild.id] = []
             
+            # Forget the session first, so the disconnect is not taken for a dropped connection
+            self._stop_player(ctx.guild.id)
             await ctx.voice_client.disconnect()
             asyncio.create_task(self._log_leave_command(ctx, queue_length))
             await ctx.send("👋 Disconnected from voice channel!")
@@ -453,7 +1106,7 @@ class Music(commands.Cog):
             asyncio.create_task(self._log_voice_move(ctx, channel.name))
             await ctx.send(f"📍 Moved to {channel.name}")
         else:
-            await channel.connect()
+            await channel.connect(timeout=Config.VOICE_CONNECT_TIMEOUT, reconnect=True)
             asyncio.create_task(self._log_voice_join(ctx, channel.name))
             await ctx.send(f"🔊 Connected to {channel.name}")
 
@@ -467,9 +1120,25 @@ class Music(commands.Cog):
         logger.info(f"Connected to voice channel: {channel_name}")
         log_music(ctx, "voice_connect", {"channel": channel_name})
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Warm yt-dlp off the event loop so the first !play does not pay for it"""
+        if _ytdl is None:
+            loop = asyncio.get_event_loop()
+            loop.run_in_executor(None, get_ytdl)
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
         """Auto-leave when alone in voice channel"""
+        if member.id == self.bot.user.id and after.channel is not None and member.guild.id in self.voice_channels:
+            # Moved by !join or a moderator, reconnect there if the connection drops
+            self.voice_channels[member.guild.id] = after.channel.id
+        elif member.id == self.bot.user.id and after.channel is None:
+            guild_id = member.guild.id
+            # !leave and auto-leave forget the session first, a reconnect of our own is in `recovering`
+            if guild_id in self.contexts and guild_id not in self.recovering and guild_id not in self.disconnecting:
+                self.disconnecting.add(guild_id)
+                asyncio.create_task(self._left_voice(member.guild))
         if member.bot:
             return  # Ignore bot voice state changes
             
@@ -490,8 +1159,9 @@ class Music(commands.Cog):
     async def _handle_alone_in_channel(self, voice_client, guild):
         """Handle being alone in voice channel"""
         channel_name = voice_client.channel.name
-        logger.info(f"Bot is alone in {channel_name}, waiting 30 seconds...")
-        await asyncio.sleep(30)  # Wait 30 seconds
+        idle_timeout = guild_settings.get(guild.id, 'idle_timeout')
+        logger.info(f"Bot is alone in {channel_name}, waiting {idle_timeout} seconds...")
+        await asyncio.sleep(idle_timeout)
         
         # Check again
         if voice_client.is_connected() and len(voice_client.channel.members) == 1:
@@ -500,6 +1170,7 @@ class Music(commands.Cog):
             if guild.id in self.music_queues:
                 self.music_queues[guild.id] = []
             
+            self._stop_player(guild.id)
             await voice_client.disconnect()
 
 # Setup function
@@ -0,0 +1,235 @@
+import os
+import re
+import time
+import typing
+import asyncio
+
+import discord
+from discord.ext import commands
+
+from logger import get_logger
+from poll_store import Poll, PollStore, OPTION_EMOJIS, YES_NO_EMOJIS
+from config import Config
+
+logger = get_logger("Polls")
+
+DURATION_PATTERN = re.compile(r'^(\d+)([mhdw])$')
+DURATION_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+class PollDuration(commands.Converter):
+    """`30m`, `12h`, `2d` or `1w` in seconds"""
+    
+    async def convert(self, ctx, argument):
+        match = DURATION_PATTERN.match(argument.lower())
+        if not match:
+            raise commands.BadArgument(f"'{argument}' is not a duration")
+        return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def results_bar(share, width=12):
+    filled = round(share * width)
+    return '█' * filled + '░' * (width - filled)
+
+
+class Polls(commands.Cog):
+    """Multi-option polls with deadlines, tallied from raw reaction events"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.store = PollStore(os.path.join(Config.DATA_DIR, 'polls.db'))
+        self._wake = asyncio.Event()
+        self._task = None
+        self._closing = set()
+    
+    async def cog_load(self):
+        self._task = asyncio.create_task(self._maintain())
+    
+    async def cog_unload(self):
+        if self._task:
+            self._task.cancel()
+        await self.store.shutdown()
+    
+    async def _maintain(self):
+        """Close polls at their deadline and write tallies behind the vote stream"""
+        await self.bot.wait_until_ready()
+        # Only the polls of guilds this process serves, other cluster workers close the rest
+        count = await self.store.load(serves=lambda guild_id: self.bot.get_guild(guild_id) is not None)
+        logger.info(f"Loaded {count} open poll(s)")
+        
+        while True:
+            for poll in self.store.due():
+                try:
+                    await self.close_poll(poll)
+                except Exception as e:
+                    logger.error(f"Failed to close poll {poll.message_id}: {e}", exc_info=True)
+            
+            try:
+                await self.store.flush()
+            except Exception as e:
+                logger.error(f"Failed to save poll tallies: {e}")
+            
+            timeout = Config.POLL_FLUSH_INTERVAL
+            deadline = self.store.next_deadline()
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.time()))
+            
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _results_embed(self, poll):
+        total = poll.total_votes()
+        embed = discord.Embed(
+            title="📊 Poll Results",
+            description=poll.question,
+            color=discord.Color.gold()
+        )
+        
+        results = poll.results()
+        lines = [f"**{option}**\n`{results_bar(share)}` {votes} vote(s) ({share:.0%})" for option, votes, share in results]
+        embed.add_field(name="Results", value="\n".join(lines)[:1024], inline=False)
+        
+        leaders = [option for option, votes, _ in results if votes == results[0][1]]
+        if total and len(leaders) == 1:
+            embed.add_field(name="Winner", value=f"🏆 {leaders[0]}", inline=True)
+        elif total:
+            embed.add_field(name="Winner", value="🤝 Tie", inline=True)
+        embed.add_field(name="Total Votes", value=str(total), inline=True)
+        return embed
+    
+    async def close_poll(self, poll):
+        """Finalise a poll: store its running tally and post the results"""
+        # The deadline and !pollclose can race, only the first one posts results
+        if poll.message_id in self._closing:
+            return
+        self._closing.add(poll.message_id)
+        try:
+            await self._close_poll(poll)
+        finally:
+            self._closing.discard(poll.message_id)
+    
+    async def _close_poll(self, poll):
+        channel = self.bot.get_channel(poll.channel_id)
+        if channel is None:
+            # Nowhere to post the results from here, leave the poll open in the database
+            await self.store.release(poll.message_id)
+            logger.warning(f"Channel of poll {poll.message_id} is not visible, left it open")
+            return
+        
+        # The raw reaction listeners kept the tally, no message fetch
+        await self.store.close(poll.message_id)
+        logger.info(f"Closed poll {poll.message_id} with {poll.total_votes()} vote(s)")
+        
+        reference = channel.get_partial_message(poll.message_id).to_reference(fail_if_not_exists=False)
+        try:
+            await channel.send(embed=self._results_embed(poll), reference=reference, mention_author=False)
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to post results of poll {poll.message_id}: {e}")
+    
+    def _vote(self, payload, delta):
+        # A dict lookup for every reaction in every guild, only poll messages go further
+        if payload.message_id not in self.store.polls or payload.user_id == self.bot.user.id:
+            return
+        self.store.record_vote(payload.message_id, str(payload.emoji), delta)
+    
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        self._vote(payload, 1)
+    
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
+        self._vote(payload, -1)
+    
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear(self, payload):
+        self.store.reset_votes(payload.message_id)
+    
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear_emoji(self, payload):
+        self.store.reset_votes(payload.message_id, str(payload.emoji))
+    
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        if payload.message_id in self.store.polls:
+            await self.store.close(payload.message_id)
+            logger.info(f"Poll {payload.message_id} was deleted, closed it without results")
+    
+    @commands.command(name='poll', help='Create a poll: !poll [duration] <question> | <option> | <option> ...')
+    @commands.guild_only()
+    async def poll(self, ctx, duration: typing.Optional[PollDuration] = None, *, question: str):
+        """
+        Create a poll that closes with a results post
+        Example: !poll 2h Pizza tonight?  (yes/no)
+        Example: !poll 1d Best day? | Friday | Saturday | Sunday
+        """
+        parts = [part.strip() for part in question.split('|')]
+        question, options = parts[0], [option for option in parts[1:] if option]
+        
+        if not question:
+            await ctx.send('❌ You need to ask a question!')
+            return
+        if len(options) == 1:
+            await ctx.send('❌ A poll needs at least two options, or none for a yes/no poll.')
+            return
+        if len(options) > len(OPTION_EMOJIS):
+            await ctx.send(f'❌ A poll can have at most {len(OPTION_EMOJIS)} options.')
+            return
+        
+        duration = duration or Config.POLL_DEFAULT_DURATION
+        if duration > Config.POLL_MAX_DURATION:
+            await ctx.send(f'❌ Polls can run for at most {Config.POLL_MAX_DURATION // 86400} days.')
+            return
+        
+        if options:
+            emojis = OPTION_EMOJIS[:len(options)]
+        else:
+            options, emojis = ['Yes', 'No'], YES_NO_EMOJIS
+        closes_at = time.time() + duration
+        
+        embed = discord.Embed(
+            title="📊 Poll",
+            description=question,
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Options", value="\n".join(f"{emoji} {option}" for emoji, option in zip(emojis, options)), inline=False)
+        embed.add_field(name="Closes", value=f"<t:{int(closes_at)}:R>", inline=True)
+        embed.set_footer(text=f"Poll by {ctx.author.name}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
+        
+        poll_msg = await ctx.send(embed=embed)
+        
+        poll = Poll(poll_msg.id, ctx.guild.id, ctx.channel.id, ctx.author.id, question, options, emojis, closes_at)
+        await self.store.add(poll)
+        self._wake.set()
+        
+        for emoji in emojis:
+            await poll_msg.add_reaction(emoji)
+        
+        try:
+            await ctx.message.delete()
+        except discord.HTTPException:
+            pass
+    
+    @commands.command(name='pollclose', help='Close a poll now and post its results')
+    @commands.guild_only()
+    async def pollclose(self, ctx, message_id: int):
+        """
+        Close a poll before its deadline
+        Usage: !pollclose <poll message ID> (poll author or Manage Messages)
+        """
+        poll = self.store.polls.get(message_id)
+        if poll is None or poll.guild_id != ctx.guild.id:
+            await ctx.send('❌ No open poll with that message ID in this server.')
+            return
+        
+        if poll.author_id != ctx.author.id and not ctx.author.guild_permissions.manage_messages:
+            await ctx.send("❌ Only the poll's author or a moderator can close it.")
+            return
+        
+        await self.close_poll(poll)
+        self._wake.set()
+
+async def setup(bot):
+    await bot.add_cog(Polls(bot))
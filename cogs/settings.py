@@ -0,0 +1,103 @@
+import discord
+from discord.ext import commands
+
+from logger import get_logger
+from guild_settings import guild_settings, PARSERS
+
+logger = get_logger("Settings")
+
+DESCRIPTIONS = {
+    'prefix': 'Command prefix',
+    'volume': 'Starting volume of each song (0-100)',
+    'idle_timeout': 'Seconds alone in voice before leaving (10-3600)',
+    'announce_channel': 'Channel !announce posts to',
+    'log_channel': 'Channel unexpected command errors are reported to',
+}
+
+# Settings that hold a text channel, given by mention, name or ID
+CHANNEL_SETTINGS = ('announce_channel', 'log_channel')
+
+
+class Settings(commands.Cog):
+    """Per-server bot settings"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    def _format(self, name, value):
+        if value is None:
+            return "Not set"
+        if name in CHANNEL_SETTINGS:
+            return f"<#{value}>"
+        if name == 'prefix':
+            return f"`{value}`"
+        return str(value)
+    
+    @commands.group(name='settings', invoke_without_command=True, help='Show this server\'s bot settings')
+    @commands.guild_only()
+    async def settings(self, ctx):
+        """Show the effective settings of this server"""
+        values, overridden = guild_settings.all(ctx.guild.id)
+        
+        embed = discord.Embed(
+            title=f"⚙️ Settings - {ctx.guild.name}",
+            color=discord.Color.blurple()
+        )
+        for name, value in values.items():
+            source = "" if name in overridden else " (default)"
+            embed.add_field(name=f"{name}{source}", value=f"{self._format(name, value)}\n{DESCRIPTIONS[name]}", inline=False)
+        embed.set_footer(text=f"Change with {ctx.clean_prefix}settings set <name> <value>")
+        
+        await ctx.send(embed=embed)
+    
+    @settings.command(name='set', help='Change a setting (Manage Server)')
+    @commands.has_permissions(manage_guild=True)
+    async def settings_set(self, ctx, name: str, *, value: str):
+        """
+        Change one of this server's settings
+        Usage: !settings set <prefix|volume|idle_timeout|announce_channel|log_channel> <value>
+        """
+        name = name.lower()
+        if name not in PARSERS:
+            await ctx.send(f"❌ Unknown setting. Choose one of: {', '.join(f'`{key}`' for key in PARSERS)}")
+            return
+        
+        if name in CHANNEL_SETTINGS:
+            try:
+                channel = await commands.TextChannelConverter().convert(ctx, value)
+            except commands.BadArgument:
+                await ctx.send("❌ Channel not found!")
+                return
+            if not channel.permissions_for(ctx.guild.me).send_messages:
+                await ctx.send("❌ I don't have permission to send messages in that channel!")
+                return
+            value = channel.id
+        
+        try:
+            stored = guild_settings.set(ctx.guild.id, name, value)
+        except ValueError as e:
+            await ctx.send(f"❌ {e}")
+            return
+        
+        logger.info(f"Setting {name} changed to {stored!r} by {ctx.author} in {ctx.guild}")
+        await ctx.send(f"✅ `{name}` set to {self._format(name, stored)}")
+    
+    @settings.command(name='reset', help='Reset one setting, or all of them, to the default (Manage Server)')
+    @commands.has_permissions(manage_guild=True)
+    async def settings_reset(self, ctx, name: str = None):
+        """
+        Go back to the bot's defaults
+        Usage: !settings reset [name]
+        """
+        if name is not None:
+            name = name.lower()
+            if name not in PARSERS:
+                await ctx.send(f"❌ Unknown setting. Choose one of: {', '.join(f'`{key}`' for key in PARSERS)}")
+                return
+        
+        guild_settings.reset(ctx.guild.id, name)
+        logger.info(f"Setting {name or 'all'} reset by {ctx.author} in {ctx.guild}")
+        await ctx.send(f"✅ {f'`{name}`' if name else 'All settings'} reset to the default")
+
+async def setup(bot):
+    await bot.add_cog(Settings(bot))
@@ -0,0 +1,95 @@
+import os
+import json
+import asyncio
+import hashlib
+
+import discord
+
+from logger import get_logger
+
+logger = get_logger("CommandSync")
+
+
+class CommandSyncer:
+    """Sync application commands only when the command tree actually changed
+    
+    A stable hash of each scope's command payloads is kept on disk. Ready
+    events (including gateway reconnects) compare against it and skip the
+    rate-limited sync call when nothing changed.
+    """
+    
+    def __init__(self, bot, state_file, dev_guild_ids=()):
+        self.bot = bot
+        self.state_file = state_file
+        self.dev_guild_ids = list(dev_guild_ids)
+        self.skipped = 0
+        self._state = None
+        self._lock = asyncio.Lock()
+    
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(temp_file, self.state_file)
+    
+    def tree_hash(self, guild=None):
+        """Stable hash of the payloads Discord would receive for a scope"""
+        tree = self.bot.tree
+        payloads = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+        payloads.sort(key=lambda payload: (payload.get('type', 1), payload['name']))
+        encoded = json.dumps(payloads, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    
+    def _scopes(self):
+        """(key, guild) pairs: the dev guilds when configured, otherwise global"""
+        if self.dev_guild_ids:
+            scopes = []
+            for guild_id in self.dev_guild_ids:
+                guild = discord.Object(id=guild_id)
+                self.bot.tree.copy_global_to(guild=guild)
+                scopes.append((f"guild:{guild_id}", guild))
+            return scopes
+        return [("global", None)]
+    
+    async def sync(self, force=False):
+        """Sync every scope whose hash changed, returns (synced_count, skipped_scopes)"""
+        async with self._lock:
+            loop = asyncio.get_event_loop()
+            if self._state is None:
+                self._state = await loop.run_in_executor(None, self._load_state)
+            
+            application_id = str(self.bot.application_id)
+            hashes = self._state.setdefault(application_id, {})
+            synced_count = 0
+            skipped_scopes = 0
+            
+            for key, guild in self._scopes():
+                digest = self.tree_hash(guild)
+                if not force and hashes.get(key) == digest:
+                    skipped_scopes += 1
+                    continue
+                
+                synced = await self.bot.tree.sync(guild=guild)
+                synced_count += len(synced)
+                hashes[key] = digest
+                logger.info(f"Synced {len(synced)} command(s) to {key}")
+            
+            if skipped_scopes:
+                self.skipped += 1
+                self._state['skipped_total'] = self._state.get('skipped_total', 0) + 1
+                logger.info(
+                    f"Command tree unchanged, skipped sync for {skipped_scopes} scope(s) "
+                    f"({self.skipped} skipped this run, {self._state['skipped_total']} total)"
+                )
+            
+            state = json.loads(json.dumps(self._state))
+            await loop.run_in_executor(None, self._save_state, state)
+            return synced_count, skipped_scopes
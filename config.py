@@ -11,8 +11,14 @@ class Config:
     COMMAND_PREFIX = os.getenv('COMMAND_PREFIX', '!')
     BOT_STATUS = os.getenv('BOT_STATUS', 'Listening to commands!')
     
-    ANNOUNCEMENT_CHANNEL_ID = None
-    LOG_CHANNEL_ID = None
+    # Defaults for every guild, each can be changed per guild with !settings set
+    ANNOUNCEMENT_CHANNEL_ID = int(os.getenv('ANNOUNCEMENT_CHANNEL_ID')) if os.getenv('ANNOUNCEMENT_CHANNEL_ID') else None
+    # Unexpected command errors are reported here
+    LOG_CHANNEL_ID = int(os.getenv('LOG_CHANNEL_ID')) if os.getenv('LOG_CHANNEL_ID') else None
+    DEFAULT_VOLUME = int(os.getenv('DEFAULT_VOLUME', '50'))
+    IDLE_TIMEOUT = int(os.getenv('IDLE_TIMEOUT', '30'))
+    # Changed guild settings are written to disk every this many seconds
+    SETTINGS_FLUSH_INTERVAL = float(os.getenv('SETTINGS_FLUSH_INTERVAL', '5'))
     
     ADMIN_ROLE_ID = None
     MOD_ROLE_ID = None
@@ -20,9 +26,130 @@ class Config:
     DELETE_COMMAND_MESSAGES = True
     DEFAULT_EMBED_COLOR = 0x7289DA
     
+    # Seconds between a user's yt-dlp lookups on average, bursts of up to 3 are allowed
     DEFAULT_COOLDOWN = 3
     ANNOUNCEMENT_COOLDOWN = 30
     
+    # Token buckets per command, scope -> (uses, per seconds) for the user, guild and global scopes.
+    # Unlisted commands are not limited unless DEFAULT_RATE_LIMIT is set.
+    DEFAULT_RATE_LIMIT = {}
+    EXTRACTION_RATE_LIMIT = {'user': (3, 3 * DEFAULT_COOLDOWN), 'guild': (10, 30), 'global': (60, 60)}
+    RATE_LIMITS = {
+        'play': EXTRACTION_RATE_LIMIT,
+        'search': EXTRACTION_RATE_LIMIT,
+        'announce': {'guild': (1, ANNOUNCEMENT_COOLDOWN)},
+        'announce_slash': {'guild': (1, ANNOUNCEMENT_COOLDOWN)},
+    }
+    
+    # yt-dlp extractions allowed to run at once, and how many more may wait before requests are rejected
+    MAX_CONCURRENT_EXTRACTIONS = int(os.getenv('MAX_CONCURRENT_EXTRACTIONS', '4'))
+    MAX_PENDING_EXTRACTIONS = int(os.getenv('MAX_PENDING_EXTRACTIONS', '20'))
+    
+    # Play history: plays are written in batches of HISTORY_BATCH_SIZE or every HISTORY_FLUSH_INTERVAL seconds.
+    # The HISTORY_WARM_TOP_N most played tracks per guild (at most HISTORY_WARM_MAX_TRACKS in total) are
+    # resolved at startup and every HISTORY_WARM_INTERVAL_HOURS (0 = startup only) into a TRACK_CACHE_SIZE cache
+    HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', '100'))
+    HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', '30'))
+    HISTORY_WARM_TOP_N = int(os.getenv('HISTORY_WARM_TOP_N', '5'))
+    HISTORY_WARM_MAX_TRACKS = int(os.getenv('HISTORY_WARM_MAX_TRACKS', '50'))
+    HISTORY_WARM_INTERVAL_HOURS = float(os.getenv('HISTORY_WARM_INTERVAL_HOURS', '4'))
+    TRACK_CACHE_SIZE = int(os.getenv('TRACK_CACHE_SIZE', '500'))
+    
+    # Voice sessions down for VOICE_STALE_AFTER seconds (checked every VOICE_CHECK_INTERVAL) are reconnected
+    # up to VOICE_RECONNECT_ATTEMPTS times, backing off from VOICE_RECONNECT_BASE_DELAY to VOICE_RECONNECT_MAX_DELAY
+    VOICE_CONNECT_TIMEOUT = float(os.getenv('VOICE_CONNECT_TIMEOUT', '15'))
+    VOICE_CHECK_INTERVAL = float(os.getenv('VOICE_CHECK_INTERVAL', '5'))
+    VOICE_STALE_AFTER = float(os.getenv('VOICE_STALE_AFTER', '15'))
+    VOICE_RECONNECT_ATTEMPTS = int(os.getenv('VOICE_RECONNECT_ATTEMPTS', '5'))
+    VOICE_RECONNECT_BASE_DELAY = float(os.getenv('VOICE_RECONNECT_BASE_DELAY', '1'))
+    VOICE_RECONNECT_MAX_DELAY = float(os.getenv('VOICE_RECONNECT_MAX_DELAY', '30'))
+    
+    # !search shows this many results and waits this many seconds for a pick
+    SEARCH_RESULTS = int(os.getenv('SEARCH_RESULTS', '5'))
+    SEARCH_PICK_TIMEOUT = int(os.getenv('SEARCH_PICK_TIMEOUT', '60'))
+    
+    # Most titles kept for /play autocomplete, least requested ones are dropped first
+    TITLE_INDEX_SIZE = int(os.getenv('TITLE_INDEX_SIZE', '20000'))
+    
+    # Loudness normalisation: each track is measured once in the background (at most LOUDNESS_MAX_ANALYSES
+    # at a time, over its first LOUDNESS_ANALYSIS_SECONDS) and later plays get a gain towards the target
+    LOUDNESS_NORMALIZATION = os.getenv('LOUDNESS_NORMALIZATION', 'true').lower() == 'true'
+    LOUDNESS_TARGET_LUFS = float(os.getenv('LOUDNESS_TARGET_LUFS', '-16'))
+    LOUDNESS_MAX_GAIN = float(os.getenv('LOUDNESS_MAX_GAIN', '12'))
+    LOUDNESS_CACHE_SIZE = int(os.getenv('LOUDNESS_CACHE_SIZE', '5000'))
+    LOUDNESS_MAX_ANALYSES = int(os.getenv('LOUDNESS_MAX_ANALYSES', '1'))
+    LOUDNESS_ANALYSIS_SECONDS = int(os.getenv('LOUDNESS_ANALYSIS_SECONDS', '120'))
+    
+    # Now playing message updates inside this many seconds are folded into one edit
+    NOW_PLAYING_EDIT_WINDOW = float(os.getenv('NOW_PLAYING_EDIT_WINDOW', '2'))
+    
+    # !purge: most messages deleted per run, most history scanned looking for matches, and the pause
+    # between single deletes of messages too old for bulk delete
+    PURGE_MAX_MESSAGES = int(os.getenv('PURGE_MAX_MESSAGES', '10000'))
+    PURGE_MAX_SCAN = int(os.getenv('PURGE_MAX_SCAN', '50000'))
+    PURGE_SINGLE_DELETE_DELAY = float(os.getenv('PURGE_SINGLE_DELETE_DELAY', '1.0'))
+    PURGE_PROGRESS_INTERVAL = float(os.getenv('PURGE_PROGRESS_INTERVAL', '3'))
+    
+    # Polls close after POLL_DEFAULT_DURATION seconds unless given a duration; vote tallies are
+    # written to disk every POLL_FLUSH_INTERVAL seconds
+    POLL_DEFAULT_DURATION = int(os.getenv('POLL_DEFAULT_DURATION', str(24 * 3600)))
+    POLL_MAX_DURATION = int(os.getenv('POLL_MAX_DURATION', str(30 * 24 * 3600)))
+    POLL_FLUSH_INTERVAL = float(os.getenv('POLL_FLUSH_INTERVAL', '10'))
+    
+    DATA_DIR = os.getenv('DATA_DIR', 'data')
+    
+    # auto: sync only when the command tree hash changed, force: always, off: never
+    COMMAND_SYNC = os.getenv('COMMAND_SYNC', 'auto').lower()
+    DEV_GUILD_IDS = [int(guild_id) for guild_id in os.getenv('DEV_GUILD_IDS', '').split(',') if guild_id.strip()]
+    
+    # Low-memory cache policy for large guild counts: minimal member cache, smaller message cache,
+    # no chunking and no gateway events for caches nothing uses (emojis, stickers, invites, ...)
+    LOW_MEMORY_MODE = os.getenv('LOW_MEMORY_MODE', 'false').lower() == 'true'
+    MAX_MESSAGES = int(os.getenv('MAX_MESSAGES', '100' if LOW_MEMORY_MODE else '1000'))
+    
+    # AUTO_SHARD lets Discord recommend the shard count, SHARD_COUNT pins it (SHARD_IDS needs SHARD_COUNT)
+    AUTO_SHARD = os.getenv('AUTO_SHARD', 'false').lower() == 'true'
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+    SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS', '').split(',') if shard_id.strip()] or None
+    
+    # Cluster mode (python bot.py --cluster) runs CLUSTER_COUNT worker processes, one per CPU core by default.
+    # CLUSTER_ID and CLUSTER_IPC_TOKEN are set by the orchestrator for its workers.
+    CLUSTER_COUNT = int(os.getenv('CLUSTER_COUNT', '0')) or None
+    CLUSTER_ID = int(os.getenv('CLUSTER_ID')) if os.getenv('CLUSTER_ID') else None
+    CLUSTER_IPC_HOST = os.getenv('CLUSTER_IPC_HOST', '127.0.0.1')
+    CLUSTER_IPC_PORT = int(os.getenv('CLUSTER_IPC_PORT', '9200'))
+    CLUSTER_IPC_TOKEN = os.getenv('CLUSTER_IPC_TOKEN')
+    CLUSTER_HEARTBEAT_INTERVAL = int(os.getenv('CLUSTER_HEARTBEAT_INTERVAL', '10'))
+    CLUSTER_HEARTBEAT_TIMEOUT = int(os.getenv('CLUSTER_HEARTBEAT_TIMEOUT', '60'))
+    CLUSTER_STARTUP_TIMEOUT = int(os.getenv('CLUSTER_STARTUP_TIMEOUT', '300'))
+    
+    YTDLP_VERSION_CHECK = os.getenv('YTDLP_VERSION_CHECK', 'false').lower() == 'true'
+    YTDLP_AUTO_UPGRADE = os.getenv('YTDLP_AUTO_UPGRADE', 'false').lower() == 'true'
+    YTDLP_CHECK_INTERVAL_HOURS = int(os.getenv('YTDLP_CHECK_INTERVAL_HOURS', '24'))
+    STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '10'))
+    
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+    
+    LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() == 'true'
+    LOOP_LAG_THRESHOLD_MS = int(os.getenv('LOOP_LAG_THRESHOLD_MS', '200'))
+    
+    # Playback FFmpeg processes are sampled every FFMPEG_SAMPLE_INTERVAL seconds and killed when no audio
+    # came out for FFMPEG_STALL_TIMEOUT seconds, when above FFMPEG_MAX_CPU_PERCENT for three samples in a
+    # row or above FFMPEG_MAX_RSS_MB; the track then restarts where it stopped, at most FFMPEG_MAX_RESTARTS times
+    FFMPEG_SUPERVISOR_ENABLED = os.getenv('FFMPEG_SUPERVISOR_ENABLED', 'true').lower() == 'true'
+    FFMPEG_SAMPLE_INTERVAL = float(os.getenv('FFMPEG_SAMPLE_INTERVAL', '5'))
+    FFMPEG_STALL_TIMEOUT = float(os.getenv('FFMPEG_STALL_TIMEOUT', '20'))
+    FFMPEG_MAX_CPU_PERCENT = float(os.getenv('FFMPEG_MAX_CPU_PERCENT', '90'))
+    FFMPEG_MAX_RSS_MB = int(os.getenv('FFMPEG_MAX_RSS_MB', '256'))
+    FFMPEG_MAX_RESTARTS = int(os.getenv('FFMPEG_MAX_RESTARTS', '2'))
+    
+    LOG_FILE = 'logs/bot.log'
+    LOGS_MAX_LINES = 200
+    LOGS_READ_MAX_BYTES = 4 * 1024 * 1024
+    LOGS_READ_TIME_BUDGET = 0.5
+    
     @classmethod
     def validate(cls):
         """Validate configuration"""
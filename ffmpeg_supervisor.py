@@ -0,0 +1,218 @@
+import os
+import time
+import asyncio
+
+from logger import get_logger
+import metrics
+
+logger = get_logger("FFmpeg")
+
+FFMPEG_PROCESSES = metrics.REGISTRY.gauge('discord_ffmpeg_processes', 'FFmpeg playback processes being supervised')
+FFMPEG_CPU = metrics.REGISTRY.gauge('discord_ffmpeg_cpu_percent', 'CPU use of all supervised FFmpeg processes')
+FFMPEG_RSS = metrics.REGISTRY.gauge('discord_ffmpeg_rss_bytes', 'Resident memory of all supervised FFmpeg processes')
+FFMPEG_KILLS = metrics.REGISTRY.counter('discord_ffmpeg_kills_total', 'FFmpeg processes killed by the supervisor', ('reason',))
+
+try:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = PAGE_SIZE = None
+
+
+def read_proc_usage(pid):
+    """(cpu seconds, rss bytes, open fds) of a process from /proc, or None when unavailable"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+        with open(f'/proc/{pid}/statm', 'rb') as f:
+            resident = int(f.read().split()[1])
+        fds = len(os.listdir(f'/proc/{pid}/fd'))
+    except (OSError, ValueError, IndexError):
+        return None
+    # The command name may contain spaces, the fields after it are fixed
+    fields = stat[stat.rfind(b')') + 2:].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return cpu, resident * PAGE_SIZE, fds
+
+
+class FFmpegProcess:
+    """One supervised FFmpeg child and its last resource sample"""
+    
+    __slots__ = (
+        'guild_id', 'voice_client', 'source', 'process', 'on_killed', 'restarts', 'started_at',
+        'cpu_seconds', 'sampled_at', 'cpu_percent', 'rss', 'fds', 'hot_samples'
+    )
+    
+    def __init__(self, guild_id, voice_client, source, process, on_killed=None, restarts=0):
+        self.guild_id = guild_id
+        self.voice_client = voice_client
+        self.source = source
+        self.process = process
+        self.on_killed = on_killed
+        self.restarts = restarts
+        self.started_at = time.monotonic()
+        self.cpu_seconds = None
+        self.sampled_at = None
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.fds = 0
+        self.hot_samples = 0
+    
+    @property
+    def pid(self):
+        return self.process.pid
+    
+    def stalled_for(self, now):
+        """Seconds since the voice thread last got audio, 0 while not expected to"""
+        voice_client = self.voice_client
+        if not voice_client.is_connected() or voice_client.is_paused():
+            # Nothing reads while paused or reconnecting, start the clock again afterwards
+            self.source.last_frame_at = now
+            return 0.0
+        return now - self.source.last_frame_at
+
+
+class FFmpegSupervisor:
+    """Keep track of every playback FFmpeg process and kill the ones that misbehave
+    
+    Every `interval` seconds each process is sampled from /proc (CPU time,
+    RSS, open fds; a few small reads, off the event loop) and checked for:
+    
+    - stalls: playing, but no audio frame for `stall_timeout` seconds
+    - runaways: above `max_cpu` percent for `hot_samples` samples in a row, or above `max_rss`
+    - orphans: alive, but no longer the voice client's source
+    
+    Stalled and runaway processes are reported to their `on_killed` callback
+    before the kill, so the track can be started again where it stopped.
+    Without /proc (not Linux) only stalls and orphans are detected.
+    """
+    
+    def __init__(self, interval=5.0, stall_timeout=20.0, max_cpu=90.0, max_rss=256 * 1024 * 1024,
+                 hot_samples=3, max_restarts=2):
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.max_cpu = max_cpu
+        self.max_rss = max_rss
+        self.hot_samples = hot_samples
+        self.max_restarts = max_restarts
+        self.processes = {}
+        self.kills = 0
+        self._task = None
+    
+    @property
+    def running(self):
+        return self._task is not None
+    
+    def watch(self, guild_id, voice_client, source, on_killed=None, restarts=0):
+        """Supervise the FFmpeg process behind a source that just started playing"""
+        original = getattr(source, 'original', source)
+        process = getattr(original, '_process', None)
+        if process is None:
+            return None
+        source.last_frame_at = time.monotonic()
+        entry = self.processes[process.pid] = FFmpegProcess(
+            guild_id, voice_client, source, process, on_killed=on_killed, restarts=restarts
+        )
+        return entry
+    
+    def usage(self):
+        """Supervised processes grouped by guild, busiest first"""
+        guilds = {}
+        for entry in self.processes.values():
+            guilds.setdefault(entry.guild_id, []).append(entry)
+        return sorted(guilds.items(), key=lambda item: sum(entry.cpu_percent for entry in item[1]), reverse=True)
+    
+    def _sample(self, entries):
+        """Read /proc for each process (blocking)"""
+        if CLOCK_TICKS is None:
+            return
+        for entry in entries:
+            usage = read_proc_usage(entry.pid)
+            if usage is None:
+                continue
+            cpu_seconds, entry.rss, entry.fds = usage
+            now = time.monotonic()
+            if entry.cpu_seconds is not None:
+                entry.cpu_percent = (cpu_seconds - entry.cpu_seconds) / max(now - entry.sampled_at, 1e-3) * 100
+            entry.cpu_seconds = cpu_seconds
+            entry.sampled_at = now
+    
+    def _problem(self, entry, now):
+        """Why a process should be killed, or None"""
+        voice_client = entry.voice_client
+        if voice_client.source is not entry.source:
+            return 'orphaned'
+        if entry.stalled_for(now) > self.stall_timeout:
+            return 'stalled'
+        if self.max_rss and entry.rss > self.max_rss:
+            return 'memory'
+        entry.hot_samples = entry.hot_samples + 1 if entry.cpu_percent > self.max_cpu else 0
+        if entry.hot_samples >= self.hot_samples:
+            return 'cpu'
+        return None
+    
+    def kill(self, entry, reason):
+        """Kill a process, first letting its owner queue the track again where it stopped"""
+        self.processes.pop(entry.pid, None)
+        self.kills += 1
+        FFMPEG_KILLS.inc(reason=reason)
+        
+        restart = reason != 'orphaned' and entry.on_killed is not None and entry.restarts < self.max_restarts
+        logger.warning(
+            f"Killing ffmpeg {entry.pid} in guild {entry.guild_id} ({reason}, "
+            f"{entry.cpu_percent:.0f}% CPU, {entry.rss // (1024 * 1024)}MB){', restarting the track' if restart else ''}"
+        )
+        if restart:
+            try:
+                entry.on_killed(entry.source.track, entry.restarts + 1)
+            except Exception as e:
+                logger.error(f"Failed to queue a restart for guild {entry.guild_id}: {e}")
+        
+        try:
+            # The voice thread reads EOF and moves on through the normal after-play callback
+            entry.process.kill()
+        except OSError:
+            pass
+    
+    async def check(self):
+        """Sample every process once and kill the ones that misbehave"""
+        # Exited processes were cleaned up by discord.py, stop watching them
+        for pid in [pid for pid, entry in self.processes.items() if entry.process.poll() is not None]:
+            del self.processes[pid]
+        
+        entries = list(self.processes.values())
+        if entries:
+            await asyncio.get_running_loop().run_in_executor(None, self._sample, entries)
+        
+        now = time.monotonic()
+        for entry in entries:
+            if entry.process.poll() is not None:
+                self.processes.pop(entry.pid, None)
+                continue
+            reason = self._problem(entry, now)
+            if reason:
+                self.kill(entry, reason)
+        
+        FFMPEG_PROCESSES.set(len(self.processes))
+        FFMPEG_CPU.set(sum(entry.cpu_percent for entry in self.processes.values()))
+        FFMPEG_RSS.set(sum(entry.rss for entry in self.processes.values()))
+    
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"FFmpeg supervision pass failed: {e}")
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._supervise())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+ffmpeg_supervisor = FFmpegSupervisor()
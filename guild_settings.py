@@ -0,0 +1,183 @@
+import os
+import json
+import asyncio
+import sqlite3
+
+from logger import get_logger
+from config import Config
+
+logger = get_logger("Settings")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+'''
+
+
+def _prefix(value):
+    value = str(value).strip()
+    if not value or len(value) > 5 or any(char.isspace() for char in value):
+        raise ValueError("The prefix must be 1-5 characters without spaces")
+    return value
+
+
+def _int_between(low, high):
+    def parse(value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Expected a whole number between {low} and {high}")
+        if not low <= value <= high:
+            raise ValueError(f"Expected a whole number between {low} and {high}")
+        return value
+    return parse
+
+
+# Setting name -> parser, which raises ValueError with a user-facing message
+PARSERS = {
+    'prefix': _prefix,
+    'volume': _int_between(0, 100),
+    'idle_timeout': _int_between(10, 3600),
+    'announce_channel': int,
+    'log_channel': int,
+}
+
+
+class GuildSettings:
+    """Per-guild overrides of a few Config defaults, persisted to SQLite
+    
+    Every stored override is loaded at startup; guilds without a row use the
+    defaults. Reads are therefore two dict lookups and never touch disk,
+    which keeps the per-message prefix lookup O(1). Changes are applied in
+    memory first and written behind by `flush()`.
+    """
+    
+    def __init__(self, defaults):
+        self.defaults = dict(defaults)
+        self.path = None
+        self._overrides = {}
+        self._dirty = set()
+        self._conn = None
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+    
+    def open(self, path):
+        """Create the database if needed and load every override (blocking)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        
+        for guild_id, data in self._conn.execute('SELECT guild_id, data FROM guild_settings'):
+            try:
+                self._overrides[guild_id] = json.loads(data)
+            except ValueError:
+                logger.warning(f"Ignoring unreadable settings for guild {guild_id}")
+        logger.info(f"Loaded settings for {len(self._overrides)} guild(s)")
+    
+    def get(self, guild_id, name):
+        overrides = self._overrides.get(guild_id)
+        if overrides is not None and name in overrides:
+            return overrides[name]
+        return self.defaults[name]
+    
+    def all(self, guild_id):
+        """Effective settings of a guild, and which of them are overridden"""
+        overrides = self._overrides.get(guild_id) or {}
+        return {name: overrides.get(name, default) for name, default in self.defaults.items()}, set(overrides)
+    
+    def set(self, guild_id, name, value):
+        """Validate and apply a setting, returns the stored value (raises KeyError/ValueError)"""
+        if name not in PARSERS:
+            raise KeyError(name)
+        value = PARSERS[name](value)
+        self._overrides.setdefault(guild_id, {})[name] = value
+        self._dirty.add(guild_id)
+        return value
+    
+    def reset(self, guild_id, name=None):
+        """Go back to the default for one setting, or for all of them"""
+        overrides = self._overrides.get(guild_id)
+        if not overrides:
+            return
+        if name is None:
+            overrides.clear()
+        else:
+            overrides.pop(name, None)
+        if not overrides:
+            del self._overrides[guild_id]
+        self._dirty.add(guild_id)
+    
+    def forget(self, guild_id):
+        """Drop a guild's settings, e.g. after the bot was removed from it"""
+        if self._overrides.pop(guild_id, None) is not None:
+            self._dirty.add(guild_id)
+    
+    def prefix(self, bot, message):
+        """`command_prefix` callable: the guild's prefix, the default one in DMs"""
+        return self.get(message.guild.id if message.guild else None, 'prefix')
+    
+    def _write(self, rows):
+        with self._conn:
+            for guild_id, data in rows:
+                if data is None:
+                    self._conn.execute('DELETE FROM guild_settings WHERE guild_id = ?', (guild_id,))
+                else:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO guild_settings (guild_id, data) VALUES (?, ?)', (guild_id, data)
+                    )
+    
+    async def flush(self):
+        """Write changed guilds in one transaction off the event loop"""
+        async with self._flush_lock:
+            return await self._flush()
+    
+    async def _flush(self):
+        if not self._dirty or self._conn is None:
+            return 0
+        
+        # Snapshot on the loop thread, the executor never reads the live dicts
+        dirty, self._dirty = self._dirty, set()
+        rows = []
+        for guild_id in dirty:
+            overrides = self._overrides.get(guild_id)
+            rows.append((guild_id, json.dumps(overrides, sort_keys=True) if overrides else None))
+        
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write, rows)
+        except sqlite3.Error as e:
+            self._dirty |= dirty
+            logger.error(f"Failed to save guild settings: {e}")
+            return 0
+        return len(rows)
+    
+    async def _flush_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+    
+    def start(self, interval):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically(interval))
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        async with self._flush_lock:
+            await self._flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+guild_settings = GuildSettings({
+    'prefix': Config.COMMAND_PREFIX,
+    'volume': Config.DEFAULT_VOLUME,
+    'idle_timeout': Config.IDLE_TIMEOUT,
+    'announce_channel': Config.ANNOUNCEMENT_CHANNEL_ID,
+    'log_channel': Config.LOG_CHANNEL_ID,
+})
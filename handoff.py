@@ -0,0 +1,44 @@
+import contextlib
+
+from logger import get_logger
+
+logger = get_logger("Handoff")
+
+
+class Handoff:
+    """State a cog parks while its extension reloads, for the new instance to pick up
+    
+    Lives outside the cogs package, so it survives the reload itself. Parked
+    objects are handed over by reference: nothing is copied, and a parked
+    state nobody takes is dropped when the reload is over. Cogs only park
+    while `reloading()` says a new instance is coming; a final unload or
+    shutdown tears down as usual.
+    """
+    
+    def __init__(self):
+        self._parked = {}
+        self._reloading = set()
+    
+    @contextlib.contextmanager
+    def reloading(self, name):
+        """Mark `name` as being reloaded for the duration of the block"""
+        self._reloading.add(name)
+        try:
+            yield
+        finally:
+            self._reloading.discard(name)
+            if self._parked.pop(name, None) is not None:
+                logger.warning(f"Nobody took the state parked by {name}, dropped it")
+    
+    def is_reloading(self, name):
+        return name in self._reloading
+    
+    def park(self, name, state):
+        self._parked[name] = state
+    
+    def take(self, name):
+        """The state parked under `name`, once, or None"""
+        return self._parked.pop(name, None)
+
+
+handoff = Handoff()
@@ -0,0 +1,332 @@
+import os
+import re
+import json
+import sqlite3
+
+from datetime import datetime, timedelta
+
+TIMESTAMP_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+RELATIVE_TIME_PATTERN = re.compile(r'^(\d+)([mhdw])$')
+
+# Structured messages written by logger.BotLogger
+EVENT_PREFIXES = {
+    'Command executed: ': 'command',
+    'Command failed: ': 'command',
+    'Music activity: ': 'music',
+    'Music error: ': 'music',
+    'Voice event: ': 'voice',
+    'Bot event: ': 'bot',
+}
+
+PLAY_ACTIONS = ('play_now', 'play_next')
+REQUEST_ACTIONS = ('play_now', 'add_to_queue')
+
+HEAD_BYTES = 64
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    level TEXT,
+    module TEXT,
+    kind TEXT NOT NULL,
+    name TEXT,
+    guild_id INTEGER,
+    guild TEXT,
+    user_id INTEGER,
+    user TEXT,
+    success INTEGER,
+    error TEXT,
+    title TEXT,
+    url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+CREATE INDEX IF NOT EXISTS idx_events_kind_name ON events(kind, name, ts);
+CREATE INDEX IF NOT EXISTS idx_events_guild ON events(guild_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_user ON events(user_id, ts);
+CREATE TABLE IF NOT EXISTS sources (
+    inode TEXT PRIMARY KEY,
+    path TEXT,
+    offset INTEGER NOT NULL,
+    head BLOB
+);
+'''
+
+_INCOMPLETE = object()
+
+
+def placeholders(values):
+    """`?, ?, ...` for an IN clause over `values`, which are passed as parameters"""
+    return ', '.join('?' * len(values))
+
+
+def parse_time(value, end=False):
+    """Parse '7d', '12h', '30m', '2w' or an absolute date/time into a log timestamp string"""
+    if not value:
+        return None
+    
+    match = RELATIVE_TIME_PATTERN.match(value.strip())
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        delta = {'m': timedelta(minutes=amount), 'h': timedelta(hours=amount),
+                 'd': timedelta(days=amount), 'w': timedelta(weeks=amount)}[unit]
+        return (datetime.now() - delta).strftime('%Y-%m-%d %H:%M:%S')
+    
+    value = value.strip().replace('T', ' ')
+    if len(value) == 10:
+        return value + (' 23:59:59' if end else ' 00:00:00')
+    return value
+
+
+def parse_record(lines):
+    """Turn one log record (first line plus continuations) into an event row
+    
+    Returns None for unstructured records and _INCOMPLETE when the JSON
+    payload could not be parsed (the record may still be being written).
+    """
+    parts = lines[0].split(' | ', 4)
+    if len(parts) < 5:
+        return None
+    
+    timestamp, level, module, _, message = parts
+    for prefix, kind in EVENT_PREFIXES.items():
+        if message.startswith(prefix):
+            break
+    else:
+        return None
+    
+    payload = '\n'.join([message[len(prefix):]] + lines[1:])
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return _INCOMPLETE
+    
+    if kind == 'command':
+        name = data.get('command')
+        success = 1 if data.get('success') else 0
+    elif kind == 'music':
+        name = data.get('action')
+        success = 0 if 'error' in data else 1
+    else:
+        name = data.get('event_type')
+        success = None
+    
+    song = data.get('song') or {}
+    title = song.get('title')
+    if title == 'Unknown':
+        title = None
+    
+    return (
+        timestamp, level.strip(), module.strip(), kind, name,
+        data.get('guild_id'), data.get('guild'),
+        data.get('user_id'), data.get('user'),
+        success, data.get('error'),
+        title, song.get('url') or None
+    )
+
+
+class LogIndex:
+    """Incrementally maintained SQLite index of structured log events"""
+    
+    def __init__(self, log_file='logs/bot.log', index_file='logs/index.db'):
+        self.log_file = log_file
+        self.index_file = index_file
+        self.conn = sqlite3.connect(index_file)
+        self.conn.executescript(SCHEMA)
+    
+    def close(self):
+        self.conn.close()
+    
+    def rebuild(self):
+        """Drop everything and index from scratch"""
+        with self.conn:
+            self.conn.execute('DELETE FROM events')
+            self.conn.execute('DELETE FROM sources')
+        return self.update()
+    
+    def _log_files(self):
+        """Rotated backups oldest first, then the live file"""
+        directory = os.path.dirname(self.log_file) or '.'
+        base = os.path.basename(self.log_file)
+        backups = []
+        for name in os.listdir(directory):
+            suffix = name[len(base) + 1:]
+            if name.startswith(base + '.') and suffix.isdigit():
+                backups.append((int(suffix), os.path.join(directory, name)))
+        
+        files = [path for _, path in sorted(backups, reverse=True)]
+        if os.path.exists(self.log_file):
+            files.append(self.log_file)
+        return files
+    
+    def update(self):
+        """Index everything appended since the last run, returns the number of new events"""
+        added = 0
+        seen = []
+        
+        for path in self._log_files():
+            try:
+                added += self._index_file(path, seen)
+            except FileNotFoundError:
+                continue  # Rotated away while we were working
+        
+        with self.conn:
+            if seen:
+                self.conn.execute(f'DELETE FROM sources WHERE inode NOT IN ({placeholders(seen)})', seen)
+            else:
+                self.conn.execute('DELETE FROM sources')
+        return added
+    
+    def _index_file(self, path, seen):
+        """Resume indexing a single file from its last committed byte offset"""
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            key = f'{stat.st_dev}:{stat.st_ino}'
+            seen.append(key)
+            
+            head = f.read(HEAD_BYTES)
+            row = self.conn.execute('SELECT offset, head FROM sources WHERE inode = ?', (key,)).fetchone()
+            
+            offset = 0
+            if row:
+                stored_offset, stored_head = row
+                # Guard against inode reuse and in-place truncation
+                if stored_head == head[:len(stored_head)] and stored_offset <= stat.st_size:
+                    offset = stored_offset
+            
+            if offset == stat.st_size and row:
+                return 0
+            
+            f.seek(offset)
+            rows = []
+            record = []
+            record_start = offset
+            position = offset
+            
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # Partially written line, pick it up next time
+                
+                line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+                if TIMESTAMP_PATTERN.match(line):
+                    if record:
+                        event = parse_record(record)
+                        if event and event is not _INCOMPLETE:
+                            rows.append(event)
+                    record = [line]
+                    record_start = position
+                elif record:
+                    record.append(line)
+                position += len(raw)
+            
+            committed = position
+            if record:
+                event = parse_record(record)
+                if event is _INCOMPLETE:
+                    committed = record_start
+                elif event:
+                    rows.append(event)
+        
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO events (ts, level, module, kind, name, guild_id, guild, user_id, user, '
+                'success, error, title, url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self.conn.execute(
+                'INSERT OR REPLACE INTO sources (inode, path, offset, head) VALUES (?, ?, ?, ?)',
+                (key, path, committed, head)
+            )
+        return len(rows)
+    
+    def _where(self, guild=None, user=None, command=None, action=None, since=None, until=None, level=None):
+        """Build a WHERE clause from the common filters"""
+        clauses = []
+        params = []
+        
+        if guild:
+            if str(guild).isdigit():
+                clauses.append('guild_id = ?')
+                params.append(int(guild))
+            else:
+                clauses.append('guild = ? COLLATE NOCASE')
+                params.append(guild)
+        if user:
+            if str(user).isdigit():
+                clauses.append('user_id = ?')
+                params.append(int(user))
+            else:
+                clauses.append('(user = ? COLLATE NOCASE OR user LIKE ? COLLATE NOCASE)')
+                params.extend([user, f'{user}#%'])
+        if command:
+            clauses.append("kind = 'command' AND name = ?")
+            params.append(command)
+        if action:
+            clauses.append("kind = 'music' AND name = ?")
+            params.append(action)
+        if since:
+            clauses.append('ts >= ?')
+            params.append(parse_time(since))
+        if until:
+            clauses.append('ts <= ?')
+            params.append(parse_time(until, end=True))
+        if level:
+            clauses.append('level = ?')
+            params.append(level.upper())
+        
+        where = ' AND '.join(f'({clause})' for clause in clauses)
+        return (f'WHERE {where}' if where else ''), params
+    
+    def events(self, limit=50, **filters):
+        """Most recent matching events, oldest first"""
+        where, params = self._where(**filters)
+        rows = self.conn.execute(
+            f'SELECT ts, level, kind, name, guild, user, success, error, title FROM events {where} '
+            f'ORDER BY id DESC LIMIT ?', params + [limit]
+        ).fetchall()
+        return rows[::-1]
+    
+    def top_commands(self, limit=10, **filters):
+        where, params = self._where(**filters)
+        where = f"{where} AND kind = 'command'" if where else "WHERE kind = 'command'"
+        return self.conn.execute(
+            f'SELECT name, COUNT(*) AS uses FROM events {where} GROUP BY name ORDER BY uses DESC LIMIT ?',
+            params + [limit]
+        ).fetchall()
+    
+    def error_rate_by_guild(self, limit=10, **filters):
+        where, params = self._where(**filters)
+        where = f"{where} AND kind = 'command'" if where else "WHERE kind = 'command'"
+        return self.conn.execute(
+            f'SELECT guild, COUNT(*) AS total, SUM(success = 0) AS failed, '
+            f'ROUND(100.0 * SUM(success = 0) / COUNT(*), 1) AS rate FROM events {where} '
+            f'GROUP BY guild_id ORDER BY failed DESC, total DESC LIMIT ?',
+            params + [limit]
+        ).fetchall()
+    
+    def plays_per_hour(self, limit=24, **filters):
+        where, params = self._where(**filters)
+        play_filter = f"kind = 'music' AND name IN ({placeholders(PLAY_ACTIONS)})"
+        where = f'{where} AND {play_filter}' if where else f'WHERE {play_filter}'
+        rows = self.conn.execute(
+            f"SELECT substr(ts, 1, 13) || ':00' AS hour, COUNT(*) FROM events {where} "
+            f'GROUP BY hour ORDER BY hour DESC LIMIT ?',
+            params + list(PLAY_ACTIONS) + [limit]
+        ).fetchall()
+        return rows[::-1]
+    
+    def top_tracks(self, limit=10, **filters):
+        where, params = self._where(**filters)
+        request_filter = f"kind = 'music' AND name IN ({placeholders(REQUEST_ACTIONS)}) AND title IS NOT NULL"
+        where = f'{where} AND {request_filter}' if where else f'WHERE {request_filter}'
+        return self.conn.execute(
+            f'SELECT title, COUNT(*) AS requests, MAX(url) FROM events {where} '
+            f'GROUP BY COALESCE(url, title) ORDER BY requests DESC LIMIT ?',
+            params + list(REQUEST_ACTIONS) + [limit]
+        ).fetchall()
+    
+    def summary(self):
+        """Event counts per kind plus failures"""
+        return self.conn.execute(
+            'SELECT kind, COUNT(*), SUM(success = 0) FROM events GROUP BY kind ORDER BY kind'
+        ).fetchall()
@@ -1,7 +1,16 @@
 import os
+import re
+import sys
 import json
+import time
+import heapq
+import select
+import ctypes
+import ctypes.util
 import argparse
 
+from log_index import LogIndex, TIMESTAMP_PATTERN
+
 
 def format_log_entry(line):
     """Format log entry for better readability"""
@@ -30,11 +39,97 @@ def format_log_entry(line):
         return line.strip()
 
 
+def reverse_lines(filename, max_bytes=None, deadline=None, stats=None, block_size=64 * 1024):
+    """Yield lines from the end of a file backwards
+    
+    Stops early once max_bytes have been read or the monotonic deadline has
+    passed; stats['truncated'] is set when that happens before the start of
+    the file is reached.
+    """
+    if stats is None:
+        stats = {}
+    stats['bytes_read'] = 0
+    stats['truncated'] = False
+    
+    with open(filename, 'rb') as f:
+        f.seek(0, 2)
+        position = f.tell()
+        remainder = b''
+        
+        while position > 0:
+            if ((max_bytes is not None and stats['bytes_read'] >= max_bytes) or
+                    (deadline is not None and time.monotonic() >= deadline)):
+                stats['truncated'] = True
+                return
+            
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size) + remainder
+            stats['bytes_read'] += size
+            
+            lines = block.split(b'\n')
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                yield line.decode('utf-8', errors='replace')
+        
+        if remainder:
+            yield remainder.decode('utf-8', errors='replace')
+
+
+def reverse_records(filename, **limits):
+    """Yield whole log records newest first, keeping continuation lines attached"""
+    continuation = []
+    for line in reverse_lines(filename, **limits):
+        if not line:
+            continue
+        if TIMESTAMP_PATTERN.match(line):
+            yield '\n'.join([line] + continuation[::-1])
+            continuation = []
+        else:
+            continuation.append(line)
+
+
+def record_matches(record, level=None, module=None, guild=None, text=None):
+    """Check a log record against optional level, module, guild and text filters"""
+    parts = record.split(' | ', 3)
+    
+    if level and (len(parts) < 2 or parts[1].strip().upper() != level.upper()):
+        return False
+    if module and (len(parts) < 3 or module.lower() not in parts[2].lower()):
+        return False
+    if guild:
+        if guild.isdigit():
+            pattern = r'"guild_id":\s*' + guild + r'\b'
+        else:
+            pattern = r'"guild":\s*"' + re.escape(guild) + '"|\\bin ' + re.escape(guild) + r'\b'
+        if not re.search(pattern, record, re.IGNORECASE):
+            return False
+    if text and text.lower() not in record.lower():
+        return False
+    return True
+
+
+def tail_records(filename, count=50, max_bytes=None, time_budget=None, **filters):
+    """Return the newest `count` matching records (oldest first) and whether the scan was cut short"""
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    stats = {}
+    matches = []
+    
+    for record in reverse_records(filename, max_bytes=max_bytes, deadline=deadline, stats=stats):
+        if record_matches(record, **filters):
+            matches.append(record)
+            if len(matches) >= count:
+                break
+    
+    return matches[::-1], stats.get('truncated', False)
+
+
 def tail_file(filename, lines=50):
-    """Read last N lines from file"""
+    """Read last N records from file"""
     try:
-        with open(filename, 'r') as f:
-            return f.readlines()[-lines:]
+        records, _ = tail_records(filename, lines)
+        return records
     except FileNotFoundError:
         print(f"Log file {filename} not found!")
         return []
@@ -43,34 +138,206 @@ def tail_file(filename, lines=50):
         return []
 
 
-def watch_file(filename):
-    """Watch file for new entries (simple implementation)"""
-    try:
-        print(f"Watching {filename} for new entries... (Ctrl+C to stop)")
+class LogFollower:
+    """Follow a single log file across rotation and truncation"""
+    
+    def __init__(self, filename, label=None, from_end=True):
+        self.filename = filename
+        self.label = label
+        self._file = None
+        self._inode = None
+        self._partial = b''
+        self._last_timestamp = ''
+        self._open(seek_end=from_end)
+    
+    def _open(self, seek_end=False):
+        """Open the current file at the path, returning False if it is missing"""
+        try:
+            f = open(self.filename, 'rb')
+        except FileNotFoundError:
+            return False
         
-        if not os.path.exists(filename):
-            print(f"File {filename} doesn't exist yet. Waiting...")
-            return
-            
-        with open(filename, 'r') as f:
+        stat = os.fstat(f.fileno())
+        if seek_end:
             f.seek(0, 2)
+        
+        self._file = f
+        self._inode = (stat.st_dev, stat.st_ino)
+        return True
+    
+    def _drain(self):
+        """Read every complete line currently available on the open handle"""
+        data = self._file.read()
+        if not data:
+            return []
+        
+        data = self._partial + data
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+        return [line.decode('utf-8', errors='replace') for line in lines]
+    
+    def read_lines(self):
+        """Return complete lines written since the last call"""
+        if self._file is None and not self._open():
+            return []
+        
+        lines = self._drain()
+        
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            # Rotated away and not recreated yet, keep reading the old handle
+            return lines
+        
+        if (stat.st_dev, stat.st_ino) != self._inode:
+            # Rotated: finish the old file before switching to the new one
+            lines.extend(self._drain())
+            if self._partial:
+                lines.append(self._partial.decode('utf-8', errors='replace'))
+                self._partial = b''
+            self._file.close()
+            self._file = None
+            if self._open():
+                lines.extend(self._drain())
+        elif stat.st_size < self._file.tell():
+            # Truncated in place
+            self._file.seek(0)
+            self._partial = b''
+            lines.extend(self._drain())
+        
+        return lines
+    
+    def read_records(self):
+        """Return new log records as (timestamp, label, text) tuples
+        
+        Lines without a timestamp (tracebacks, indented JSON) are kept with
+        the record they belong to.
+        """
+        records = []
+        for line in self.read_lines():
+            if TIMESTAMP_PATTERN.match(line):
+                self._last_timestamp = line[:19]
+            elif records:
+                records[-1][2] += '\n' + line
+                continue
+            records.append([self._last_timestamp, self.label, line])
+        return [tuple(record) for record in records]
+    
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class _InotifyWaiter:
+    """Wake up on filesystem notifications (Linux only)"""
+    
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    
+    def __init__(self, directories, safety_interval=2.0):
+        self.safety_interval = safety_interval
+        
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        
+        mask = (self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM |
+                self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE)
+        for directory in directories:
+            if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+                error = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(error, f'inotify_add_watch failed for {directory}')
+    
+    def wait(self, active):
+        """Block until something changes (or the safety interval elapses)"""
+        ready, _, _ = select.select([self._fd], [], [], self.safety_interval)
+        if ready:
+            try:
+                while os.read(self._fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+    
+    def close(self):
+        os.close(self._fd)
+
+
+class _PollWaiter:
+    """Adaptive polling: fast while lines arrive, backing off when idle"""
+    
+    def __init__(self, min_interval=0.05, max_interval=1.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+    
+    def wait(self, active):
+        if active:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        time.sleep(self.interval)
+    
+    def close(self):
+        pass
+
+
+def _make_waiter(filenames):
+    """Use inotify where available, otherwise fall back to adaptive polling"""
+    if sys.platform.startswith('linux'):
+        directories = {os.path.dirname(os.path.abspath(f)) for f in filenames}
+        try:
+            return _InotifyWaiter(directories)
+        except (OSError, AttributeError):
+            pass
+    return _PollWaiter()
+
+
+def follow_files(files):
+    """Follow several log files at once, merging new records in timestamp order
+    
+    files: list of (label, filename) tuples
+    """
+    followers = [LogFollower(filename, label) for label, filename in files]
+    waiter = _make_waiter([filename for _, filename in files])
+    show_label = len(followers) > 1
+    
+    try:
+        print(f"Watching {', '.join(f.filename for f in followers)} for new entries... (Ctrl+C to stop)")
+        
+        active = False
+        while True:
+            waiter.wait(active)
+            batches = [follower.read_records() for follower in followers]
+            active = any(batches)
             
-            while True:
-                line = f.readline()
-                if line:
-                    print(format_log_entry(line), flush=True)
-                else:
-                    import time
-                    time.sleep(0.1)
-                    
+            for timestamp, label, text in heapq.merge(*batches, key=lambda r: r[0]):
+                entry = format_log_entry(text)
+                print(f"[{label}] {entry}" if show_label else entry, flush=True)
+                
     except KeyboardInterrupt:
         print("\nStopped watching.")
     except Exception as e:
         print(f"Error watching file: {e}")
+    finally:
+        waiter.close()
+        for follower in followers:
+            follower.close()
+
+
+def watch_file(filename):
+    """Watch file for new entries"""
+    follow_files([(None, filename)])
 
 
 def show_stats():
-    """Show log statistics"""
+    """Show log statistics (event counts come from the incremental index)"""
     log_files = {
         'bot.log': 'Main Bot Log',
         'music.log': 'Music Activity',
@@ -83,30 +350,95 @@ def show_stats():
     for filename, description in log_files.items():
         filepath = f"logs/{filename}"
         if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r') as f:
-                    lines = f.readlines()
-                    size = os.path.getsize(filepath)
-                    
-                print(f"{description:.<20} {len(lines):>6} lines ({size/1024:.1f} KB)")
-            except Exception as e:
-                print(f"{description:.<20} Error: {e}")
+            size = os.path.getsize(filepath)
+            print(f"{description:.<20} {size/1024:>8.1f} KB")
         else:
             print(f"{description:.<20} Not found")
+    
+    if not os.path.exists('logs'):
+        return
+    
+    index = LogIndex()
+    try:
+        added = index.update()
+        summary = index.summary()
+    finally:
+        index.close()
+    
+    print("-" * 50)
+    print(f"{'Indexed events':.<20} {sum(row[1] for row in summary):>6} ({added} new)")
+    for kind, count, failed in summary:
+        print(f"  {kind:.<18} {count:>6}" + (f" ({failed} failed)" if failed else ""))
+
+
+def run_query(args):
+    """Answer filters and aggregates from the log index"""
+    index = LogIndex()
+    try:
+        if args.reindex:
+            added = index.rebuild()
+        else:
+            added = index.update()
+        
+        filters = {
+            'guild': args.guild,
+            'user': args.user,
+            'command': args.command,
+            'action': args.action,
+            'since': args.since,
+            'until': args.until,
+            'level': args.level,
+        }
+        
+        print(f"🔎 Query ({added} new events indexed)")
+        print("=" * 60)
+        
+        if args.agg == 'top-commands':
+            for name, uses in index.top_commands(args.lines, **filters):
+                print(f"{name:.<30} {uses:>6}")
+        elif args.agg == 'error-rate':
+            for guild, total, failed, rate in index.error_rate_by_guild(args.lines, **filters):
+                print(f"{str(guild)[:30]:.<30} {failed:>5}/{total:<6} {rate:>5}%")
+        elif args.agg == 'plays-per-hour':
+            for hour, plays in index.plays_per_hour(args.lines, **filters):
+                print(f"{hour}  {plays:>5} {'█' * min(plays, 50)}")
+        elif args.agg == 'top-tracks':
+            for title, requests, url in index.top_tracks(args.lines, **filters):
+                print(f"{requests:>5}  {title}" + (f" ({url})" if url else ""))
+        else:
+            for ts, level, kind, name, guild, user, success, error, title in index.events(args.lines, **filters):
+                status = '' if success is None else (' ✅' if success else ' ❌')
+                detail = f" - {title}" if title else ''
+                detail += f" ({error})" if error else ''
+                print(f"[{ts}] {level} - {kind} '{name}' by {user or '-'} in {guild or '-'}{status}{detail}")
+    finally:
+        index.close()
 
 
 def main():
     parser = argparse.ArgumentParser(description='Discord Bot Log Viewer')
     parser.add_argument('log_type', nargs='?', default='bot', 
-                       choices=['bot', 'music', 'errors', 'all'],
-                       help='Type of log to view (default: bot)')
+                       choices=['bot', 'music', 'errors', 'all', 'query'],
+                       help='Type of log to view, or "query" to search the event index (default: bot)')
     parser.add_argument('-n', '--lines', type=int, default=50,
                        help='Number of lines to show (default: 50)')
     parser.add_argument('-w', '--watch', action='store_true',
-                       help='Watch for new log entries')
+                       help='Follow new log entries (survives log rotation; use "all" to merge every log)')
     parser.add_argument('-s', '--stats', action='store_true',
                        help='Show log statistics')
     
+    query_group = parser.add_argument_group('query options')
+    query_group.add_argument('--guild', help='Filter by guild name or ID')
+    query_group.add_argument('--user', help='Filter by user name or ID')
+    query_group.add_argument('--command', help='Filter by command name')
+    query_group.add_argument('--action', help='Filter by music action (play_now, add_to_queue, ...)')
+    query_group.add_argument('--since', help='Start time: 2024-01-01, "2024-01-01 12:00" or relative (30m, 12h, 7d, 2w)')
+    query_group.add_argument('--until', help='End time, same formats as --since')
+    query_group.add_argument('--level', help='Filter by log level')
+    query_group.add_argument('--agg', choices=['events', 'top-commands', 'error-rate', 'plays-per-hour', 'top-tracks'],
+                             default='events', help='Aggregate to compute (default: events)')
+    query_group.add_argument('--reindex', action='store_true', help='Rebuild the index from scratch')
+    
     args = parser.parse_args()
     
     if args.stats:
@@ -117,12 +449,28 @@ def main():
         print("Logs directory doesn't exist. Run the bot first to generate logs.")
         return
     
+    if args.log_type == 'query':
+        run_query(args)
+        return
+    
     log_files = {
         'bot': 'logs/bot.log',
         'music': 'logs/music.log', 
         'errors': 'logs/errors.log'
     }
     
+    if args.watch:
+        if args.log_type == 'all':
+            watch_list = list(log_files.items())
+        else:
+            filename = log_files.get(args.log_type)
+            if not filename or not os.path.exists(filename):
+                print(f"Log file for '{args.log_type}' not found!")
+                return
+            watch_list = [(args.log_type, filename)]
+        follow_files(watch_list)
+        return
+    
     if args.log_type == 'all':
         print("📋 All Recent Log Entries:")
         print("=" * 60)
@@ -138,15 +486,11 @@ def main():
             print(f"Log file for '{args.log_type}' not found!")
             return
         
-        if args.watch:
-            watch_file(filename)
-        else:
-            print(f"📋 Last {args.lines} entries from {args.log_type} log:")
-            print("=" * 60)
-            lines = tail_file(filename, args.lines)
-            for line in lines:
-                print(format_log_entry(line))
-
+        print(f"📋 Last {args.lines} entries from {args.log_type} log:")
+        print("=" * 60)
+        lines = tail_file(filename, args.lines)
+        for line in lines:
+            print(format_log_entry(line))
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
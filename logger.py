@@ -10,10 +10,11 @@ from datetime import datetime
 class AsyncLogHandler(logging.Handler):
     """Non-blocking log handler that uses a background thread"""
     
-    def __init__(self, handler):
+    def __init__(self, handler, max_queue_size=10000):
         super().__init__()
         self.handler = handler
-        self.queue = queue.Queue()
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
         self.worker = threading.Thread(target=self._worker, daemon=True)
         self.worker.start()
     
@@ -24,7 +25,8 @@ class AsyncLogHandler(logging.Handler):
                 record = self.queue.get()
                 if record is None:
                     break
-                self.handler.emit(record)
+                # handle() applies the wrapped handler's level and filters
+                self.handler.handle(record)
                 self.queue.task_done()
             except Exception:
                 pass
@@ -34,7 +36,23 @@ class AsyncLogHandler(logging.Handler):
         try:
             self.queue.put_nowait(record)
         except queue.Full:
-            pass
+            self.dropped += 1
+
+
+def _file_handler(filename, max_bytes, backup_count):
+    """Rotating file handler, or a watched one inside cluster workers
+    
+    Cluster workers share the log files with the orchestrator. Only the
+    orchestrator rotates them; workers reopen the file after it is renamed.
+    """
+    if os.getenv('CLUSTER_ID'):
+        return logging.handlers.WatchedFileHandler(filename, encoding='utf-8')
+    return logging.handlers.RotatingFileHandler(
+        filename,
+        maxBytes=max_bytes,
+        backupCount=backup_count,
+        encoding='utf-8'
+    )
 
 
 class BotLogger:
@@ -55,18 +73,14 @@ class BotLogger:
         
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
+        cluster_tag = f"cluster {os.getenv('CLUSTER_ID')} | " if os.getenv('CLUSTER_ID') else ''
         console_format = logging.Formatter(
-            '%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
+            '%(asctime)s | %(levelname)-8s | ' + cluster_tag + '%(name)s | %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         console_handler.setFormatter(console_format)
         
-        file_handler = logging.handlers.RotatingFileHandler(
-            'logs/bot.log',
-            maxBytes=10*1024*1024,
-            backupCount=5,
-            encoding='utf-8'
-        )
+        file_handler = _file_handler('logs/bot.log', 10*1024*1024, 5)
         file_handler.setLevel(logging.DEBUG)
         file_format = logging.Formatter(
             '%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s',
@@ -74,21 +88,11 @@ class BotLogger:
         )
         file_handler.setFormatter(file_format)
         
-        error_handler = logging.handlers.RotatingFileHandler(
-            'logs/errors.log',
-            maxBytes=5*1024*1024,
-            backupCount=3,
-            encoding='utf-8'
-        )
+        error_handler = _file_handler('logs/errors.log', 5*1024*1024, 3)
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(file_format)
         
-        music_handler = logging.handlers.RotatingFileHandler(
-            'logs/music.log',
-            maxBytes=5*1024*1024,
-            backupCount=3,
-            encoding='utf-8'
-        )
+        music_handler = _file_handler('logs/music.log', 5*1024*1024, 3)
         music_handler.setLevel(logging.DEBUG)
         music_handler.setFormatter(file_format)
         
@@ -99,11 +103,20 @@ class BotLogger:
         async_error_handler = AsyncLogHandler(error_handler)
         async_music_handler = AsyncLogHandler(music_handler)
         
+        self.async_handlers = [async_file_handler, async_error_handler, async_music_handler]
+        
         self.logger.addHandler(console_handler)
         self.logger.addHandler(async_file_handler)
         self.logger.addHandler(async_error_handler)
         self.logger.addHandler(async_music_handler)
     
+    def queue_stats(self):
+        """Total records waiting in the async handlers and total dropped"""
+        handlers = getattr(self, 'async_handlers', [])
+        depth = sum(handler.queue.qsize() for handler in handlers)
+        dropped = sum(handler.dropped for handler in handlers)
+        return depth, dropped
+    
     def get_logger(self, module_name=None):
         """Get logger instance for specific module"""
         if module_name:
@@ -212,4 +225,8 @@ def log_voice(member, before, after, event_type):
 
 def log_bot(event_type, details=None):
     """Log bot events"""
-    bot_logger.log_bot_event(event_type, details) 
\ No newline at end of file
+    bot_logger.log_bot_event(event_type, details)
+
+def log_queue_stats():
+    """Get (queued, dropped) record counts for the async log handlers"""
+    return bot_logger.queue_stats()
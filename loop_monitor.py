@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import asyncio
+import inspect
+import threading
+import traceback
+import weakref
+
+from logger import get_logger
+import metrics
+
+logger = get_logger("LoopMonitor")
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+LOOP_LAG = metrics.REGISTRY.histogram(
+    'discord_event_loop_lag_seconds', 'Event loop scheduling lag',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_BLOCKED = metrics.REGISTRY.counter(
+    'discord_event_loop_blocked_total', 'Callbacks that held the event loop past the lag threshold'
+)
+
+
+class Blocker:
+    """Aggregated stats for one blocking call site"""
+    
+    def __init__(self, location):
+        self.location = location
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.coroutine = None
+        self.command = None
+        self.stack = ''
+    
+    def add(self, duration, coroutine, command, stack):
+        self.count += 1
+        self.total += duration
+        if duration >= self.worst:
+            self.worst = duration
+            self.coroutine = coroutine
+            self.command = command
+            self.stack = stack
+
+
+class LoopMonitor:
+    """Measure event-loop lag and sample the stack of callbacks that block it
+    
+    A heartbeat coroutine wakes every `interval` seconds and records how late
+    it was scheduled. A watchdog thread notices when the heartbeat stops
+    ticking for longer than `threshold`, captures the loop thread's stack and
+    the running task, and the stall is attributed to that sample once the
+    loop recovers.
+    """
+    
+    def __init__(self, interval=0.25, threshold=0.2, stack_depth=12):
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_depth = stack_depth
+        
+        self.loop = None
+        self.max_lag = 0.0
+        self.blockers = {}
+        
+        self._task_labels = weakref.WeakKeyDictionary()
+        self._loop_thread_id = None
+        self._last_tick = 0.0
+        self._pending = None
+        self._running = False
+        self._heartbeat_task = None
+        self._watchdog = None
+    
+    def start(self):
+        """Start monitoring the running loop (call from inside the loop)"""
+        if self._running:
+            return
+        
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._running = True
+        
+        self._heartbeat_task = self.loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event loop monitor started (threshold {self.threshold * 1000:.0f}ms)")
+    
+    async def stop(self):
+        self._running = False
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+    
+    def tag_current_task(self, label):
+        """Label the running task (e.g. with a command name) for blocker reports"""
+        task = asyncio.current_task()
+        if task is not None:
+            self._task_labels[task] = label
+    
+    def untag_current_task(self):
+        task = asyncio.current_task()
+        if task is not None:
+            self._task_labels.pop(task, None)
+    
+    async def _heartbeat(self):
+        while self._running:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            previous_tick, self._last_tick = self._last_tick, now
+            
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            
+            pending, self._pending = self._pending, None
+            # Only attribute the lag to a sample taken during this very stall
+            if pending is not None and pending[0] == previous_tick and lag >= self.threshold:
+                self._record(lag, *pending[1])
+    
+    def _watch(self):
+        """Watchdog thread: sample the loop thread's stack once per stall"""
+        sampled_tick = None
+        while self._running:
+            time.sleep(self.threshold / 2)
+            
+            tick = self._last_tick
+            stalled = time.monotonic() - tick - self.interval
+            if stalled < self.threshold or sampled_tick == tick:
+                continue
+            
+            sampled_tick = tick
+            try:
+                sample = self._sample()
+                if sample is not None:
+                    self._pending = (tick, sample)
+            except Exception as e:
+                logger.debug(f"Failed to sample event loop stack: {e}")
+    
+    def _sample(self):
+        """Capture (location, coroutine, command, stack) for whatever holds the loop"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        
+        summary = traceback.extract_stack(frame)
+        location = self._blocking_location(summary)
+        stack = ''.join(traceback.format_list(summary[-self.stack_depth:]))
+        
+        coroutine = None
+        command = None
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        if task is not None:
+            command = self._task_labels.get(task)
+            coroutine = getattr(task.get_coro(), '__qualname__', None)
+        
+        if coroutine is None:
+            coroutine = self._outermost_coroutine(frame)
+        
+        return location, coroutine, command, stack
+    
+    @staticmethod
+    def _blocking_location(summary):
+        """Innermost frame in project code, falling back to the innermost frame"""
+        for entry in reversed(summary):
+            if (entry.filename.startswith(PROJECT_ROOT) and entry.filename != __file__
+                    and 'site-packages' not in entry.filename):
+                return f"{os.path.relpath(entry.filename, PROJECT_ROOT)}:{entry.lineno} in {entry.name}"
+        entry = summary[-1]
+        return f"{entry.filename}:{entry.lineno} in {entry.name}"
+    
+    @staticmethod
+    def _outermost_coroutine(frame):
+        name = None
+        while frame is not None:
+            if frame.f_code.co_flags & inspect.CO_COROUTINE:
+                name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+            frame = frame.f_back
+        return name
+    
+    def _record(self, duration, location, coroutine, command, stack):
+        LOOP_BLOCKED.inc()
+        blocker = self.blockers.get(location)
+        if blocker is None:
+            blocker = self.blockers[location] = Blocker(location)
+        blocker.add(duration, coroutine, command, stack)
+        
+        logger.warning(
+            f"Event loop blocked for {duration * 1000:.0f}ms at {location} "
+            f"(coroutine: {coroutine or 'unknown'}, command: {command or 'none'})"
+        )
+    
+    def report(self, limit=10):
+        """Worst blockers ranked by total time they held the loop"""
+        return sorted(self.blockers.values(), key=lambda b: b.total, reverse=True)[:limit]
+    
+    def reset(self):
+        self.blockers.clear()
+        self.max_lag = 0.0
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,161 @@
+import json
+import asyncio
+import collections
+
+from logger import get_logger
+import metrics
+
+logger = get_logger("Loudness")
+
+LOUDNESS_ANALYSES = metrics.REGISTRY.counter(
+    'discord_loudness_analyses_total', 'Background track loudness measurements', ('result',)
+)
+LOUDNESS_LOOKUPS = metrics.REGISTRY.counter(
+    'discord_loudness_lookups_total', 'Plays that looked up a stored gain', ('result',)
+)
+
+
+def parse_loudnorm(stderr):
+    """Measured values from the JSON block ffmpeg's loudnorm filter prints last"""
+    start = stderr.rfind('{')
+    end = stderr.rfind('}')
+    if start == -1 or end < start:
+        return None
+    try:
+        return json.loads(stderr[start:end + 1])
+    except ValueError:
+        return None
+
+
+class LoudnessCache:
+    """Per-track gain to reach a target loudness, measured once in the background
+    
+    Gains are kept in an LRU keyed by video ID and shared by every guild.
+    `gain(video_id)` is a dict lookup, so a play never waits for a
+    measurement: unknown tracks play unchanged and get queued for analysis,
+    and later plays apply the stored gain as an ffmpeg volume filter.
+    """
+    
+    def __init__(self, target=-16.0, true_peak=-1.5, max_gain=12.0, max_entries=5000,
+                 max_running=1, analysis_seconds=120, timeout=300):
+        self.enabled = True
+        self.target = target
+        self.true_peak = true_peak
+        self.max_gain = max_gain
+        self.max_entries = max_entries
+        self.max_running = max_running
+        self.analysis_seconds = analysis_seconds
+        self.timeout = timeout
+        self._gains = collections.OrderedDict()
+        self._pending = {}
+        self._semaphore = None
+    
+    def __len__(self):
+        return len(self._gains)
+    
+    def gain(self, video_id):
+        """Stored gain in dB, or None when the track has not been measured yet"""
+        if not video_id:
+            return None
+        gain = self._gains.get(video_id)
+        if gain is None:
+            LOUDNESS_LOOKUPS.inc(result='miss')
+            return None
+        self._gains.move_to_end(video_id)
+        LOUDNESS_LOOKUPS.inc(result='hit')
+        return gain
+    
+    def store(self, video_id, gain):
+        self._gains[video_id] = gain
+        self._gains.move_to_end(video_id)
+        while len(self._gains) > self.max_entries:
+            self._gains.popitem(last=False)
+    
+    def filter_for(self, video_id):
+        """ffmpeg audio filter applying the stored gain, or None"""
+        if not self.enabled:
+            return None
+        gain = self.gain(video_id)
+        if gain is None or abs(gain) < 0.1:
+            return None
+        return f'volume={gain:.1f}dB'
+    
+    def request_analysis(self, video_id, stream_url):
+        """Measure a track in the background unless it is known or already being measured"""
+        if not self.enabled or not video_id or not stream_url:
+            return
+        if video_id in self._gains or video_id in self._pending:
+            return
+        self._pending[video_id] = asyncio.create_task(self._analyse(video_id, stream_url))
+    
+    def _gain_from(self, measured):
+        loudness = float(measured['input_i'])
+        peak = float(measured['input_tp'])
+        if loudness == float('-inf') or loudness < -70:
+            return 0.0  # Silence, nothing sensible to normalise to
+        gain = self.target - loudness
+        # A plain volume filter has no limiter, so never push the peak past the ceiling
+        gain = min(gain, self.true_peak - peak)
+        return max(-self.max_gain, min(self.max_gain, gain))
+    
+    async def _analyse(self, video_id, stream_url):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_running)
+        
+        try:
+            async with self._semaphore:
+                measured = await self._measure(stream_url)
+            if measured is None:
+                LOUDNESS_ANALYSES.inc(result='failed')
+                return
+            gain = self._gain_from(measured)
+            self.store(video_id, gain)
+            LOUDNESS_ANALYSES.inc(result='ok')
+            logger.debug(f"Measured {video_id}: {measured['input_i']} LUFS, gain {gain:+.1f} dB")
+        except asyncio.CancelledError:
+            raise
+        except FileNotFoundError:
+            self.enabled = False
+            logger.warning("ffmpeg not found, loudness normalisation disabled")
+        except Exception as e:
+            LOUDNESS_ANALYSES.inc(result='failed')
+            logger.warning(f"Loudness analysis of {video_id} failed: {e}")
+        finally:
+            self._pending.pop(video_id, None)
+    
+    async def _measure(self, stream_url):
+        """Run ffmpeg's loudnorm analysis over the start of a stream"""
+        args = [
+            'ffmpeg', '-hide_banner', '-nostats',
+            '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+            '-i', stream_url, '-vn',
+        ]
+        if self.analysis_seconds:
+            args += ['-t', str(self.analysis_seconds)]
+        args += [
+            '-af', f'loudnorm=I={self.target}:TP={self.true_peak}:print_format=json',
+            '-f', 'null', '-'
+        ]
+        
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+        
+        if process.returncode != 0:
+            logger.debug(f"ffmpeg exited with {process.returncode} while measuring loudness")
+            return None
+        return parse_loudnorm(stderr.decode('utf-8', errors='replace'))
+    
+    def close(self):
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
+
+
+loudness_cache = LoudnessCache()
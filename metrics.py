@@ -0,0 +1,230 @@
+import math
+import bisect
+
+from logger import get_logger
+
+logger = get_logger("Metrics")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class for in-process metrics keyed by label values"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+    
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _label_string(self, key, extra=None):
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+    
+    def clear(self):
+        self._values.clear()
+    
+    def samples(self):
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{self._label_string(key)} {_format_value(value)}"
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    
+    kind = 'counter'
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+    
+    def set_total(self, value, **labels):
+        """Mirror a total that is counted elsewhere (e.g. dropped log records)"""
+        self._values[self._key(labels)] = value
+    
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    
+    kind = 'gauge'
+    
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+    
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations with sum and count"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Per-bucket counts (non-cumulative), then sum and count
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+    
+    def samples(self):
+        for key, (counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{self._label_string(key, le)} {cumulative}"
+            yield f"{self.name}_sum{self._label_string(key)} {_format_value(total)}"
+            yield f"{self.name}_count{self._label_string(key)} {count}"
+
+
+class MetricsRegistry:
+    """Holds every metric plus collectors that refresh gauges at scrape time"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+    
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def add_collector(self, name, collector):
+        """Register a cheap, non-blocking callable run before each scrape"""
+        self._collectors[name] = collector
+    
+    def remove_collector(self, name):
+        self._collectors.pop(name, None)
+    
+    def render(self):
+        for name, collector in list(self._collectors.items()):
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector {name} failed: {e}")
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+COMMAND_LATENCY = REGISTRY.histogram(
+    'discord_command_latency_seconds', 'Time spent running prefix commands', ('command', 'status')
+)
+COMMANDS_TOTAL = REGISTRY.counter(
+    'discord_commands_total', 'Prefix commands completed or failed', ('command', 'status')
+)
+VOICE_CLIENTS = REGISTRY.gauge('discord_voice_clients', 'Active voice clients')
+QUEUE_LENGTH = REGISTRY.gauge('discord_music_queue_length', 'Queued tracks per guild', ('guild_id',))
+EXTRACTION_LATENCY = REGISTRY.histogram(
+    'discord_extraction_latency_seconds', 'yt-dlp extraction time', ('kind',)
+)
+EXTRACTION_FAILURES = REGISTRY.counter(
+    'discord_extraction_failures_total', 'Failed yt-dlp extractions', ('kind',)
+)
+VOICE_RECOVERY_LATENCY = REGISTRY.histogram(
+    'discord_voice_recovery_seconds', 'Time from a dropped voice connection to playback resuming',
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+VOICE_RECOVERIES = REGISTRY.counter(
+    'discord_voice_recoveries_total', 'Dropped voice sessions reconnected or given up on', ('result',)
+)
+GATEWAY_LATENCY = REGISTRY.gauge('discord_gateway_latency_seconds', 'Gateway heartbeat latency per shard', ('shard',))
+SHARDS_READY = REGISTRY.gauge('discord_shards_ready', 'Shards that are connected and ready')
+LOG_QUEUE_DEPTH = REGISTRY.gauge('discord_log_queue_depth', 'Log records waiting to be written')
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    'discord_log_records_dropped_total', 'Log records dropped because the log queue was full'
+)
+
+
+class MetricsServer:
+    """Serve the registry over HTTP for Prometheus to scrape"""
+    
+    def __init__(self, host='127.0.0.1', port=9108, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner = None
+    
+    async def start(self):
+        from aiohttp import web
+        
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle_metrics)
+        
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+    
+    async def _handle_metrics(self, request):
+        from aiohttp import web
+        
+        # Rendering only walks in-memory dicts, so it is safe on the event loop
+        body = self.registry.render()
+        return web.Response(
+            body=body.encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+    
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
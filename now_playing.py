@@ -0,0 +1,171 @@
+import time
+import asyncio
+
+import discord
+
+from logger import get_logger
+import metrics
+
+logger = get_logger("NowPlaying")
+
+NOW_PLAYING_API_CALLS = metrics.REGISTRY.counter(
+    'discord_now_playing_api_calls_total', 'Now playing message sends, edits and deletes'
+)
+NOW_PLAYING_CALLS_SAVED = metrics.REGISTRY.counter(
+    'discord_now_playing_calls_saved_total', 'Now playing updates folded into an already scheduled edit'
+)
+
+
+class PlayerState:
+    """The track a guild is playing and where playback is in it"""
+    
+    __slots__ = ('track', 'started_at', 'paused_at', 'paused_total')
+    
+    def __init__(self, track, position=0.0):
+        self.track = track
+        self.started_at = time.monotonic() - position
+        self.paused_at = None
+        self.paused_total = 0.0
+    
+    @property
+    def paused(self):
+        return self.paused_at is not None
+    
+    def pause(self):
+        if self.paused_at is None:
+            self.paused_at = time.monotonic()
+    
+    def resume(self):
+        if self.paused_at is not None:
+            self.paused_total += time.monotonic() - self.paused_at
+            self.paused_at = None
+    
+    def position(self, now=None):
+        """Seconds of the track played so far, not counting paused time"""
+        end = self.paused_at if self.paused_at is not None else (now or time.monotonic())
+        return max(0.0, end - self.started_at - self.paused_total)
+
+
+def progress_bar(position, duration, width=16):
+    if not duration:
+        return '🔘' + '▬' * (width - 1)
+    filled = min(width - 1, int(position / duration * width))
+    return '▬' * filled + '🔘' + '▬' * (width - 1 - filled)
+
+
+class NowPlayingBoard:
+    """One persistent "Now Playing" message per guild, edited in place
+    
+    `render(guild_id)` builds the current embed (None when idle). Updates
+    requested while an edit is already scheduled are folded into it, so a
+    burst of queue changes inside `window` seconds costs one API call.
+    """
+    
+    def __init__(self, render, window=2.0):
+        self.render = render
+        self.window = window
+        self.channels = {}
+        self.messages = {}
+        self.api_calls = 0
+        self.calls_saved = 0
+        self._pending = {}
+        self._locks = {}
+    
+    def request_update(self, guild_id, channel=None):
+        """Schedule an update of the guild's player message (coalesced)"""
+        if channel is not None:
+            self.channels[guild_id] = channel
+        
+        if guild_id in self._pending:
+            self.calls_saved += 1
+            NOW_PLAYING_CALLS_SAVED.inc()
+            return
+        
+        # The first message goes out straight away, later changes wait for the window
+        delay = self.window if guild_id in self.messages else 0
+        self._pending[guild_id] = asyncio.create_task(self._flush_later(guild_id, delay))
+    
+    async def repost(self, guild_id, channel):
+        """Move the player message to the bottom of `channel` right away"""
+        self.channels[guild_id] = channel
+        pending = self._pending.pop(guild_id, None)
+        if pending:
+            pending.cancel()
+        await self._flush(guild_id, repost=True)
+    
+    async def _flush_later(self, guild_id, delay):
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._pending.pop(guild_id, None)
+        await self._flush(guild_id)
+    
+    async def _call(self, coroutine):
+        self.api_calls += 1
+        NOW_PLAYING_API_CALLS.inc()
+        return await coroutine
+    
+    async def _flush(self, guild_id, repost=False):
+        # [lock, flushes holding or waiting for it], so the lock can go once the guild is idle
+        entry = self._locks.get(guild_id)
+        if entry is None:
+            entry = self._locks[guild_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        idle = False
+        try:
+            async with entry[0]:
+                idle = await self._update(guild_id, repost)
+        finally:
+            entry[1] -= 1
+            # Most guilds that stop playing never come back, keep no lock for them
+            if idle and not entry[1] and self._locks.get(guild_id) is entry:
+                del self._locks[guild_id]
+    
+    async def _update(self, guild_id, repost):
+        """Send, edit or retire the player message, True when the guild went idle"""
+        channel = self.channels.get(guild_id)
+        if channel is None:
+            return True
+        
+        embed = self.render(guild_id)
+        if embed is None:
+            # Before any await, so a channel set by a later request_update is kept
+            self.channels.pop(guild_id, None)
+        message = self.messages.get(guild_id)
+        
+        try:
+            if message is not None and (repost or message.channel.id != channel.id):
+                try:
+                    await self._call(message.delete())
+                except discord.NotFound:
+                    pass
+                message = None
+            
+            if embed is None:
+                # Playback ended: leave the last state in place and start fresh next time
+                self.messages.pop(guild_id, None)
+                if message is not None:
+                    await self._call(message.edit(embed=discord.Embed(
+                        title="⏹️ Nothing playing",
+                        description="The queue is empty.",
+                        color=discord.Color.dark_grey()
+                    )))
+                return True
+            
+            if message is not None:
+                try:
+                    await self._call(message.edit(embed=embed))
+                    return False
+                except discord.NotFound:
+                    pass
+            
+            self.messages[guild_id] = await self._call(channel.send(embed=embed))
+        
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to update now playing message in guild {guild_id}: {e}")
+        return embed is None
+    
+    def close(self):
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
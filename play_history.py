@@ -0,0 +1,174 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+
+from logger import get_logger
+
+logger = get_logger("PlayHistory")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT,
+    duration INTEGER
+);
+CREATE TABLE IF NOT EXISTS plays (
+    track_id INTEGER NOT NULL,
+    guild_id INTEGER NOT NULL,
+    played_at INTEGER NOT NULL,
+    requester_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_plays_track ON plays(track_id);
+CREATE INDEX IF NOT EXISTS idx_plays_guild ON plays(guild_id, played_at);
+'''
+
+
+class PlayHistory:
+    """Every track played, per guild, in a compact SQLite store
+    
+    Tracks are stored once and each play is a row of four integers. Plays
+    are buffered in memory and written in batches, either when `batch_size`
+    of them are waiting or every flush interval, never on the playback path.
+    """
+    
+    def __init__(self, batch_size=100):
+        self.batch_size = batch_size
+        self.path = None
+        self._buffer = []
+        self._conn = None
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+    
+    def open(self, path):
+        """Create the database if needed (blocking)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+    
+    def record(self, track, guild_id, requester_id=None, played_at=None):
+        """Buffer one play, flushing in the background once a batch is full"""
+        key = track.video_id or track.webpage_url
+        if not key or not track.webpage_url:
+            return
+        self._buffer.append((
+            key, track.webpage_url, track.title, int(track.duration or 0),
+            guild_id, int(played_at or time.time()), requester_id
+        ))
+        if len(self._buffer) >= self.batch_size:
+            asyncio.create_task(self.flush())
+    
+    def _write(self, rows):
+        with self._lock, self._conn:
+            track_ids = {}
+            for key, url, title, duration, _, _, _ in rows:
+                if key in track_ids:
+                    continue
+                self._conn.execute(
+                    'INSERT INTO tracks (key, url, title, duration) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET url = excluded.url, title = excluded.title, duration = excluded.duration',
+                    (key, url, title, duration)
+                )
+                track_ids[key] = self._conn.execute('SELECT id FROM tracks WHERE key = ?', (key,)).fetchone()[0]
+            
+            self._conn.executemany(
+                'INSERT INTO plays (track_id, guild_id, played_at, requester_id) VALUES (?, ?, ?, ?)',
+                [(track_ids[key], guild_id, played_at, requester_id)
+                 for key, _, _, _, guild_id, played_at, requester_id in rows]
+            )
+    
+    async def flush(self):
+        """Write buffered plays in one transaction off the event loop"""
+        async with self._flush_lock:
+            if not self._buffer or self._conn is None:
+                return 0
+            rows, self._buffer = self._buffer, []
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._write, rows)
+            except sqlite3.Error as e:
+                # Keep them for the next attempt, in front of anything recorded since
+                self._buffer[:0] = rows
+                logger.error(f"Failed to save {len(rows)} play(s): {e}")
+                return 0
+            return len(rows)
+    
+    def top_tracks(self, guild_id=None, limit=10, since=None):
+        """(title, url, plays) most played first, for one guild or everywhere (blocking)"""
+        clauses = []
+        params = []
+        if guild_id is not None:
+            clauses.append('plays.guild_id = ?')
+            params.append(guild_id)
+        if since is not None:
+            clauses.append('plays.played_at >= ?')
+            params.append(int(since))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        
+        with self._lock:
+            return self._conn.execute(
+                f'SELECT tracks.title, tracks.url, COUNT(*) AS count FROM plays '
+                f'JOIN tracks ON tracks.id = plays.track_id {where} '
+                f'GROUP BY plays.track_id ORDER BY count DESC LIMIT ?',
+                params + [limit]
+            ).fetchall()
+    
+    def top_tracks_per_guild(self, guild_ids, limit=5):
+        """{guild_id: [(title, url, plays), ...]} for the given guilds, in one query (blocking)"""
+        # Only the given guilds are grouped and ranked. A temp table holds them,
+        # a worker can have more guilds than SQLite allows bound parameters
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TEMP TABLE IF NOT EXISTS wanted_guilds (guild_id INTEGER PRIMARY KEY)')
+            self._conn.execute('DELETE FROM wanted_guilds')
+            self._conn.executemany('INSERT OR IGNORE INTO wanted_guilds VALUES (?)', ((guild_id,) for guild_id in guild_ids))
+            rows = self._conn.execute(
+                'SELECT ranked.guild_id, tracks.title, tracks.url, ranked.count FROM ('
+                '    SELECT guild_id, track_id, COUNT(*) AS count,'
+                '           ROW_NUMBER() OVER (PARTITION BY guild_id ORDER BY COUNT(*) DESC) AS rank'
+                '    FROM plays WHERE guild_id IN (SELECT guild_id FROM wanted_guilds) GROUP BY guild_id, track_id'
+                ') AS ranked JOIN tracks ON tracks.id = ranked.track_id '
+                'WHERE ranked.rank <= ? ORDER BY ranked.guild_id, ranked.rank',
+                (limit,)
+            ).fetchall()
+        
+        top = {}
+        for guild_id, title, url, count in rows:
+            top.setdefault(guild_id, []).append((title, url, count))
+        return top
+    
+    def track_plays(self):
+        """(title, url, guild_id, plays) for every track played, per guild (blocking)"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT tracks.title, tracks.url, plays.guild_id, COUNT(*) FROM plays '
+                'JOIN tracks ON tracks.id = plays.track_id WHERE tracks.title IS NOT NULL '
+                'GROUP BY plays.track_id, plays.guild_id'
+            ).fetchall()
+    
+    async def _flush_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+    
+    def start(self, interval):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically(interval))
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        async with self._flush_lock:
+            if self._conn is not None:
+                with self._lock:
+                    self._conn.close()
+                self._conn = None
+
+
+play_history = PlayHistory()
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+
+from logger import get_logger
+
+logger = get_logger("Polls")
+
+# Reaction used for each option, in order
+OPTION_EMOJIS = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟']
+YES_NO_EMOJIS = ['✅', '❌']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS polls (
+    message_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    channel_id INTEGER NOT NULL,
+    author_id INTEGER,
+    question TEXT NOT NULL,
+    options TEXT NOT NULL,
+    emojis TEXT NOT NULL,
+    closes_at REAL NOT NULL,
+    tallies TEXT NOT NULL,
+    closed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_polls_open ON polls(closed, closes_at);
+'''
+
+
+class Poll:
+    """An open poll with its running vote tallies, one count per option"""
+    
+    __slots__ = ('message_id', 'guild_id', 'channel_id', 'author_id', 'question', 'options',
+                 'emojis', 'closes_at', 'tallies', '_option_by_emoji')
+    
+    def __init__(self, message_id, guild_id, channel_id, author_id, question, options, emojis,
+                 closes_at, tallies=None):
+        self.message_id = message_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.question = question
+        self.options = list(options)
+        self.emojis = list(emojis)
+        self.closes_at = closes_at
+        self.tallies = list(tallies) if tallies else [0] * len(self.options)
+        self._option_by_emoji = {emoji: index for index, emoji in enumerate(self.emojis)}
+    
+    def option_index(self, emoji):
+        return self._option_by_emoji.get(emoji)
+    
+    def total_votes(self):
+        return sum(self.tallies)
+    
+    def results(self):
+        """(option, votes, share) rows, most votes first"""
+        total = self.total_votes()
+        rows = [(option, votes, votes / total if total else 0.0) for option, votes in zip(self.options, self.tallies)]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+
+class PollStore:
+    """Open polls kept in memory, persisted to SQLite
+    
+    Votes only touch the in-memory tally and mark the poll dirty, `flush()`
+    writes dirty tallies in one transaction. Tallies are stored as a short
+    comma-separated list per poll, never as per-voter rows.
+    
+    The polls themselves are only read and changed on the event loop thread,
+    the executor gets the SQL and its rows.
+    """
+    
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        # Writes run in the default executor, one at a time
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.polls = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._write_lock = asyncio.Lock()
+    
+    def _read(self):
+        with self._lock:
+            return self.conn.execute(
+                'SELECT message_id, guild_id, channel_id, author_id, question, options, emojis, closes_at, tallies '
+                'FROM polls WHERE closed = 0'
+            ).fetchall()
+        
+    def _write(self, sql, rows):
+        with self._lock, self.conn:
+            self.conn.executemany(sql, rows)
+    
+    async def _execute(self, sql, rows):
+        # One write at a time, in the order they were made on the loop
+        async with self._write_lock:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, sql, rows)
+    
+    async def load(self, serves=None):
+        """Read the open polls into memory, returns how many there are
+        
+        `serves(guild_id)` picks the polls of this process, the database is
+        shared by every cluster worker.
+        """
+        rows = await asyncio.get_running_loop().run_in_executor(None, self._read)
+        loaded = 0
+        for message_id, guild_id, channel_id, author_id, question, options, emojis, closes_at, tallies in rows:
+            if serves is not None and not serves(guild_id):
+                continue
+            self.polls[message_id] = Poll(
+                message_id, guild_id, channel_id, author_id, question,
+                json.loads(options), json.loads(emojis), closes_at,
+                [int(count) for count in tallies.split(',')]
+            )
+            loaded += 1
+        return loaded
+    
+    async def add(self, poll):
+        """Track a new poll and write it straight away"""
+        self.polls[poll.message_id] = poll
+        await self._execute(
+            'INSERT OR REPLACE INTO polls (message_id, guild_id, channel_id, author_id, question, options, '
+            'emojis, closes_at, tallies) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(poll.message_id, poll.guild_id, poll.channel_id, poll.author_id, poll.question,
+              json.dumps(poll.options), json.dumps(poll.emojis), poll.closes_at,
+              ','.join(map(str, poll.tallies)))]
+        )
+    
+    def record_vote(self, message_id, emoji, delta):
+        """Apply one reaction add (+1) or remove (-1), returns False when it is not a poll vote"""
+        poll = self.polls.get(message_id)
+        if poll is None:
+            return False
+        index = poll.option_index(emoji)
+        if index is None:
+            return False
+        
+        poll.tallies[index] = max(0, poll.tallies[index] + delta)
+        self._dirty.add(message_id)
+        return True
+    
+    def reset_votes(self, message_id, emoji=None):
+        """All reactions (or all of one emoji) were removed from a poll message"""
+        poll = self.polls.get(message_id)
+        if poll is None:
+            return False
+        
+        if emoji is None:
+            poll.tallies = [0] * len(poll.options)
+        else:
+            index = poll.option_index(emoji)
+            if index is None:
+                return False
+            poll.tallies[index] = 0
+        self._dirty.add(message_id)
+        return True
+    
+    async def flush(self):
+        """Write dirty tallies, returns how many polls were written"""
+        if not self._dirty:
+            return 0
+        
+        # Snapshot on the loop thread, the executor never reads the live polls
+        dirty, self._dirty = self._dirty, set()
+        rows = [(','.join(map(str, self.polls[message_id].tallies)), message_id)
+                for message_id in dirty if message_id in self.polls]
+        try:
+            await self._execute('UPDATE polls SET tallies = ? WHERE message_id = ?', rows)
+        except sqlite3.Error:
+            self._dirty |= dirty & self.polls.keys()
+            raise
+        return len(rows)
+    
+    async def close(self, message_id):
+        """Stop tracking a poll and store its final tallies"""
+        return await self._drop(message_id, 'UPDATE polls SET tallies = ?, closed = 1 WHERE message_id = ?')
+    
+    async def release(self, message_id):
+        """Stop tracking a poll but leave it open, for a process that can see its channel"""
+        return await self._drop(message_id, 'UPDATE polls SET tallies = ? WHERE message_id = ?')
+    
+    async def _drop(self, message_id, sql):
+        poll = self.polls.pop(message_id, None)
+        self._dirty.discard(message_id)
+        if poll is None:
+            return None
+        await self._execute(sql, [(','.join(map(str, poll.tallies)), message_id)])
+        return poll
+    
+    def next_deadline(self):
+        return min((poll.closes_at for poll in self.polls.values()), default=None)
+    
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        return [poll for poll in self.polls.values() if poll.closes_at <= now]
+    
+    def _close_connection(self):
+        with self._lock:
+            self.conn.close()
+
+    async def shutdown(self):
+        try:
+            await self.flush()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to save poll tallies: {e}")
+        async with self._write_lock:
+            await asyncio.get_running_loop().run_in_executor(None, self._close_connection)
@@ -0,0 +1,178 @@
+import time
+import asyncio
+import datetime
+
+import discord
+
+from logger import get_logger
+
+logger = get_logger("Purge")
+
+# Discord's bulk delete endpoint takes 2-100 messages, none older than 14 days
+BULK_DELETE_MAX = 100
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14)
+# Stay clear of the boundary so a message cannot age past it while a request is in flight
+BULK_DELETE_AGE_MARGIN = datetime.timedelta(minutes=5)
+
+# Progress callbacks during the slow single-delete phase fire every this many deletes
+SINGLE_DELETE_PROGRESS_EVERY = 10
+
+
+def bulk_delete_cutoff(now=None):
+    """Snowflake of the oldest message the bulk delete endpoint still accepts"""
+    now = now or discord.utils.utcnow()
+    return discord.utils.time_snowflake(now - BULK_DELETE_MAX_AGE + BULK_DELETE_AGE_MARGIN)
+
+
+class PurgeFilter:
+    """Which messages a purge deletes (pinned messages are always kept)"""
+    
+    __slots__ = ('author_id', 'contains', 'bots_only')
+    
+    def __init__(self, author_id=None, contains=None, bots_only=False):
+        self.author_id = author_id
+        self.contains = contains.casefold() if contains else None
+        self.bots_only = bots_only
+    
+    def matches(self, message):
+        if message.pinned:
+            return False
+        if self.author_id is not None and message.author.id != self.author_id:
+            return False
+        if self.bots_only and not message.author.bot:
+            return False
+        if self.contains is not None and self.contains not in message.content.casefold():
+            return False
+        return True
+
+
+class PurgeProgress:
+    """Running totals of a purge, handed to the progress callback"""
+    
+    __slots__ = ('scanned', 'deleted', 'failed', 'bulk_calls', 'single_deletes', 'started', 'done')
+    
+    def __init__(self):
+        self.scanned = 0
+        self.deleted = 0
+        self.failed = 0
+        self.bulk_calls = 0
+        self.single_deletes = 0
+        self.started = time.monotonic()
+        self.done = False
+    
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+    
+    def summary(self):
+        text = (
+            f"{self.deleted} deleted of {self.scanned} scanned in {self.elapsed:.0f}s "
+            f"({self.bulk_calls} bulk call(s), {self.single_deletes} single delete(s))"
+        )
+        if self.failed:
+            text += f", {self.failed} failed"
+        return text
+
+
+async def stream_purge(channel, limit, message_filter, *, before=None, after=None, max_scan=None,
+                       single_delete_delay=1.0, on_progress=None):
+    """Delete up to `limit` matching messages from `channel`, newest first
+    
+    History is read as a stream and matches are deleted 100 at a time, each
+    bulk delete running while the next page of history is fetched. Messages
+    older than 14 days can only be deleted one by one, those are paced by
+    `single_delete_delay`. `on_progress(progress)` is awaited after every
+    bulk call and every few single deletes.
+    """
+    progress = PurgeProgress()
+    batch = []
+    pending = None
+    
+    async def report():
+        if on_progress is not None:
+            try:
+                await on_progress(progress)
+            except Exception as e:
+                logger.debug(f"Purge progress callback failed: {e}")
+    
+    async def delete_single(message, paced):
+        try:
+            await message.delete()
+            progress.deleted += 1
+            progress.single_deletes += 1
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            progress.failed += 1
+            logger.warning(f"Failed to delete message {message.id} in #{channel}: {e}")
+        if paced:
+            await asyncio.sleep(single_delete_delay)
+            if progress.single_deletes % SINGLE_DELETE_PROGRESS_EVERY == 0:
+                await report()
+    
+    async def delete_batch(messages):
+        # Messages can age past the cutoff during a long purge, those go one at a time
+        cutoff = bulk_delete_cutoff()
+        recent = [message for message in messages if message.id > cutoff]
+        aged = [message for message in messages if message.id <= cutoff]
+        
+        if len(recent) == 1:
+            await delete_single(recent[0], paced=False)
+        elif recent:
+            try:
+                await channel.delete_messages(recent)
+                progress.deleted += len(recent)
+            except discord.HTTPException as e:
+                progress.failed += len(recent)
+                logger.warning(f"Bulk delete of {len(recent)} messages in #{channel} failed: {e}")
+            progress.bulk_calls += 1
+        
+        for message in aged:
+            await delete_single(message, paced=True)
+        await report()
+    
+    async def flush():
+        nonlocal batch, pending
+        if pending is not None:
+            await pending
+            pending = None
+        if batch:
+            messages, batch = batch, []
+            pending = asyncio.create_task(delete_batch(messages))
+    
+    cutoff = bulk_delete_cutoff()
+    matched = 0
+    
+    try:
+        async for message in channel.history(limit=max_scan, before=before, oldest_first=False):
+            # Filtering `after` here instead of in history() stops the walk as soon as it is passed
+            if after is not None and message.id <= after.id:
+                break
+            
+            progress.scanned += 1
+            if not message_filter.matches(message):
+                continue
+            matched += 1
+            
+            if message.id > cutoff:
+                batch.append(message)
+                if len(batch) >= BULK_DELETE_MAX:
+                    await flush()
+            else:
+                # History is newest first, so everything from here on is too old to bulk delete
+                await flush()
+                await delete_single(message, paced=True)
+            
+            if matched >= limit:
+                break
+        
+        await flush()
+        if pending is not None:
+            await pending
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+    
+    progress.done = True
+    logger.info(f"Purged #{channel}: {progress.summary()}")
+    return progress
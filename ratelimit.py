@@ -0,0 +1,215 @@
+import time
+import asyncio
+import collections
+import contextlib
+
+from discord.ext import commands
+
+from logger import get_logger
+import metrics
+
+logger = get_logger("RateLimit")
+
+REQUESTS_THROTTLED = metrics.REGISTRY.counter(
+    'discord_requests_throttled_total', 'Requests rejected by rate limits or the extraction queue', ('command', 'scope')
+)
+EXTRACTIONS_RUNNING = metrics.REGISTRY.gauge('discord_extractions_running', 'yt-dlp extractions in progress')
+EXTRACTIONS_WAITING = metrics.REGISTRY.gauge('discord_extractions_waiting', 'yt-dlp extractions waiting for a slot')
+
+# Scope name -> discord.py bucket type, so rejections surface as a normal CommandOnCooldown
+SCOPES = {
+    'user': commands.BucketType.user,
+    'guild': commands.BucketType.guild,
+    'global': commands.BucketType.default,
+}
+
+# Idle buckets are swept every this many checks (amortised O(1) per check)
+SWEEP_EVERY = 1024
+
+
+class TokenBucket:
+    """`capacity` tokens, refilled continuously over `per` seconds"""
+    
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+    
+    def __init__(self, capacity, per, now):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = now
+    
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+    
+    def retry_after(self):
+        """Seconds until one token is available (0 when one is available now)"""
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def full_at(self):
+        return self.updated + (self.capacity - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-user, per-guild and global token buckets, configured per command
+    
+    `limits` maps a command name to {scope: (uses, per_seconds)}; commands not
+    listed use `default`. A request must have a token in every one of its
+    buckets, and only then takes one from each, so a rejected request costs
+    nothing. Each check is at most three dict lookups.
+    """
+    
+    def __init__(self, limits=None, default=None):
+        self.limits = dict(limits or {})
+        self.default = dict(default or {})
+        self.throttled = collections.Counter()
+        self._buckets = {}
+        self._checks = 0
+    
+    def limits_for(self, command_name):
+        return self.limits.get(command_name, self.default)
+    
+    @staticmethod
+    def _scope_id(scope, user_id, guild_id):
+        if scope == 'user':
+            return user_id
+        if scope == 'guild':
+            # DMs have no guild, fall back to the user so they are still limited
+            return guild_id if guild_id is not None else f"dm:{user_id}"
+        return None
+    
+    def check(self, command_name, user_id, guild_id, now=None):
+        """Take a token from every bucket, returns (retry_after, scope), scope None when allowed"""
+        limits = self.limits_for(command_name)
+        if not limits:
+            return 0.0, None
+        
+        now = time.monotonic() if now is None else now
+        self._checks += 1
+        if self._checks % SWEEP_EVERY == 0:
+            self._sweep(now)
+        
+        buckets = []
+        for scope, (uses, per) in limits.items():
+            key = (command_name, scope, self._scope_id(scope, user_id, guild_id))
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(uses, per, now)
+            else:
+                bucket.refill(now)
+            
+            retry_after = bucket.retry_after()
+            if retry_after:
+                self.throttled[(command_name, scope)] += 1
+                REQUESTS_THROTTLED.inc(command=command_name, scope=scope)
+                return retry_after, scope
+            buckets.append(bucket)
+        
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return 0.0, None
+    
+    def enforce(self, ctx):
+        """Raise CommandOnCooldown when the invoking user, guild or everyone is over the limit"""
+        command_name = ctx.command.qualified_name
+        retry_after, scope = self.check(command_name, ctx.author.id, ctx.guild.id if ctx.guild else None)
+        if scope is None:
+            return
+        
+        uses, per = self.limits_for(command_name)[scope]
+        raise commands.CommandOnCooldown(commands.Cooldown(uses, per), retry_after, SCOPES.get(scope, commands.BucketType.default))
+    
+    def _sweep(self, now):
+        """Drop buckets that have refilled completely, they are identical to fresh ones"""
+        idle = [key for key, bucket in self._buckets.items() if bucket.full_at() <= now]
+        for key in idle:
+            del self._buckets[key]
+    
+    def total_throttled(self):
+        return sum(self.throttled.values())
+
+
+class ExtractionQueueFull(commands.CommandError):
+    """Raised when too many extractions are already waiting"""
+
+
+class ExtractionGate:
+    """Hard cap on concurrent yt-dlp extractions with a bounded, visible wait queue
+    
+    Up to `max_running` extractions run at once and up to `max_waiting` more
+    wait in FIFO order; past that, new requests are rejected early instead of
+    piling up in the executor. Playback extractions (`reject=False`) are never
+    rejected and go to the front of the line.
+    """
+    
+    def __init__(self, max_running=4, max_waiting=20):
+        self.max_running = max_running
+        self.max_waiting = max_waiting
+        self.running = 0
+        self.rejected = 0
+        self._waiters = collections.deque()
+    
+    @property
+    def waiting(self):
+        return len(self._waiters)
+    
+    def _release(self):
+        self.running -= 1
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                self.running += 1
+                return
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, on_queued=None, reject=True, command_name='extraction'):
+        """Hold an extraction slot; `on_queued(position)` is awaited if the request has to wait"""
+        if self.running < self.max_running and not self._waiters:
+            self.running += 1
+        else:
+            if reject and len(self._waiters) >= self.max_waiting:
+                self.rejected += 1
+                REQUESTS_THROTTLED.inc(command=command_name, scope='extraction_queue')
+                raise ExtractionQueueFull(f"{self.running} extractions running and {len(self._waiters)} waiting")
+            
+            future = asyncio.get_running_loop().create_future()
+            if reject:
+                self._waiters.append(future)
+                position = len(self._waiters)
+            else:
+                self._waiters.appendleft(future)
+                position = 1
+            
+            try:
+                if on_queued is not None:
+                    try:
+                        await on_queued(position)
+                    except Exception as e:
+                        logger.debug(f"Failed to announce queue position: {e}")
+                # The slot is handed over by _release, already counted in `running`
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    future.cancel()
+                    with contextlib.suppress(ValueError):
+                        self._waiters.remove(future)
+                raise
+        
+        try:
+            yield
+        finally:
+            self._release()
+    
+    def collect_metrics(self):
+        EXTRACTIONS_RUNNING.set(self.running)
+        EXTRACTIONS_WAITING.set(self.waiting)
+
+
+extraction_gate = ExtractionGate()
+metrics.REGISTRY.add_collector('extraction_gate', extraction_gate.collect_metrics)
@@ -0,0 +1,120 @@
+import math
+import time
+
+from collections import Counter
+
+from logger import get_logger
+
+logger = get_logger("Shards")
+
+
+class ShardState:
+    """Connection bookkeeping for a single shard"""
+    
+    __slots__ = ('shard_id', 'status', 'connected_at', 'ready_at', 'ready_time', 'disconnects', 'resumes')
+    
+    def __init__(self, shard_id):
+        self.shard_id = shard_id
+        self.status = 'starting'
+        self.connected_at = None
+        self.ready_at = None
+        self.ready_time = None
+        self.disconnects = 0
+        self.resumes = 0
+
+
+class ShardTracker:
+    """Per-shard readiness, latency and guild counts
+    
+    Every gateway event only touches the state of the shard it came from, so
+    a reconnect storm on one shard never walks the other shards' guilds.
+    """
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.shards = {}
+        self.ready_once = False
+    
+    @property
+    def sharded(self):
+        return hasattr(self.bot, 'shards')
+    
+    def _state(self, shard_id):
+        shard_id = shard_id or 0
+        state = self.shards.get(shard_id)
+        if state is None:
+            state = self.shards[shard_id] = ShardState(shard_id)
+        return state
+    
+    def connected(self, shard_id):
+        state = self._state(shard_id)
+        state.status = 'connecting'
+        state.connected_at = time.monotonic()
+    
+    def ready(self, shard_id):
+        state = self._state(shard_id)
+        state.status = 'ready'
+        state.ready_at = time.monotonic()
+        if state.connected_at is not None:
+            state.ready_time = state.ready_at - state.connected_at
+        return state
+    
+    def disconnected(self, shard_id):
+        state = self._state(shard_id)
+        state.status = 'disconnected'
+        state.disconnects += 1
+        return state
+    
+    def resumed(self, shard_id):
+        state = self._state(shard_id)
+        state.status = 'ready'
+        state.resumes += 1
+        return state
+    
+    def shard_count(self):
+        return self.bot.shard_count or 1
+    
+    def ready_count(self):
+        return sum(1 for state in self.shards.values() if state.status == 'ready')
+    
+    def latencies(self):
+        """(shard_id, seconds) pairs, skipping shards that have no heartbeat yet"""
+        if self.sharded:
+            pairs = self.bot.latencies
+        else:
+            pairs = [(self.bot.shard_id or 0, self.bot.latency)]
+        return [(shard_id, latency) for shard_id, latency in pairs
+                if not math.isnan(latency) and not math.isinf(latency)]
+    
+    def guild_counts(self):
+        """Guilds per shard in a single pass over the guild cache"""
+        return Counter(guild.shard_id for guild in self.bot.guilds)
+    
+    def summary(self):
+        """One compact line in place of per-guild logging"""
+        latencies = [latency for _, latency in self.latencies()]
+        average = sum(latencies) / len(latencies) * 1000 if latencies else 0
+        return (
+            f"{self.ready_count()}/{self.shard_count()} shard(s) ready | "
+            f"{len(self.bot.guilds)} guild(s) | avg latency {average:.0f}ms"
+        )
+    
+    def table(self):
+        """Per-shard rows: (shard_id, status, latency_ms, guilds, disconnects, resumes)"""
+        counts = self.guild_counts()
+        latencies = dict(self.latencies())
+        shard_ids = sorted(set(self.shards) | set(counts) | set(latencies))
+        
+        rows = []
+        for shard_id in shard_ids:
+            state = self.shards.get(shard_id) or ShardState(shard_id)
+            latency = latencies.get(shard_id)
+            rows.append((
+                shard_id,
+                state.status,
+                round(latency * 1000) if latency is not None else None,
+                counts.get(shard_id, 0),
+                state.disconnects,
+                state.resumes,
+            ))
+        return rows
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import builtins
+import threading
+import importlib.util
+
+from logger import get_logger, log_bot
+
+# Taken as early as possible (bot.py imports this module first) so the import phase can be measured
+PROCESS_STARTED = time.perf_counter()
+
+logger = get_logger("Startup")
+
+PYPI_URL = 'https://pypi.org/pypi/yt-dlp/json'
+
+
+class ImportProfiler:
+    """Time every first-time import during startup (cumulative and self time)"""
+    
+    def __init__(self):
+        self.records = {}
+        self._local = threading.local()
+        self._original_import = None
+    
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+    
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+    
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and not fromlist and name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        
+        modules_before = len(sys.modules)
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            if len(sys.modules) > modules_before:
+                module = name
+                if level and globals:
+                    try:
+                        module = importlib.util.resolve_name('.' * level + name, globals.get('__package__'))
+                    except (ImportError, ValueError):
+                        pass
+                record = self.records.setdefault(module, [0.0, 0.0])
+                record[0] += elapsed
+                record[1] += elapsed - nested
+    
+    def report(self, limit=20):
+        """Slowest imports by cumulative time, one line each"""
+        rows = sorted(self.records.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        lines = [f"{'cumulative':>10} {'self':>8}  module"]
+        lines.extend(f"{total * 1000:>8.1f}ms {own * 1000:>6.1f}ms  {module}" for module, (total, own) in rows)
+        return '\n'.join(lines)
+
+
+def maybe_install_import_profiler():
+    """Install the import profiler when STARTUP_PROFILE=true or --profile-startup is given
+    
+    Must run before the heavy imports, so it reads the process environment
+    directly rather than going through Config.
+    """
+    enabled = (
+        os.getenv('STARTUP_PROFILE', 'false').lower() == 'true'
+        or '--profile-startup' in sys.argv
+    )
+    if not enabled:
+        return None
+    
+    profiler = ImportProfiler()
+    profiler.install()
+    return profiler
+
+
+class StartupTimer:
+    """Record how long each startup phase takes against a cold-start budget"""
+    
+    def __init__(self, started=None, import_profiler=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.import_profiler = import_profiler
+        self.phases = {}
+        self.cogs = {}
+        self._open = {}
+        self.finished = False
+    
+    def begin(self, name):
+        self._open[name] = time.perf_counter()
+    
+    def end(self, name):
+        started = self._open.pop(name, None)
+        if started is not None:
+            self.phases[name] = time.perf_counter() - started
+    
+    def record(self, name, duration):
+        self.phases[name] = duration
+    
+    async def measure(self, name, awaitable):
+        """Await something while timing it as a phase (works for concurrent phases)"""
+        self.begin(name)
+        try:
+            return await awaitable
+        finally:
+            self.end(name)
+    
+    def finish(self, budget=None):
+        """Log the phase breakdown once, warning when over budget"""
+        if self.finished:
+            return
+        self.finished = True
+        
+        total = time.perf_counter() - self.started
+        breakdown = ' | '.join(f"{name} {duration:.2f}s" for name, duration in self.phases.items())
+        message = f"Startup finished in {total:.2f}s ({breakdown})"
+        
+        if budget and total > budget:
+            logger.warning(f"{message} - over the {budget:.0f}s cold-start budget")
+        else:
+            logger.info(message)
+        
+        cogs = ' | '.join(f"{name} {duration:.3f}s" for name, duration in self.cogs.items())
+        if self.import_profiler:
+            self.import_profiler.uninstall()
+            logger.info(f"Cog setup times: {cogs}")
+            logger.info(f"Import profile:\n{self.import_profiler.report()}")
+        else:
+            logger.debug(f"Cog setup times: {cogs}")
+        
+        log_bot("startup_complete", {
+            "total_seconds": round(total, 3),
+            "phases": {name: round(duration, 3) for name, duration in self.phases.items()},
+            "cogs": {name: round(duration, 3) for name, duration in self.cogs.items()},
+            "budget_seconds": budget,
+        })
+
+
+def _installed_version(package):
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return None
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return None
+
+
+def _version_key(value):
+    """yt-dlp uses date versions like 2024.05.27 or 2024.05.27.1"""
+    return tuple(int(part) if part.isdigit() else 0 for part in value.split('.'))
+
+
+def _read_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+async def _fetch_latest_version(timeout):
+    import aiohttp
+    
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        async with session.get(PYPI_URL) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data['info']['version']
+
+
+async def _upgrade_yt_dlp(timeout):
+    """Run pip as an async subprocess so the event loop keeps running"""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', 'pip', 'install', '--upgrade', 'yt-dlp',
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise RuntimeError(f"pip did not finish within {timeout}s")
+    
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode(errors='replace').strip()[-500:])
+
+
+async def check_yt_dlp_version(cache_file, max_age_hours=24, auto_upgrade=False, timeout=10):
+    """Background yt-dlp version check with a cached result
+    
+    Returns the (possibly cached) result dict. Never raises: startup must not
+    depend on network access.
+    """
+    loop = asyncio.get_event_loop()
+    started = time.perf_counter()
+    
+    try:
+        installed = _installed_version('yt-dlp')
+        cached = await loop.run_in_executor(None, _read_cache, cache_file)
+        
+        fresh = (
+            cached
+            and cached.get('installed') == installed
+            and time.time() - cached.get('checked_at', 0) < max_age_hours * 3600
+        )
+        if fresh:
+            result = cached
+            logger.debug(f"yt-dlp version check cached: installed {installed}, latest {cached.get('latest')}")
+        else:
+            latest = await _fetch_latest_version(timeout)
+            result = {
+                'installed': installed,
+                'latest': latest,
+                'outdated': bool(installed and latest and _version_key(latest) > _version_key(installed)),
+                'checked_at': time.time(),
+            }
+            await loop.run_in_executor(None, _write_cache, cache_file, result)
+        
+        if result.get('outdated'):
+            if auto_upgrade:
+                logger.info(f"Upgrading yt-dlp {installed} -> {result['latest']} in the background...")
+                await _upgrade_yt_dlp(timeout=300)
+                logger.info("yt-dlp upgraded successfully, restart the bot to use it")
+                result['outdated'] = False
+                result['upgraded_to'] = result['latest']
+                await loop.run_in_executor(None, _write_cache, cache_file, dict(result, installed=result['latest']))
+            else:
+                logger.warning(f"yt-dlp {installed} is outdated (latest {result['latest']})")
+        
+        logger.debug(f"yt-dlp version check took {time.perf_counter() - started:.2f}s")
+        return result
+    
+    except Exception as e:
+        logger.warning(f"yt-dlp version check failed: {e}")
+        return None
@@ -0,0 +1,134 @@
+import re
+import heapq
+import bisect
+
+from tracks import WATCH_URL
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# A request in the asking guild counts this many times as much as one elsewhere
+GUILD_WEIGHT = 5
+# Extra score for titles that start with the query as typed
+PREFIX_BONUS = 3
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+class TitleEntry:
+    __slots__ = ('title', 'video_id', 'tokens', 'plays', 'guild_plays')
+    
+    def __init__(self, title, video_id):
+        self.title = title
+        self.video_id = video_id
+        self.tokens = frozenset(tokenize(title))
+        self.plays = 0
+        self.guild_plays = {}
+
+    @property
+    def url(self):
+        return WATCH_URL.format(self.video_id)
+
+
+class TitleIndex:
+    """In-memory prefix/token index of YouTube titles the bot has resolved or played
+    
+    Every word of a title is an index key; a sorted list of the distinct
+    words answers prefix lookups with two bisections. A query matches titles
+    containing a word starting with each query word, ranked by requests in
+    the asking guild, then everywhere. No network, no disk.
+    """
+    
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.entries = {}
+        self._postings = {}
+        self._words = []
+        self.seeded = False
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def add(self, title, video_id, guild_id=None, plays=1):
+        """Record a resolved (plays=0) or requested track"""
+        if not title or not video_id:
+            return
+        entry = self.entries.get(video_id)
+        if entry is None:
+            if len(self.entries) >= self.max_entries:
+                self._evict()
+            entry = self.entries[video_id] = TitleEntry(title, video_id)
+            for word in entry.tokens:
+                postings = self._postings.get(word)
+                if postings is None:
+                    postings = self._postings[word] = set()
+                    bisect.insort(self._words, word)
+                postings.add(video_id)
+        
+        if plays:
+            entry.plays += plays
+            if guild_id is not None:
+                entry.guild_plays[guild_id] = entry.guild_plays.get(guild_id, 0) + plays
+    
+    def _remove(self, video_id):
+        entry = self.entries.pop(video_id)
+        for word in entry.tokens:
+            postings = self._postings[word]
+            postings.discard(video_id)
+            if not postings:
+                del self._postings[word]
+                del self._words[bisect.bisect_left(self._words, word)]
+    
+    def _evict(self):
+        """Drop the least requested tenth, so eviction is rare instead of once per insert"""
+        count = max(1, len(self.entries) // 10)
+        for entry in heapq.nsmallest(count, self.entries.values(), key=lambda entry: entry.plays):
+            self._remove(entry.video_id)
+    
+    def _matching(self, prefix):
+        """Video IDs of titles with a word starting with `prefix`"""
+        start = bisect.bisect_left(self._words, prefix)
+        end = bisect.bisect_left(self._words, prefix + '\uffff', start)
+        if end - start == 1:
+            return self._postings[self._words[start]]
+        matches = set()
+        for word in self._words[start:end]:
+            matches |= self._postings[word]
+        return matches
+    
+    def _score(self, entry, guild_id, typed):
+        score = entry.plays + GUILD_WEIGHT * entry.guild_plays.get(guild_id, 0)
+        if typed and entry.title.casefold().startswith(typed):
+            score += PREFIX_BONUS
+        return score
+    
+    def search(self, query, guild_id=None, limit=25):
+        """Best matching entries for what the user has typed so far"""
+        typed = query.strip().casefold()
+        words = tokenize(typed)
+        
+        if not words:
+            candidates = self.entries.values()
+        else:
+            # Start from the rarest word so the intersections stay small
+            sets = sorted((self._matching(word) for word in words), key=len)
+            if not sets[0]:
+                return []
+            video_ids = set(sets[0])
+            for matches in sets[1:]:
+                video_ids &= matches
+                if not video_ids:
+                    return []
+            candidates = [self.entries[video_id] for video_id in video_ids]
+        
+        return heapq.nlargest(limit, candidates, key=lambda entry: self._score(entry, guild_id, typed))
+    
+    def seed(self, rows):
+        """Load (title, video_id, guild_id, requests) rows, e.g. from the play history"""
+        for title, video_id, guild_id, requests in rows:
+            self.add(title, video_id, guild_id, plays=requests)
+        self.seeded = True
+
+
+title_index = TitleIndex()
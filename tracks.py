@@ -0,0 +1,148 @@
+import re
+import time
+import collections
+
+# googlevideo stream URLs carry their expiry as a unix timestamp, either as a
+# query parameter (?expire=...) or a path segment (/expire/...)
+EXPIRE_PATTERN = re.compile(r'[?&/]expire[=/](\d+)')
+
+# Stream URLs this close to expiring are re-extracted instead of reused
+EXPIRY_MARGIN = 60
+
+# The video ID of any common form of YouTube link: watch?v=, youtu.be/, embed/, shorts/...
+YOUTUBE_ID_PATTERN = re.compile(
+    r'^(?:https?://)?(?:(?:www|m|music)\.)?'
+    r'(?:youtube\.com/(?:watch\?(?:[^#]*&)?v=|embed/|v/|shorts/|live/)|youtu\.be/)'
+    r'([\w-]{11})(?![\w-])'
+)
+WATCH_URL = 'https://www.youtube.com/watch?v={}'
+
+
+def stream_expiry(stream_url):
+    """Unix time a stream URL stops working, or None when it doesn't say"""
+    if not stream_url:
+        return None
+    match = EXPIRE_PATTERN.search(stream_url)
+    return int(match.group(1)) if match else None
+
+
+def youtube_id(url):
+    """Video ID of a YouTube link, or None for anything else"""
+    if not url:
+        return None
+    match = YOUTUBE_ID_PATTERN.match(url.strip())
+    return match.group(1) if match else None
+
+
+class Track:
+    """Compact track record keeping only the fields the bot uses
+    
+    Built from a yt-dlp info dict, which is dropped straight after: the full
+    dict (formats, HTTP headers, thumbnails) is often hundreds of KB.
+    """
+    
+    __slots__ = (
+        'title', 'webpage_url', 'video_id', 'stream_url', 'stream_expires', 'duration',
+        'thumbnail', 'channel', 'requester_id', 'requester_name'
+    )
+    
+    def __init__(self, title, webpage_url, stream_url=None, duration=0, thumbnail=None,
+                 channel=None, requester_id=None, requester_name=None, video_id=None):
+        self.title = title
+        self.webpage_url = webpage_url
+        self.video_id = video_id
+        self.stream_url = stream_url
+        self.stream_expires = stream_expiry(stream_url)
+        self.duration = duration
+        self.thumbnail = thumbnail
+        self.channel = channel
+        self.requester_id = requester_id
+        self.requester_name = requester_name
+    
+    @classmethod
+    def from_info(cls, info, requester_id=None, requester_name=None):
+        """Build a track from a resolved yt-dlp info dict"""
+        webpage_url = info.get('webpage_url') or info.get('url')
+        stream_url = info.get('url')
+        # Only a format-selected result has a playable URL, not a bare webpage or playlist URL
+        if stream_url == webpage_url or not (info.get('formats') or info.get('format_id')):
+            stream_url = None
+        return cls(
+            title=info.get('title', 'Unknown'),
+            webpage_url=webpage_url,
+            stream_url=stream_url,
+            duration=info.get('duration') or 0,
+            # Flat search entries only carry the list of thumbnail sizes, largest last
+            thumbnail=info.get('thumbnail') or next(
+                (thumbnail['url'] for thumbnail in reversed(info.get('thumbnails') or []) if thumbnail.get('url')), None
+            ),
+            channel=info.get('channel', 'Unknown'),
+            requester_id=requester_id,
+            requester_name=requester_name,
+            video_id=info.get('id'),
+        )
+    
+    def stream_usable(self, now=None):
+        """True when the cached stream URL can still be played without re-extracting"""
+        if not self.stream_url:
+            return False
+        if self.stream_expires is None:
+            return False
+        return (now or time.time()) < self.stream_expires - EXPIRY_MARGIN
+    
+    def as_log_info(self):
+        """Song fields as logged with music activity events"""
+        return {
+            'title': self.title,
+            'url': self.webpage_url,
+            'duration': self.duration,
+            'channel': self.channel,
+        }
+    
+    def copy(self):
+        """Same track without the requester, for handing out a cached resolution"""
+        track = Track(self.title, self.webpage_url, duration=self.duration, thumbnail=self.thumbnail,
+                      channel=self.channel, video_id=self.video_id)
+        track.stream_url = self.stream_url
+        track.stream_expires = self.stream_expires
+        return track
+    
+    def __repr__(self):
+        return f"<Track title={self.title!r} url={self.webpage_url!r}>"
+
+
+class TrackCache:
+    """Recently resolved YouTube tracks by video ID, while their stream URL is still usable
+    
+    Keyed by ID rather than URL, so youtu.be links, `&t=` and links without
+    `www` all find the same entry.
+    """
+    
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self._tracks = collections.OrderedDict()
+    
+    def __len__(self):
+        return len(self._tracks)
+    
+    def get(self, video_id):
+        track = self._tracks.get(video_id)
+        if track is None:
+            return None
+        if not track.stream_usable():
+            del self._tracks[video_id]
+            return None
+        self._tracks.move_to_end(video_id)
+        return track.copy()
+    
+    def put(self, track):
+        video_id = youtube_id(track.webpage_url)
+        if video_id is None or not track.stream_usable():
+            return
+        self._tracks[video_id] = track.copy()
+        self._tracks.move_to_end(video_id)
+        while len(self._tracks) > self.max_entries:
+            self._tracks.popitem(last=False)
+
+
+track_cache = TrackCache()